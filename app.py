@@ -279,6 +279,8 @@ st.markdown("""
 
 # API Base URL
 API_BASE_URL = "http://localhost:5000"
+# Uploads turned away with 503 (validation queue full) are retried after Retry-After, this many times
+VALIDATE_RETRIES = 3
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -328,17 +330,28 @@ def get_customer_info(customer_id):
         return None
 
 def send_message(message, customer_id, file=None):
-    """Send message to chat API with optional file upload"""
+    """Send message to chat API with optional file upload (one file or a list of them)"""
     try:
         if file:
-            logging.info(f"Sending message with file upload for customer {customer_id}.")
-            files = {'file': (file.name, file, file.type)}
+            uploads = file if isinstance(file, list) else [file]
+            logging.info(f"Sending message with {len(uploads)} file upload(s) for customer {customer_id}.")
             data = {'message': message, 'customer_id': customer_id}
-            response = requests.post(f"{API_BASE_URL}/validate", files=files, data=data, timeout=45)
-            logging.info(f"Validation response status: {response.status_code}")
+            for attempt in range(VALIDATE_RETRIES + 1):
+                for f in uploads:
+                    f.seek(0)
+                files = [('file', (f.name, f, f.type)) for f in uploads]
+                response = requests.post(f"{API_BASE_URL}/validate", files=files, data=data, timeout=15)
+                logging.info(f"Validation response status: {response.status_code}")
+                if response.status_code != 503 or attempt == VALIDATE_RETRIES:
+                    break
+                delay = float(response.headers.get('Retry-After', 5))
+                logging.info(f"Validation queue full, retrying in {delay:g}s")
+                time.sleep(delay)
             if response.status_code == 200:
                 result = response.json()
                 return result
+            if response.status_code == 202:
+                return wait_for_validation(response.json()['job_id'], customer_id)
         else:
             logging.info(f"Sending chat message for customer {customer_id}: {message}")
             response = requests.post(f"{API_BASE_URL}/chat", json={"message": message, "customer_id": customer_id}, timeout=5)
@@ -354,6 +367,54 @@ def send_message(message, customer_id, file=None):
         st.error(f"Error sending message: {str(e)}")
         return None
 
+def wait_for_validation(job_id, customer_id, timeout=90):
+    """Long-poll a queued /validate job until it is done, returning its result"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"{API_BASE_URL}/validate/{job_id}", params={'wait': 20, 'customer_id': customer_id},
+                                timeout=30)
+        if response.status_code != 200:
+            logging.error(f"Failed to poll validation job {job_id}: HTTP {response.status_code} - {response.text}")
+            st.error(f"Failed to check validation status: HTTP {response.status_code}")
+            return None
+        job = response.json()
+        if job['state'] == 'done':
+            logging.info(f"Validation job {job_id} finished.")
+            return job['result']
+    logging.error(f"Validation job {job_id} did not finish within {timeout}s")
+    st.error("Validation is taking longer than expected. Please check back later.")
+    return None
+
+def stream_message(message, customer_id, result):
+    """Stream a chat reply from /chat/stream, yielding text as it arrives.
+
+    The trailing event's intent and case ID are stored in ``result``; on failure
+    ``result['error']`` is set instead.
+    """
+    try:
+        logging.info(f"Streaming chat message for customer {customer_id}: {message}")
+        with requests.post(f"{API_BASE_URL}/chat/stream", json={"message": message, "customer_id": customer_id},
+                           stream=True, timeout=(5, 30)) as response:
+            if response.status_code != 200:
+                logging.error(f"Failed to stream message: HTTP {response.status_code} - {response.text}")
+                result['error'] = f"HTTP {response.status_code} - {response.text}"
+                return
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    payload = json.loads(line[len("data:"):])
+                    if event == "token":
+                        yield payload['text']
+                    elif event == "done":
+                        result.update(payload)
+                    elif event == "error":
+                        result['error'] = payload.get('details', payload.get('error'))
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error streaming message: {str(e)}")
+        result['error'] = str(e)
+
 def get_analytics():
     """Fetch analytics data"""
     try:
@@ -552,13 +613,15 @@ def main_page():
                 with col_input:
                     prompt = st.text_input("Type your message here...", key="chat_input", placeholder="Enter your message...")
                 with col_file:
-                    uploaded_file = st.file_uploader("Upload evidence (e.g., damaged item)", type=["jpg", "png"], key="chat_file_upload")
+                    uploaded_files = st.file_uploader("Upload evidence (e.g., damaged item)", type=["jpg", "png"], key="chat_file_upload",
+                                                      accept_multiple_files=True)
 
                 submit_button = st.form_submit_button("Send", disabled=not customer_id)
 
                 if submit_button and customer_id:
                     # Add user message to history
-                    user_content = prompt or ("Image uploaded" if uploaded_file else prompt)
+                    user_content = prompt or ((f"{len(uploaded_files)} images uploaded" if len(uploaded_files) > 1 else "Image uploaded")
+                                              if uploaded_files else prompt)
                     st.session_state.messages.append({
                         "role": "user",
                         "content": user_content,
@@ -566,10 +629,10 @@ def main_page():
                     })
                     
                     # Show processing indicator for file uploads
-                    if uploaded_file:
+                    if uploaded_files:
                         with st.status("Processing your request...", expanded=True) as status:
-                            st.write("🔄 Analyzing your image...")
-                            response = send_message(prompt or "Refund request with image", customer_id, uploaded_file)
+                            st.write("🔄 Analyzing your images..." if len(uploaded_files) > 1 else "🔄 Analyzing your image...")
+                            response = send_message(prompt or "Refund request with image", customer_id, uploaded_files)
                             if response:
                                 status.update(label="✅ Image analysis complete", state="complete")
                                 # Display initial response
@@ -602,17 +665,21 @@ def main_page():
                                     "timestamp": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat()
                                 })
                     elif prompt:
-                        response = send_message(prompt, customer_id)
-                        if response:
+                        # Render the reply as it streams in, then keep it in the history
+                        result = {}
+                        with st.chat_message("assistant"):
+                            streamed = st.write_stream(stream_message(prompt, customer_id, result))
+                        if streamed and 'error' not in result:
                             st.session_state.messages.append({
                                 "role": "assistant",
-                                "content": response.get('response', 'Processing...'),
-                                "intent": response.get('intent'),
-                                "case_id": response.get('case_id'),
-                                "status": response.get('status'),
-                                "timestamp": response.get('timestamp', datetime.now(pytz.timezone('Asia/Kolkata')).isoformat())
+                                "content": streamed,
+                                "intent": result.get('intent'),
+                                "case_id": result.get('case_id'),
+                                "status": result.get('status'),
+                                "timestamp": result.get('timestamp', datetime.now(pytz.timezone('Asia/Kolkata')).isoformat())
                             })
                         else:
+                            st.error(f"Error sending message: {result.get('error', 'empty response')}")
                             st.session_state.messages.append({
                                 "role": "assistant",
                                 "content": "Failed to process your request. Please try again or contact support.",
@@ -0,0 +1,145 @@
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
+import os
+import queue
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+import groq
+import httpx
+from resilience import DeadlineExceeded, Guard, guard_from_env, remaining
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 3.0
+
+T = TypeVar("T")
+
+
+class AsyncLLMClient:
+    """Groq client on a pooled asyncio HTTP client, running on its own event loop thread.
+
+    Every completion goes through one keep-alive connection pool and at most
+    ``max_concurrency`` requests are in flight at once; the rest queue on a semaphore
+    instead of opening more connections. Synchronous callers hand coroutines to the
+    loop with ``run()`` (or ``submit()`` for a future), so many chats can be waiting on
+    the LLM while the loop thread does the I/O. Calls go through ``guard`` (see
+    resilience.py), so they fail fast with an exception, for the caller's fallback to
+    handle, once Groq is slow or down. The guard's timer starts once a slot is held:
+    time spent queued counts against the request budget but not against Groq.
+    """
+
+    def __init__(self, api_key: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, model: str = DEFAULT_MODEL,
+                 guard: Optional[Guard] = None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.guard = guard or Guard("groq", DEFAULT_TIMEOUT)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-event-loop", daemon=True)
+        self._thread.start()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(limits=httpx.Limits(max_connections=max_concurrency,
+                                                           max_keepalive_connections=max_concurrency))
+        self.client = groq.AsyncGroq(api_key=api_key, http_client=self._http)
+        self._closed = False
+        atexit.register(self.close)
+
+    @contextlib.asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Hold one of the ``max_concurrency`` slots, waiting no longer than the request budget"""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("no time left waiting for an LLM slot") from None
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def complete(self, prompt: str, max_tokens: int) -> str:
+        """Single-message chat completion, returning the stripped reply text"""
+        async def attempt():
+            return await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens
+            )
+        # A hedge shares the slot of the attempt it backs up
+        async with self._slot():
+            response = await self.guard.call(attempt)
+        return response.choices[0].message.content.strip()
+
+    async def stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """Streaming chat completion, yielding text deltas as the model produces them"""
+        async def deltas():
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        async with self._slot():
+            async for delta in self.guard.stream(deltas):
+                yield delta
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """Schedule a coroutine on the client's loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the client's loop and wait for its result (not callable from the loop itself)"""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, items: AsyncIterator[T]) -> Iterator[T]:
+        """Consume an async iterator on the client's loop from synchronous code, item by item.
+
+        Abandoning the returned iterator (e.g. a disconnected SSE client) cancels the producer.
+        """
+        results: "queue.Queue" = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in items:
+                    results.put((item, None))
+            except Exception as e:
+                results.put((done, e))
+            else:
+                results.put((done, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                item, error = results.get()
+                if item is done:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self) -> None:
+        """Close pooled connections and stop the loop thread"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        if self.loop.is_running():
+            try:
+                self.run(self._http.aclose(), timeout=5)
+            except Exception as e:
+                print(f"LLM client close error: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def llm_client_from_env(api_key: str) -> AsyncLLMClient:
+    """Build the shared client, bounding in-flight requests by LLM_MAX_CONCURRENCY and guarding
+    calls with the GROQ_TIMEOUT / GROQ_HEDGE_AFTER / GROQ_BREAKER_* settings"""
+    return AsyncLLMClient(api_key, int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+                          guard=guard_from_env("groq", DEFAULT_TIMEOUT))
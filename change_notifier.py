@@ -0,0 +1,25 @@
+from typing import Callable, Dict, List, Optional
+
+# Listener signature: (collection, key, record) where record is the record after the change;
+# key and record are both None when the whole collection was reloaded
+ChangeListener = Callable[[str, Optional[str], Optional[Dict]], None]
+
+class ChangeNotifier:
+    """Mixin that lets derived caches subscribe to record-level changes of a store"""
+
+    def _init_listeners(self) -> None:
+        self._listeners: List[ChangeListener] = []
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: ChangeListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, collection: str, key: Optional[str], record: Optional[Dict]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(collection, key, record)
+            except Exception as e:
+                print(f"Change listener error for {collection}/{key}: {e}")
@@ -0,0 +1,39 @@
+import os
+import threading
+
+DEFAULT_INTERVAL = 0.5
+
+class CoherenceMonitor:
+    """Background thread that keeps a repository in step with writes from other processes.
+
+    Every ``interval`` seconds it calls ``refresh()`` on the stores, which stat the data
+    files and either apply the journal entries other processes appended or reload a
+    collection whose snapshot was replaced. Readers are only held up while the already
+    parsed changes are swapped in.
+    """
+
+    def __init__(self, repository, interval: float = DEFAULT_INTERVAL):
+        self.repository = repository
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="coherence-monitor", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.repository.refresh()
+            except Exception as e:
+                print(f"Coherence refresh error: {e}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def monitor_from_env(repository, default_interval: float = 0.0):
+    """Start a monitor when COHERENCE_INTERVAL (seconds, else ``default_interval``) is above zero,
+    e.g. for multi-process servers"""
+    interval = float(os.getenv("COHERENCE_INTERVAL", default_interval) or 0)
+    if interval <= 0:
+        return None
+    return CoherenceMonitor(repository, interval)
@@ -0,0 +1,269 @@
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # aggregates fall back to plain loops over the arrays
+    np = None
+
+
+class Interner:
+    """Maps strings (IDs, statuses) to dense integer codes and back"""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        self._lock = threading.Lock()
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def get(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class ColumnTable:
+    """One collection as typed columns, rows grouped by customer.
+
+    Rows of customer ``c`` are ``starts[c]:starts[c + 1]``; ``row_of`` maps a record's
+    interned ID to its row so status and amount changes can be applied in place.
+    """
+
+    def __init__(self, key_field: str, amount_field: str):
+        self.key_field = key_field
+        self.amount_field = amount_field
+        self.ids = Interner()
+        self.keys = array('l')
+        self.amounts = array('d')
+        self.statuses = array('h')
+        self.starts = array('l', [0])
+        self.row_of = array('l')
+
+    def build(self, records, customers: Interner, statuses: Interner) -> None:
+        customer_col, key_col, amount_col, status_col = array('l'), array('l'), array('d'), array('h')
+        for record in records:
+            customer_col.append(customers.code(record["customer_id"]))
+            key_col.append(self.ids.code(record[self.key_field]))
+            amount_col.append(float(record.get(self.amount_field) or 0.0))
+            status_col.append(statuses.code(record.get("status") or ""))
+        # Counting sort by customer code keeps each customer's rows contiguous and in file order
+        counts = array('l', bytes(array('l').itemsize * (len(customers) + 1)))
+        for code in customer_col:
+            counts[code + 1] += 1
+        for code in range(len(customers)):
+            counts[code + 1] += counts[code]
+        self.starts = array('l', counts)
+        n = len(key_col)
+        self.keys = array('l', bytes(array('l').itemsize * n))
+        self.amounts = array('d', bytes(array('d').itemsize * n))
+        self.statuses = array('h', bytes(array('h').itemsize * n))
+        self.row_of = array('l', [-1]) * len(self.ids)
+        for i in range(n):
+            row = counts[customer_col[i]]
+            counts[customer_col[i]] += 1
+            self.keys[row] = key_col[i]
+            self.amounts[row] = amount_col[i]
+            self.statuses[row] = status_col[i]
+            self.row_of[key_col[i]] = row
+
+    def rows(self, customer: Optional[int]) -> Tuple[int, int]:
+        if customer is None:
+            return 0, len(self.keys)
+        if customer + 1 >= len(self.starts):
+            return 0, 0  # customer without any rows in this table
+        return self.starts[customer], self.starts[customer + 1]
+
+    def row(self, key: str) -> Optional[int]:
+        code = self.ids.get(key)
+        if code is None or code >= len(self.row_of) or self.row_of[code] < 0:
+            return None
+        return self.row_of[code]
+
+
+class ColumnarStore:
+    """Compact columnar copy of orders and payments (plus wallet balances) for aggregates.
+
+    Sits alongside a DataHandler's record dicts: built on first use from ``iter_records``,
+    kept current through the handler's change notifications (status and amount changes
+    in place, new records or reloads by a rebuild on the next query). With NumPy installed
+    filters and sums run vectorized over the arrays. Building decodes every order and
+    payment, so with backends that decode on demand only whole-store queries (/stats) use
+    it; customer summaries read those customers' records instead.
+    """
+
+    def __init__(self, data_handler):
+        self.data_handler = data_handler
+        self.customers = Interner()
+        self.statuses = Interner()
+        self.wallets = array('d')
+        self._tables: Dict[str, ColumnTable] = {}
+        self._stale = {"customers", "orders", "payments"}
+        self._versions = {"customers": 0, "orders": 0, "payments": 0}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        data_handler.add_listener(self._on_change)
+
+    def _on_change(self, collection: str, key: Optional[str], record: Optional[Dict]) -> None:
+        if collection not in self._versions:
+            return
+        with self._lock:
+            self._versions[collection] += 1
+            if collection in self._stale:
+                return
+            if record is None:
+                self._stale.add(collection)
+            elif collection == "customers":
+                code = self.customers.code(key)
+                if code >= len(self.wallets):
+                    self.wallets.extend([0.0] * (code + 1 - len(self.wallets)))
+                self.wallets[code] = float(record.get("wallet_balance") or 0.0)
+            else:
+                table = self._tables[collection]
+                row = table.row(key)
+                if row is None:
+                    self._stale.add(collection)  # a new record has no slot in its customer's range
+                else:
+                    table.amounts[row] = float(record.get(table.amount_field) or 0.0)
+                    table.statuses[row] = self.statuses.code(record.get("status") or "")
+
+    def _ensure_current(self, collection: str) -> None:
+        if collection not in self._stale:
+            return
+        with self._build_lock:
+            with self._lock:
+                if collection not in self._stale:
+                    return
+                version = self._versions[collection]
+            # Built off the store lock: listeners run under the handler's collection locks
+            if collection == "customers":
+                wallets = array('d')
+                for customer in self.data_handler.iter_records("customers"):
+                    code = self.customers.code(customer["customer_id"])
+                    if code >= len(wallets):
+                        wallets.extend([0.0] * (code + 1 - len(wallets)))
+                    wallets[code] = float(customer.get("wallet_balance") or 0.0)
+            elif collection == "orders":
+                table = ColumnTable("order_id", "total_amount")
+                table.build(self.data_handler.iter_records("orders"), self.customers, self.statuses)
+            else:
+                table = ColumnTable("payment_id", "amount")
+                table.build(self.data_handler.iter_records("payments"), self.customers, self.statuses)
+            with self._lock:
+                if collection == "customers":
+                    self.wallets = wallets
+                else:
+                    self._tables[collection] = table
+                if self._versions[collection] == version:
+                    self._stale.discard(collection)  # otherwise changes raced the build; rebuild next time
+
+    def _select(self, collection: str, customer_id: Optional[str], status: Optional[str]):
+        """Table, row range and status code for a query (store lock held), or None when nothing can match"""
+        table = self._tables[collection]
+        customer = None
+        if customer_id is not None:
+            customer = self.customers.get(customer_id)
+            if customer is None:
+                return None
+        code = None
+        if status is not None:
+            code = self.statuses.get(status)
+            if code is None:
+                return None
+        lo, hi = table.rows(customer)
+        return table, lo, hi, code
+
+    def _count(self, collection: str, customer_id: Optional[str], status: Optional[str]) -> int:
+        self._ensure_current(collection)
+        with self._lock:
+            selected = self._select(collection, customer_id, status)
+            if selected is None:
+                return 0
+            table, lo, hi, code = selected
+            if code is None:
+                return hi - lo
+            if np is not None:
+                return int(np.count_nonzero(np.frombuffer(table.statuses, dtype=np.int16)[lo:hi] == code))
+            return table.statuses[lo:hi].count(code)
+
+    def _total(self, collection: str, customer_id: Optional[str], status: Optional[str]) -> float:
+        self._ensure_current(collection)
+        with self._lock:
+            selected = self._select(collection, customer_id, status)
+            if selected is None:
+                return 0.0
+            table, lo, hi, code = selected
+            if np is not None:
+                amounts = np.frombuffer(table.amounts, dtype=np.float64)[lo:hi]
+                if code is not None:
+                    amounts = amounts[np.frombuffer(table.statuses, dtype=np.int16)[lo:hi] == code]
+                return float(amounts.sum())
+            return sum(table.amounts[i] for i in range(lo, hi) if code is None or table.statuses[i] == code)
+
+    def _status_counts(self, collection: str, customer_id: Optional[str]) -> Dict[str, int]:
+        self._ensure_current(collection)
+        with self._lock:
+            selected = self._select(collection, customer_id, None)
+            if selected is None:
+                return {}
+            table, lo, hi, _ = selected
+            if np is not None:
+                counts = np.bincount(np.frombuffer(table.statuses, dtype=np.int16)[lo:hi], minlength=len(self.statuses))
+                return {self.statuses.values[c]: int(n) for c, n in enumerate(counts) if n}
+            result: Dict[str, int] = {}
+            for c in table.statuses[lo:hi]:
+                result[self.statuses.values[c]] = result.get(self.statuses.values[c], 0) + 1
+            return result
+
+    def payment_count(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> int:
+        return self._count("payments", customer_id, status)
+
+    def payment_total(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> float:
+        return self._total("payments", customer_id, status)
+
+    def payment_status_counts(self, customer_id: Optional[str] = None) -> Dict[str, int]:
+        return self._status_counts("payments", customer_id)
+
+    def _ids(self, collection: str, customer_id: str, status: Optional[str]) -> List[str]:
+        self._ensure_current(collection)
+        with self._lock:
+            selected = self._select(collection, customer_id, status)
+            if selected is None:
+                return []
+            table, lo, hi, code = selected
+            return [table.ids.values[table.keys[i]] for i in range(lo, hi) if code is None or table.statuses[i] == code]
+
+    def payment_ids(self, customer_id: str, status: Optional[str] = None) -> List[str]:
+        """IDs of a customer's payments, optionally only those with the given status"""
+        return self._ids("payments", customer_id, status)
+
+    def order_count(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> int:
+        return self._count("orders", customer_id, status)
+
+    def order_total(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> float:
+        return self._total("orders", customer_id, status)
+
+    def order_status_counts(self, customer_id: Optional[str] = None) -> Dict[str, int]:
+        return self._status_counts("orders", customer_id)
+
+    def order_ids(self, customer_id: str, status: Optional[str] = None) -> List[str]:
+        """IDs of a customer's orders, optionally only those with the given status"""
+        return self._ids("orders", customer_id, status)
+
+    def wallet_total(self) -> float:
+        self._ensure_current("customers")
+        with self._lock:
+            if np is not None:
+                return float(np.frombuffer(self.wallets, dtype=np.float64).sum())
+            return sum(self.wallets)
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_MAX_SIZE = 100000
+DEFAULT_TTL = 30.0
+
+# Collections whose records belong to one customer through their customer_id field
+_PER_CUSTOMER = ("orders", "payments", "subscriptions")
+
+
+def render_preamble(summary: Dict) -> str:
+    """Prompt block describing the customer, rendered once per summary"""
+    customer = summary['customer']
+    return f"""
+        You are a helpful Walmart customer support agent. Respond professionally and helpfully.
+        
+        Customer Information:
+        - Name: {customer['name']}
+        - Wallet Balance: ₹{customer['wallet_balance']}
+        - Membership: {customer['membership']}
+        - Location: {customer['location']}
+        
+        Recent Orders: {summary['order_count']} orders
+        Active Subscriptions: {summary['active_subscriptions']} subscriptions
+        """
+
+
+class CustomerSummaries:
+    """Materialized per-customer context for prompt building.
+
+    A summary holds the customer record, order/payment/failed-payment counts, the sets of
+    the customer's order and payment IDs, the number of active subscriptions and the
+    pre-rendered prompt preamble. It is built on first use from the columnar store, or, when
+    the handler decodes records on demand (lazy JSON, SQLite), from that customer's own
+    orders and payments so no message waits for a whole collection to be decoded. It is
+    dropped as soon as a change to that customer's wallet, orders, payments or
+    subscriptions is announced, so the next message rebuilds just that one customer; a
+    reloaded collection drops every summary. Changes made by other processes are only
+    announced once the stores' ``refresh()`` picks them up (the coherence monitor), so a
+    summary is also rebuilt once it is ``ttl`` seconds old whatever was announced. At most
+    ``max_size`` summaries are kept, least recently used first out.
+    """
+
+    def __init__(self, data_handler, subscription_manager, columns, max_size: int = DEFAULT_MAX_SIZE,
+                 ttl: float = DEFAULT_TTL):
+        self.data_handler = data_handler
+        self.subscription_manager = subscription_manager
+        self.columns = columns
+        self.max_size = max_size
+        self.ttl = ttl
+        self._summaries: "OrderedDict[str, tuple]" = OrderedDict()  # customer_id -> (summary, built at)
+        self._generation = 0  # bumped on every invalidation so a build racing one is not stored
+        self._lock = threading.Lock()
+        data_handler.add_listener(self._on_change)
+        subscription_manager.add_listener(self._on_change)
+
+    def get(self, customer_id: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._summaries.get(customer_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._summaries.move_to_end(customer_id)
+                return entry[0]
+            generation = self._generation
+        summary = self._build(customer_id)
+        if summary is None:
+            return None
+        with self._lock:
+            if self._generation == generation:
+                self._summaries[customer_id] = (summary, now)
+                self._summaries.move_to_end(customer_id)
+                while len(self._summaries) > self.max_size:
+                    self._summaries.popitem(last=False)
+        return summary
+
+    def _build(self, customer_id: str) -> Optional[Dict]:
+        customer = self.data_handler.get_customer(customer_id)
+        if not customer:
+            return None
+        if self.data_handler.records_in_memory:
+            order_ids = self.columns.order_ids(customer_id)
+            payment_ids = self.columns.payment_ids(customer_id)
+            failed_count = self.columns.payment_count(customer_id, 'failed')
+        else:
+            order_ids = [o['order_id'] for o in self.data_handler.get_customer_orders(customer_id)]
+            payments = self.data_handler.get_customer_payments(customer_id)
+            payment_ids = [p['payment_id'] for p in payments]
+            failed_count = sum(1 for p in payments if p['status'] == 'failed')
+        summary = {
+            'customer': customer,
+            'order_count': len(order_ids),
+            'payment_count': len(payment_ids),
+            'failed_count': failed_count,
+            'order_ids': frozenset(order_ids),
+            'payment_ids': frozenset(payment_ids),
+            'active_subscriptions': sum(1 for s in self.data_handler.get_customer_subscriptions(customer_id)
+                                        if s['status'] == 'active'),
+        }
+        summary['preamble'] = render_preamble(summary)
+        return summary
+
+    def _on_change(self, collection: str, key: Optional[str], record: Optional[Dict]) -> None:
+        if collection == "customers":
+            customer_id = key
+        elif collection in _PER_CUSTOMER:
+            customer_id = record["customer_id"] if record is not None else None
+        else:
+            return
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._summaries.clear()  # whole collection reloaded
+            else:
+                self._summaries.pop(customer_id, None)
+
+
+def summaries_from_env(data_handler, subscription_manager, columns) -> CustomerSummaries:
+    """Build the summaries, bounding how many are kept by CUSTOMER_SUMMARY_CACHE_SIZE and
+    for how many seconds by CUSTOMER_SUMMARY_TTL"""
+    return CustomerSummaries(data_handler, subscription_manager, columns,
+                             int(os.getenv("CUSTOMER_SUMMARY_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+                             float(os.getenv("CUSTOMER_SUMMARY_TTL", DEFAULT_TTL)))
@@ -1,86 +1,306 @@
 import json
 import os
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from journal import Journal, COMPACT_EVERY
+from change_notifier import ChangeNotifier
+from rwlock import ReadWriteLock
 
-class DataHandler:
-    def __init__(self, data_dir: str = "mock_data"):
+DATA_FILES = ("customers.json", "orders.json", "payments.json", "subscriptions.json", "escalations.json")
+
+class DataHandler(ChangeNotifier):
+    # False for backends that decode records on demand: derived caches then avoid walking whole collections
+    records_in_memory = True
+
+    def __init__(self, data_dir: str = "mock_data", compact_every: int = COMPACT_EVERY, subscriptions: Optional[Dict] = None,
+                 flusher=None, subscriptions_lock: Optional[ReadWriteLock] = None):
         self.data_dir = data_dir
+        self._init_listeners()
+        self._locks = self._open_locks(subscriptions_lock)
+        self._journals = self._open_journals(compact_every, flusher)
+        self._owns_subscriptions = subscriptions is None
+        self._refresh_lock = threading.Lock()
         self.customers = self._load_json("customers.json")
         self.orders = self._load_json("orders.json")
         self.payments = self._load_json("payments.json")
-        self.subscriptions = self._load_json("subscriptions.json")
+        # A SubscriptionManager can hand over its document so both share one copy of subscriptions.json
+        self.subscriptions = subscriptions if subscriptions is not None else self._load_json("subscriptions.json")
         self.escalations = self._load_json("escalations.json")
+        self._build_indexes()
+    
+    def _open_locks(self, subscriptions_lock: Optional[ReadWriteLock] = None) -> Dict[str, ReadWriteLock]:
+        """One reader-writer lock per collection; a shared subscriptions document brings its owner's lock"""
+        locks = {name[:-len(".json")]: ReadWriteLock() for name in DATA_FILES}
+        if subscriptions_lock is not None:
+            locks["subscriptions"] = subscriptions_lock
+        return locks
+    
+    def _open_journals(self, compact_every: int, flusher=None) -> Dict[str, Journal]:
+        return {name: Journal(os.path.join(self.data_dir, name), compact_every,
+                              snapshot=lambda attr=name[:-len(".json")]: getattr(self, attr), flusher=flusher,
+                              lock=self._locks[name[:-len(".json")]])
+                for name in DATA_FILES}
     
     def _load_json(self, filename: str) -> Dict:
+        data, snapshot_sig = self._read_json(filename)
+        if snapshot_sig is not None:
+            self._journals[filename].snapshot_sig = snapshot_sig
+        return data
+    
+    def _read_json(self, filename: str) -> Tuple[Dict, Optional[Tuple[int, int, int]]]:
+        """Snapshot plus journal, and the signature of the snapshot read (None if there was none)"""
+        snapshot_sig = None
         try:
             with open(os.path.join(self.data_dir, filename), 'r') as f:
-                return json.load(f)
+                snapshot_sig = Journal.signature(os.fstat(f.fileno()))
+                data = json.load(f)
         except FileNotFoundError:
             print(f"Warning: {filename} not found")
-            return {"subscriptions": []} if filename == "subscriptions.json" else {"escalations": {}} if filename == "escalations.json" else {}
+            data = {"subscriptions": []} if filename == "subscriptions.json" else {"escalations": {}} if filename == "escalations.json" else {}
+        self._journals[filename].replay(data)
+        return data, snapshot_sig
     
     def _save_json(self, filename: str, data: Dict) -> None:
-        with open(os.path.join(self.data_dir, filename), 'w') as f:
-            json.dump(data, f, indent=2)
+        """Write a full snapshot of a file, folding in any journalled changes"""
+        self._journals[filename].compact(data)
+    
+    def _append(self, filename: str, collection: str, record: Dict,
+                key_field: Optional[str] = None, key: Optional[str] = None) -> None:
+        """Persist a single mutated record through the file's journal and notify listeners"""
+        self._journals[filename].append(collection, record, key_field=key_field, key=key)
+        self._notify(collection, key if key is not None else record[key_field], record)
+    
+    def _build_indexes(self) -> None:
+        """Build primary-key and per-customer/per-status indexes over the loaded lists"""
+        self._index_customers()
+        self._index_orders()
+        self._index_payments()
+        self._index_subscriptions()
+    
+    def _index_customers(self) -> None:
+        self._customers_by_id: Dict[str, Dict] = {}
+        for customer in self.customers.get("customers", []):
+            self._customers_by_id.setdefault(customer["customer_id"], customer)
+    
+    def _index_orders(self) -> None:
+        self._orders_by_id: Dict[str, Dict] = {}
+        self._orders_by_customer: Dict[str, List[Dict]] = {}
+        for order in self.orders.get("orders", []):
+            self._orders_by_id.setdefault(order["order_id"], order)
+            self._orders_by_customer.setdefault(order["customer_id"], []).append(order)
+    
+    def _index_payments(self) -> None:
+        self._payments_by_id: Dict[str, Dict] = {}
+        self._payments_by_order: Dict[str, Dict] = {}
+        self._payments_by_customer: Dict[str, List[Dict]] = {}
+        self._payments_by_status: Dict[Tuple[str, str], List[Dict]] = {}
+        for payment in self.payments.get("payments", []):
+            self._index_payment(payment)
+    
+    def _index_subscriptions(self) -> None:
+        self._subscriptions_by_customer: Dict[str, List[Dict]] = {}
+        for sub in self.subscriptions.get("subscriptions", []):
+            self._subscriptions_by_customer.setdefault(sub["customer_id"], []).append(sub)
+    
+    def _index_payment(self, payment: Dict) -> None:
+        self._payments_by_id.setdefault(payment["payment_id"], payment)
+        if payment.get("order_id"):
+            self._payments_by_order.setdefault(payment["order_id"], payment)
+        self._payments_by_customer.setdefault(payment["customer_id"], []).append(payment)
+        self._payments_by_status.setdefault((payment["customer_id"], payment["status"]), []).append(payment)
+    
+    def refresh(self) -> None:
+        """Pick up changes other processes made to the data files since the last look.
+
+        New journal entries are applied record by record; a collection whose snapshot was
+        replaced is re-parsed and re-indexed off-lock and then swapped in.
+        """
+        with self._refresh_lock:
+            for filename in DATA_FILES:
+                collection = filename[:-len(".json")]
+                if collection == "subscriptions" and not self._owns_subscriptions:
+                    continue  # kept current by the SubscriptionManager that owns the document
+                self._refresh_collection(collection)
+    
+    def _refresh_collection(self, collection: str) -> None:
+        entries = self._journals[f"{collection}.json"].poll()
+        if entries is None:
+            self._reload(collection)
+        elif entries:
+            with self._locks[collection].write():
+                for entry in entries:
+                    self._apply_external(collection, entry)
+            for entry in entries:
+                key = entry["key"] if entry["key_field"] is None else entry["record"][entry["key_field"]]
+                self._notify(collection, key, entry["record"])
+    
+    def _reload(self, collection: str) -> None:
+        filename = f"{collection}.json"
+        journal = self._journals[filename]
+        journal.flush()
+        data, snapshot_sig = self._read_json(filename)
+        # Indexes are built on a bare instance holding only this collection, then swapped in
+        scratch = DataHandler.__new__(DataHandler)
+        setattr(scratch, collection, data)
+        if collection != "escalations":
+            getattr(DataHandler, f"_index_{collection}")(scratch)
+        with self._locks[collection].write():
+            self.__dict__.update(vars(scratch))
+        # Only now is the new snapshot reflected; a failed reload is retried on the next poll
+        if snapshot_sig is not None:
+            journal.snapshot_sig = snapshot_sig
+        self._notify(collection, None, None)
+    
+    def _apply_external(self, collection: str, entry: Dict) -> None:
+        """Upsert one record written by another process, keeping the indexes in step"""
+        record = entry["record"]
+        if collection == "escalations":
+            self.escalations.setdefault("escalations", {})[entry["key"]] = record
+            return
+        key = record[entry["key_field"]]
+        if collection == "subscriptions":
+            existing = next((s for s in self._subscriptions_by_customer.get(record["customer_id"], [])
+                             if s["subscription_id"] == key), None)
+        else:
+            existing = getattr(self, f"_{collection}_by_id").get(key)
+        if existing is None:
+            getattr(self, collection).setdefault(collection, []).append(record)
+            if collection == "customers":
+                self._customers_by_id[key] = record
+            elif collection == "orders":
+                self._orders_by_id[key] = record
+                self._orders_by_customer.setdefault(record["customer_id"], []).append(record)
+            elif collection == "payments":
+                self._index_payment(record)
+            else:
+                self._subscriptions_by_customer.setdefault(record["customer_id"], []).append(record)
+            return
+        if collection == "payments" and existing["status"] != record["status"]:
+            bucket = self._payments_by_status.get((existing["customer_id"], existing["status"]), [])
+            bucket[:] = [p for p in bucket if p is not existing]
+            self._payments_by_status.setdefault((existing["customer_id"], record["status"]), []).append(existing)
+        # Update in place so every index entry pointing at the record stays valid; readers holding
+        # it see fields change, never the record emptied
+        existing.update(record)
+        for field in existing.keys() - record.keys():
+            del existing[field]
+    
+    def list_customers(self) -> List[Dict]:
+        with self._locks["customers"].read():
+            return list(self.customers.get("customers", []))
+    
+    def iter_records(self, collection: str) -> Iterator[Dict]:
+        """Every record of a list collection, e.g. to build a derived store from"""
+        with self._locks[collection].read():
+            records = list(getattr(self, collection).get(collection, []))
+        return iter(records)
+    
+    def flush(self) -> None:
+        """Write out any journal entries still buffered by a write-behind flusher"""
+        for journal in self._journals.values():
+            journal.flush()
     
     def get_customer(self, customer_id: str) -> Optional[Dict]:
-        customers_list = self.customers.get("customers", [])
-        return next((c for c in customers_list if c["customer_id"] == customer_id), None)
+        with self._locks["customers"].read():
+            return self._customers_by_id.get(customer_id)
     
     def get_customer_orders(self, customer_id: str) -> List[Dict]:
-        orders_list = self.orders.get("orders", [])
-        return [o for o in orders_list if o["customer_id"] == customer_id]
+        with self._locks["orders"].read():
+            return list(self._orders_by_customer.get(customer_id, []))
     
     def get_order(self, order_id: str) -> Optional[Dict]:
-        orders_list = self.orders.get("orders", [])
-        return next((o for o in orders_list if o["order_id"] == order_id), None)
+        with self._locks["orders"].read():
+            return self._orders_by_id.get(order_id)
     
     def get_payment(self, payment_id: str) -> Optional[Dict]:
-        payments_list = self.payments.get("payments", [])
-        return next((p for p in payments_list if p["payment_id"] == payment_id), None)
+        with self._locks["payments"].read():
+            return self._payments_by_id.get(payment_id)
     
     def get_customer_payments(self, customer_id: str) -> List[Dict]:
-        payments_list = self.payments.get("payments", [])
-        return [p for p in payments_list if p["customer_id"] == customer_id]
+        with self._locks["payments"].read():
+            return list(self._payments_by_customer.get(customer_id, []))
     
     def get_order_payment(self, order_id: str) -> Optional[Dict]:
-        payments_list = self.payments.get("payments", [])
-        return next((p for p in payments_list if p["order_id"] == order_id), None)
+        with self._locks["payments"].read():
+            return self._payments_by_order.get(order_id)
     
     def update_wallet_balance(self, customer_id: str, new_balance: float) -> bool:
-        customers_list = self.customers.get("customers", [])
-        for customer in customers_list:
-            if customer["customer_id"] == customer_id:
-                customer["wallet_balance"] = new_balance
-                self._save_json("customers.json", self.customers)
-                return True
-        return False
+        with self._locks["customers"].write():
+            customer = self._customers_by_id.get(customer_id)
+            if customer is None:
+                return False
+            customer["wallet_balance"] = new_balance
+            self._append("customers.json", "customers", customer, key_field="customer_id")
+            return True
+    
+    def credit_wallet(self, customer_id: str, amount: float) -> Optional[float]:
+        """Atomically add to a wallet balance, returning the new balance (None if the customer is unknown)"""
+        with self._locks["customers"].write():
+            customer = self._customers_by_id.get(customer_id)
+            if customer is None:
+                return None
+            customer["wallet_balance"] += amount
+            self._append("customers.json", "customers", customer, key_field="customer_id")
+            return customer["wallet_balance"]
+    
+    def update_payments_status(self, payment_ids: List[str], status: str) -> int:
+        """Set the status of several payments, keeping the status index in step"""
+        updated = 0
+        with self._locks["payments"].write():
+            for payment_id in payment_ids:
+                payment = self._payments_by_id.get(payment_id)
+                if payment is None or payment["status"] == status:
+                    continue
+                bucket = self._payments_by_status.get((payment["customer_id"], payment["status"]), [])
+                bucket[:] = [p for p in bucket if p is not payment]
+                payment["status"] = status
+                self._payments_by_status.setdefault((payment["customer_id"], status), []).append(payment)
+                self._append("payments.json", "payments", payment, key_field="payment_id")
+                updated += 1
+        return updated
     
     def get_failed_payments(self, customer_id: str) -> List[Dict]:
-        payments_list = self.payments.get("payments", [])
-        return [p for p in payments_list if p["customer_id"] == customer_id and p["status"] == "failed"]
+        with self._locks["payments"].read():
+            return list(self._payments_by_status.get((customer_id, "failed"), []))
     
     def get_customer_subscriptions(self, customer_id: str) -> List[Dict]:
-        subscriptions_list = self.subscriptions.get("subscriptions", [])
-        return [s for s in subscriptions_list if s["customer_id"] == customer_id]
+        with self._locks["subscriptions"].read():
+            return list(self._subscriptions_by_customer.get(customer_id, []))
+    
+    def _on_subscription_changed(self, collection: str, key: str, record: Optional[Dict]) -> None:
+        """Keep the per-customer subscription index in step with a SubscriptionManager's writes"""
+        if collection != "subscriptions":
+            return
+        with self._locks["subscriptions"].write():
+            if record is None:
+                self._index_subscriptions()  # the whole document was reloaded
+                return
+            bucket = self._subscriptions_by_customer.setdefault(record["customer_id"], [])
+            if not any(s is record for s in bucket):
+                bucket[:] = [s for s in bucket if s["subscription_id"] != key] + [record]
     
     def add_escalation(self, case_id: str, customer_id: str, issue_details: str) -> bool:
-        self.escalations.setdefault("escalations", {})[case_id] = {
+        escalation = {
             "customer_id": customer_id,
             "issue_details": issue_details,
             "status": "pending",
             "escalation_time": datetime.now().isoformat()
         }
-        self._save_json("escalations.json", self.escalations)
+        with self._locks["escalations"].write():
+            self.escalations.setdefault("escalations", {})[case_id] = escalation
+            self._append("escalations.json", "escalations", escalation, key=case_id)
         return True
     
     def get_escalation(self, case_id: str) -> Optional[Dict]:
-        return self.escalations.get("escalations", {}).get(case_id)
+        with self._locks["escalations"].read():
+            return self.escalations.get("escalations", {}).get(case_id)
     
     def update_escalation_status(self, case_id: str, status: str) -> bool:
-        if case_id in self.escalations.get("escalations", {}):
-            self.escalations["escalations"][case_id]["status"] = status
-            self._save_json("escalations.json", self.escalations)
-            return True
+        with self._locks["escalations"].write():
+            if case_id in self.escalations.get("escalations", {}):
+                escalation = self.escalations["escalations"][case_id]
+                escalation["status"] = status
+                self._append("escalations.json", "escalations", escalation, key=case_id)
+                return True
         return False
\ No newline at end of file
@@ -0,0 +1,181 @@
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# One alternation, so a message is tokenized in a single scan; earlier groups win at a position
+_TOKEN = re.compile(r"""
+    (?P<order>\bORD\d+\b)
+  | (?P<payment>\bPAY\d+\b)
+  | (?P<iso_date>\b\d{4}-\d{2}-\d{2}\b)
+  | (?P<dmy_date>\b\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2})\b)
+  | (?P<amount>(?:₹|\brs\.?|\binr)\s*(?P<value>\d[\d,]*(?:\.\d+)?)
+      | (?P<value_before>\d[\d,]*(?:\.\d+)?)\s*(?:rupees|rs|inr)\b)
+  | (?P<word>[^\W\d_]+)
+""", re.IGNORECASE | re.VERBOSE)
+
+_RELATIVE_DAYS = {"yesterday": -1, "today": 0, "tomorrow": 1}
+
+# Product-name words too generic to stand for an item on their own ("a set", "the pack")
+_GENERIC = {"bundle", "case", "fresh", "pack", "set"}
+
+# Plural and singular forms accepted on an item's last word
+_SUFFIXES = ("", "s", "es")
+
+
+def _item_words(name: str) -> List[str]:
+    """The words of a product name that can be matched, dropping sizes like "5kg" and "1L" """
+    return [w for w in (t.lower() for t in re.findall(r"\w+", name)) if w.isalpha() and len(w) > 2]
+
+
+def _parse_dmy(text: str) -> Optional[str]:
+    day, month, year = re.split(r"[/.-]", text)
+    year = int(year) + 2000 if len(year) == 2 else int(year)
+    try:
+        return date(year, int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+class EntityExtractor:
+    """Order IDs, payment IDs, amounts, dates and catalogue items from a message in one scan.
+
+    The item vocabulary is a word trie of every contiguous run of words in the product
+    names seen in orders ("amul milk" and "milk" from "Amul Milk 1L"), matched
+    leftmost-longest. With a ``data_handler`` the vocabulary is read from its orders on
+    first use and kept up to date from its change notifications. When the handler decodes
+    records on demand (lazy JSON, SQLite) that first read runs on a background thread
+    instead, and until it finishes items are matched against the names announced so far.
+    IDs are returned as found; checking them against a customer's records is up to the caller.
+    """
+
+    def __init__(self, data_handler=None, items: Iterable[str] = ()):
+        self.data_handler = data_handler
+        self._root: Dict = {}
+        self._lock = threading.Lock()
+        self._loaded = data_handler is None
+        self._loading = False
+        self._late: Optional[List[str]] = None  # names announced while a background read runs
+        self.add_items(items)
+        if data_handler is not None:
+            data_handler.add_listener(self._on_change)
+
+    def add_items(self, names: Iterable[str]) -> None:
+        with self._lock:
+            self._add_to(self._root, names)
+
+    @staticmethod
+    def _add_to(root: Dict, names: Iterable[str]) -> None:
+        for name in names:
+            words = _item_words(name)
+            for start in range(len(words)):
+                for end in range(start + 1, len(words) + 1):
+                    phrase = words[start:end]
+                    if len(phrase) == 1 and phrase[0] in _GENERIC:
+                        continue
+                    node = root
+                    for word in phrase[:-1]:
+                        node = node.setdefault(word, {})
+                    last = phrase[-1]
+                    forms = [last + suffix for suffix in _SUFFIXES] + ([last[:-1]] if last.endswith("s") else [])
+                    for form in forms:
+                        # Canonical phrase stored under the None key of the node it ends at
+                        node.setdefault(form, {}).setdefault(None, " ".join(phrase))
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if getattr(self.data_handler, "records_in_memory", True):
+            self._load()
+            return
+        with self._lock:
+            if self._loading or self._loaded:
+                return
+            self._loading = True
+            self._late = []
+        threading.Thread(target=self._load, name="entity-vocabulary", daemon=True).start()
+
+    def _load(self) -> None:
+        root: Dict = {}
+        try:
+            self._add_to(root, (item["name"] for order in self.data_handler.iter_records("orders")
+                                for item in order.get("items", [])))
+            with self._lock:
+                self._add_to(root, self._late or ())
+                self._root = root
+                self._loaded = True
+        finally:
+            with self._lock:
+                self._loading = False
+                self._late = None
+
+    def _on_change(self, collection: str, key: Optional[str], record: Optional[Dict]) -> None:
+        if collection != "orders":
+            return
+        if record is None:
+            self._loaded = False  # whole collection reloaded; rebuild on next use
+            return
+        names = [item["name"] for item in record.get("items", [])]
+        with self._lock:
+            self._add_to(self._root, names)
+            if self._late is not None:
+                self._late.extend(names)
+
+    def extract(self, message: str) -> Dict[str, List]:
+        """Entities in order of appearance, without duplicates; dates as ISO strings"""
+        self._ensure_loaded()
+        entities: Dict[str, List] = {"order_ids": [], "payment_ids": [], "amounts": [], "dates": [], "items": []}
+        words: List[Optional[str]] = []  # None breaks a phrase wherever another entity sat between words
+        for match in _TOKEN.finditer(message):
+            kind = match.lastgroup if match.lastgroup not in ("value", "value_before") else "amount"
+            text = match.group()
+            if kind == "word":
+                word = text.lower()
+                if word in _RELATIVE_DAYS:
+                    entities["dates"].append((date.today() + timedelta(days=_RELATIVE_DAYS[word])).isoformat())
+                    words.append(None)
+                else:
+                    words.append(word)
+                continue
+            words.append(None)
+            if kind == "order":
+                entities["order_ids"].append(text.upper())
+            elif kind == "payment":
+                entities["payment_ids"].append(text.upper())
+            elif kind == "amount":
+                entities["amounts"].append(float((match.group("value") or match.group("value_before")).replace(",", "")))
+            elif kind == "iso_date":
+                try:
+                    entities["dates"].append(datetime.strptime(text, "%Y-%m-%d").date().isoformat())
+                except ValueError:
+                    pass
+            else:
+                parsed = _parse_dmy(text)
+                if parsed:
+                    entities["dates"].append(parsed)
+        entities["items"] = self._match_items(words)
+        return {kind: list(dict.fromkeys(values)) for kind, values in entities.items()}
+
+    def _match_items(self, words: List[Optional[str]]) -> List[str]:
+        root = self._root
+        found = []
+        i, n = 0, len(words)
+        while i < n:
+            node = root.get(words[i]) if words[i] is not None else None
+            if node is None:
+                i += 1
+                continue
+            phrase, end, j = node.get(None), i + 1, i + 1
+            while j < n and words[j] is not None:
+                node = node.get(words[j])
+                if node is None:
+                    break
+                j += 1
+                if None in node:
+                    phrase, end = node[None], j
+            if phrase:
+                found.append(phrase)
+                i = end
+            else:
+                i += 1
+        return found
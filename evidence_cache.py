@@ -0,0 +1,132 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_THRESHOLD = 5
+HASH_BITS = 64
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour.
+
+    Survives rescaling, recompression and small colour edits, so a resubmitted photo hashes
+    within a few bits of the original.
+    """
+    pixels = image.convert("L").resize((9, 8), Image.BILINEAR).tobytes()  # one byte per pixel
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+class VerdictCache:
+    """Validation verdicts of evidence images, looked up by perceptual hash.
+
+    A hash within ``threshold`` bits (Hamming distance) of a stored one counts as the same
+    image. Each stored hash is split into ``threshold + 1`` bands with a bucket index per
+    band: two hashes that close must agree exactly on at least one band, so a lookup only
+    compares against the hashes sharing a bucket. At most ``max_size`` images are kept,
+    least recently seen first out; with a ``path`` the cache is loaded on start and saved
+    at interpreter exit like the intent cache.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, threshold: int = DEFAULT_THRESHOLD, path: Optional[str] = None):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # hash -> (customer_id, verdict, stored at)
+        bands = threshold + 1
+        edges = [HASH_BITS * i // bands for i in range(bands + 1)]
+        self._bands: List[Tuple[int, int]] = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._buckets: List[Dict[int, set]] = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def lookup(self, fingerprint: int) -> Optional[Tuple[str, Dict]]:
+        """(customer_id, verdict) of the closest stored image within the threshold, if any"""
+        with self._lock:
+            best, best_distance = None, self.threshold + 1
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                for candidate in buckets.get((fingerprint >> shift) & mask, ()):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            customer_id, verdict, _ = self._entries[best]
+            return customer_id, dict(verdict)
+
+    def record_reuse(self) -> None:
+        with self._lock:
+            self.reused += 1
+
+    def put(self, fingerprint: int, customer_id: str, verdict: Dict) -> None:
+        with self._lock:
+            self._put(fingerprint, customer_id, {'status': verdict['status'], 'message': verdict['message']}, time.time())
+
+    def _put(self, fingerprint: int, customer_id: str, verdict: Dict, stored_at: float) -> None:
+        if fingerprint not in self._entries:
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                buckets.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+        self._entries[fingerprint] = (customer_id, verdict, stored_at)
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            for (shift, mask), buckets in zip(self._bands, self._buckets):
+                key = (evicted >> shift) & mask
+                buckets[key].discard(evicted)
+                if not buckets[key]:
+                    del buckets[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "reused": self.reused,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load evidence cache {self.path}: {e}")
+            return
+        with self._lock:
+            # Stored oldest first, so replaying in order restores the LRU order
+            for fingerprint, (customer_id, verdict, stored_at) in stored.items():
+                self._put(int(fingerprint, 16), customer_id, verdict, stored_at)
+
+    def save(self) -> None:
+        with self._lock:
+            stored = {f"{fingerprint:016x}": list(entry) for fingerprint, entry in self._entries.items()}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not save evidence cache {self.path}: {e}")
+
+
+def verdict_cache_from_env() -> VerdictCache:
+    """Build the cache from EVIDENCE_CACHE_SIZE / EVIDENCE_HASH_THRESHOLD (bits) / EVIDENCE_CACHE_PATH"""
+    return VerdictCache(int(os.getenv("EVIDENCE_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+                        int(os.getenv("EVIDENCE_HASH_THRESHOLD", DEFAULT_THRESHOLD)),
+                        os.getenv("EVIDENCE_CACHE_PATH") or None)
@@ -1,14 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import json
 import logging
 from nlu_pipeline import NLUPipeline
-from subscription_manager import SubscriptionManager
 from datetime import datetime
 from dotenv import load_dotenv
 from resolution_engine import ResolutionEngine
 from validation_service import ValidationService
-from data_handler import DataHandler
+from validation_jobs import QueueFull, validation_jobs_from_env
+from image_ingest import ImageRejected
+from storage import get_repository
 
 # Logging setup
 logging.basicConfig(
@@ -24,22 +27,32 @@ load_dotenv()
 # Initialize components
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # Replace with your actual API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Add Gemini API key to .env
-data_handler = DataHandler()
-nlu = NLUPipeline(GROQ_API_KEY)
-subscription_manager = SubscriptionManager()
+repository = get_repository()
+data_handler = repository.data_handler
+subscription_manager = repository.subscription_manager
+nlu = NLUPipeline(GROQ_API_KEY, repository)
 resolution_engine = ResolutionEngine(data_handler)
 validation_service = ValidationService(GEMINI_API_KEY)
+validation_jobs = validation_jobs_from_env()
+MAX_BATCH_MESSAGES = int(os.getenv("MAX_BATCH_MESSAGES", 10000))
+MAX_EVIDENCE_IMAGES = int(os.getenv("MAX_EVIDENCE_IMAGES", 5))
+# Refuse oversized request bodies before they are parsed: every evidence image at its size
+# limit plus 1 MB for the form fields and multipart boundaries
+app.config['MAX_CONTENT_LENGTH'] = validation_service.ingestor.max_bytes * MAX_EVIDENCE_IMAGES + 1024 * 1024
 
 @app.route('/health', methods=['GET'])
 def health_check():
     logging.info("Health check endpoint called.")
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat(), 'intent_cache': nlu.intent_cache.stats(),
+                    'evidence_cache': validation_service.verdicts.stats(),
+                    'validation_jobs': validation_jobs.stats(),
+                    'circuits': {'groq': nlu.llm.guard.stats(), 'gemini': validation_service.guard.stats()}})
 
 @app.route('/customers', methods=['GET'])
 def get_customers():
     try:
         logging.info("Fetching customers via API endpoint.")
-        customers = nlu.data_handler.customers.get('customers', [])
+        customers = data_handler.list_customers()
         logging.info(f"Fetched {len(customers)} customers.")
         return jsonify({
             'customers': [
@@ -89,8 +102,7 @@ def chat():
             logging.warning("Chat endpoint called without message.")
             return jsonify({'error': 'Message is required'}), 400
         
-        intent = nlu.classify_intent(message)
-        response = nlu.generate_response(intent, message, customer_id)
+        intent, response = nlu.respond(message, customer_id)
         
         # Trigger resolution if applicable
         if intent in ['PAYMENT_PROBLEM', 'WALLET_ISSUE', 'REFUND_REQUEST']:
@@ -112,6 +124,87 @@ def chat():
             'details': str(e)
         }), 500
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming /chat: reply tokens as Server-Sent Events, then a 'done' event with intent and case ID"""
+    data = request.json
+    message = data.get('message', '')
+    customer_id = data.get('customer_id', 'WM001')
+    if not message:
+        logging.warning("Chat stream endpoint called without message.")
+        return jsonify({'error': 'Message is required'}), 400
+    
+    def events():
+        try:
+            intent = None
+            for kind, value in nlu.respond_stream(message, customer_id):
+                if kind == 'token':
+                    yield _sse('token', {'text': value})
+                else:
+                    intent = value
+            
+            # Trigger resolution if applicable
+            case_id = None
+            if intent in ['PAYMENT_PROBLEM', 'WALLET_ISSUE', 'REFUND_REQUEST']:
+                case_id = resolution_engine.process_intent(intent, message, customer_id)
+            
+            logging.info(f"Chat stream: Customer {customer_id}, Intent: {intent}, Message: {message}")
+            yield _sse('done', {
+                'intent': intent,
+                'case_id': case_id,
+                'customer_id': customer_id,
+                'timestamp': datetime.now().isoformat()
+            })
+        except Exception as e:
+            logging.error(f"Chat stream error: {e}")
+            yield _sse('error', {
+                'error': 'I apologize, but I encountered an error. Please try again.',
+                'details': str(e)
+            })
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Triage many messages at once; results stream back as NDJSON lines in completion order"""
+    data = request.json or {}
+    messages = data.get('messages')
+    if not isinstance(messages, list) or not messages:
+        logging.warning("Chat batch endpoint called without messages.")
+        return jsonify({'error': 'A non-empty list of messages is required'}), 400
+    if len(messages) > MAX_BATCH_MESSAGES:
+        return jsonify({'error': f'At most {MAX_BATCH_MESSAGES} messages per batch'}), 413
+    
+    items, indexes, rejected = [], [], []
+    for index, item in enumerate(messages):
+        if isinstance(item, dict) and item.get('message'):
+            items.append((item.get('customer_id', 'WM001'), item['message']))
+            indexes.append(index)
+        else:
+            rejected.append({'index': index, 'error': 'Message is required'})
+    logging.info(f"Chat batch: {len(items)} messages for {len(set(c for c, _ in items))} customers, {len(rejected)} rejected")
+    
+    def lines():
+        for result in rejected:
+            yield json.dumps(result) + "\n"
+        try:
+            for result in nlu.respond_batch(items):
+                customer_id, message = items[result['index']]
+                result['index'] = indexes[result['index']]
+                # Trigger resolution if applicable
+                if result.get('intent') in ['PAYMENT_PROBLEM', 'WALLET_ISSUE', 'REFUND_REQUEST']:
+                    result['case_id'] = resolution_engine.process_intent(result['intent'], message, customer_id)
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            logging.error(f"Chat batch error: {e}")
+            yield json.dumps({'error': 'Batch processing failed', 'details': str(e)}) + "\n"
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
 @app.route('/subscription', methods=['POST'])
 def create_subscription():
     try:
@@ -192,7 +285,11 @@ def get_analytics():
             'customer_satisfaction': 4.3,
             'top_issues': [
                 'Wallet balance discrepancy', 'Delivery delays', 'Payment failures', 'Order tracking', 'Subscription setup'
-            ]
+            ],
+            'order_status_counts': repository.columns.order_status_counts(),
+            'payment_status_counts': repository.columns.payment_status_counts(),
+            'failed_payment_amount': repository.columns.payment_total(status='failed'),
+            'wallet_total': repository.columns.wallet_total()
         }
         logging.info("Analytics data sent.")
         return jsonify(analytics)
@@ -200,6 +297,19 @@ def get_analytics():
         logging.error(f"Error in get_analytics: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _validation_response(validation_result):
+    # Generate reference ID
+    ref_id = f"REF-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    
+    return {
+        'status': validation_result.get('status'),
+        'message': 'Your refund request has been automatically approved based on the evidence provided.' if validation_result.get('status') == 'approved' else 'Your request requires additional review and has been escalated to our customer service team.',
+        'category': 'Refund Request',
+        'priority': 'Standard' if validation_result.get('status') == 'approved' else 'High',
+        'reference_id': ref_id,
+        'validation_details': validation_result
+    }
+
 @app.route('/validate', methods=['POST'])
 def validate_request():
     try:
@@ -207,29 +317,38 @@ def validate_request():
             logging.warning("Validate request called without file upload.")
             return jsonify({'error': 'No file uploaded'}), 400
             
-        file = request.files['file']
+        # Several 'file' parts are the photos of one claim, judged together in one model call
+        files = request.files.getlist('file')
+        if len(files) > MAX_EVIDENCE_IMAGES:
+            return jsonify({'error': f'At most {MAX_EVIDENCE_IMAGES} images per request'}), 400
         message = request.form.get('message', '')
         customer_id = request.form.get('customer_id', 'WM001')
         
-        logging.info(f"Processing validation request for customer {customer_id} with file {file.filename}")
+        logging.info(f"Processing validation request for customer {customer_id} with files {[f.filename for f in files]}")
         
-        # Get validation result from service
-        validation_result = validation_service.validate_request(file, message, customer_id)
+        # Uploads are read and downscaled here; the model call runs on the job pool
+        images, rejected = [], []
+        for file in files:
+            try:
+                images.append(validation_service.ingest(file))
+            except ImageRejected as e:
+                logging.info(f"Rejected upload {file.filename} from customer {customer_id}: {e}")
+                rejected.append(validation_service.rejected_file(file, e))
+        if not images:
+            return jsonify(_validation_response(validation_service.validate_images([], message, customer_id, rejected)))
+        try:
+            job = validation_jobs.submit(
+                lambda: _validation_response(validation_service.validate_images(images, message, customer_id, rejected)),
+                customer_id)
+        except QueueFull as e:
+            logging.warning(f"Validation queue full: {e}")
+            return jsonify({'error': 'Too many validations in progress, please retry shortly'}), 503, {'Retry-After': '5'}
         
-        # Generate reference ID
-        ref_id = f"REF-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Prepare response
-        response_data = {
-            'status': validation_result.get('status'),
-            'message': 'Your refund request has been automatically approved based on the evidence provided.' if validation_result.get('status') == 'approved' else 'Your request requires additional review and has been escalated to our customer service team.',
-            'category': 'Refund Request',
-            'priority': 'Standard' if validation_result.get('status') == 'approved' else 'High',
-            'reference_id': ref_id,
-            'validation_details': validation_result
-        }
-        
-        return jsonify(response_data)
+        logging.info(f"Queued validation job {job.job_id} for customer {customer_id}")
+        return jsonify(dict(job.to_dict(), status_url=f"/validate/{job.job_id}")), 202, {'Location': f"/validate/{job.job_id}"}
+    except RequestEntityTooLarge:
+        logging.warning(f"Validate request over the {app.config['MAX_CONTENT_LENGTH']} byte limit")
+        return jsonify({'error': f"Request is over the {app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024):g} MB limit"}), 413
     except Exception as e:
         logging.error(f"Error in validate_request: {e}")
         return jsonify({
@@ -240,6 +359,18 @@ def validate_request():
             'reference_id': f"REF-ERR-{datetime.now().strftime('%Y%m%d%H%M%S')}"
         }), 500
 
+@app.route('/validate/<job_id>', methods=['GET'])
+def validation_status(job_id):
+    """State of a validation job of ``?customer_id=``; ``?wait=<seconds>`` long-polls until it is done"""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    job = validation_jobs.get(job_id, wait, customer_id=request.args.get('customer_id', 'WM001'))
+    if job is None:
+        return jsonify({'error': 'Unknown or expired validation job'}), 404
+    return jsonify(job.to_dict())
+
 if __name__ == '__main__':
     if not os.path.exists('mock_data'):
         os.makedirs('mock_data')
@@ -249,10 +380,13 @@ if __name__ == '__main__':
     print("- GET /customers - Get all customers")
     print("- GET /customer/<id> - Get customer details")
     print("- POST /chat - Chat with AI assistant")
+    print("- POST /chat/stream - Chat with streamed reply (Server-Sent Events)")
+    print("- POST /chat/batch - Triage a list of messages (NDJSON results)")
     print("- POST /subscription - Create a subscription")
     print("- GET /subscriptions/<customer_id> - Get customer subscriptions")
     print("- POST /subscription/cancel/<subscription_id> - Cancel a subscription")
     print("- GET /subscription/notifications/<customer_id> - Get subscription notifications")
     print("- GET /analytics - Get analytics data")
-    print("- POST /validate - Validate request with file")
+    print("- POST /validate - Queue validation of a request with one or more files (202 + job ID)")
+    print("- GET /validate/<job_id> - Validation job status and result (?wait= to long-poll)")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
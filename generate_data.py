@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from data_handler import DATA_FILES
+
+# Seeded generator of schema-compatible data at scale, e.g.
+#   python generate_data.py --customers 100000 --out /tmp/scale_data
+#   python generate_data.py --customers 1000000 --db /tmp/scale.db
+# Records are produced customer by customer and streamed straight to the output files (or
+# SQLite in batched transactions), so memory stays bounded by one customer's records no
+# matter how large the dataset is. Orders per customer, failure rates and locations are
+# skewed so a few heavy customers dominate, as in production traffic.
+
+CATALOGUE = [
+    ("Basmati Rice Fortune 5kg", 450.0, "Groceries"),
+    ("Fortune Sunflower Oil 1L", 180.0, "Groceries"),
+    ("Tide Detergent 1kg", 250.0, "Household"),
+    ("Amul Milk 1L", 60.0, "Dairy"),
+    ("Britannia Biscuits Pack", 150.0, "Snacks"),
+    ("Fresh Vegetables Bundle", 300.0, "Fresh"),
+    ("Samsung Galaxy Earbuds", 8999.0, "Electronics"),
+    ("Phone Case", 299.0, "Accessories"),
+    ("Laptop HP Pavilion", 45000.0, "Electronics"),
+    ("Glassware Set", 1500.0, "Home"),
+    ("Yoga Mat", 899.0, "Fitness"),
+    ("Protein Powder", 1299.0, "Health"),
+]
+# Cheap everyday items are bought far more often than electronics
+CATALOGUE_WEIGHTS = [30, 25, 20, 40, 30, 35, 3, 8, 1, 5, 6, 8]
+
+FIRST_NAMES = ["Priya", "Rahul", "Anita", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera", "Aditya"]
+LAST_NAMES = ["Sharma", "Kumar", "Patel", "Singh", "Reddy", "Gupta", "Iyer", "Nair", "Das", "Mehta"]
+LOCATIONS = [("Mumbai, Maharashtra", 30), ("Delhi, NCR", 30), ("Bangalore, Karnataka", 20),
+             ("Pune, Maharashtra", 10), ("Hyderabad, Telangana", 6), ("Chennai, Tamil Nadu", 4)]
+ORDER_STATUSES = [("delivered", 70), ("shipped", 10), ("processing", 8), ("pending", 5), ("cancelled", 7)]
+PAYMENT_METHODS = [("upi", 40), ("card", 30), ("wallet", 15), ("cod", 15)]
+GATEWAYS = {"upi": ["PhonePe", "Paytm"], "card": ["Razorpay"], "wallet": ["Walmart Wallet"], "cod": ["Cash on Delivery"]}
+PAYMENT_ERRORS = ["Insufficient funds in card", "UPI transaction timeout", "Bank server unavailable", "Card declined by issuer"]
+DELIVERY_PARTNERS = ["Walmart Spark", "BlueDart", "FedEx"]
+ESCALATION_ISSUES = ["I want a refund for {order} because the item was damaged.",
+                     "Payment for {order} was deducted twice.",
+                     "{order} has not arrived yet."]
+
+START_DATE = date(2023, 1, 1)
+HISTORY_DAYS = 730
+
+
+def _weighted(rng: random.Random, choices: List[Tuple[str, int]]) -> str:
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+def _orders_for_customer(rng: random.Random, mean_orders: float) -> int:
+    """Heavy-tailed order count: Pareto with alpha 1.5 has mean 3, scaled to ``mean_orders``"""
+    return min(int(rng.paretovariate(1.5) * mean_orders / 3), int(mean_orders * 200))
+
+
+def generate(customers: int, mean_orders: float = 5.0, seed: int = 42,
+             subscription_rate: float = 0.2, escalation_rate: float = 0.02) -> Iterator[Tuple[str, Optional[str], Dict]]:
+    """Yield ``(collection, key, record)`` for the whole dataset, one customer's records at a time.
+
+    ``key`` is only set for escalations, which are stored keyed by case ID rather than in a list.
+    """
+    rng = random.Random(seed)
+    order_seq = payment_seq = subscription_seq = 0
+    for c in range(1, customers + 1):
+        customer_id = f"WM{c:03d}"
+        join_date = START_DATE + timedelta(days=rng.randrange(HISTORY_DAYS // 2))
+        # A minority of customers has persistent payment trouble
+        failure_rate = 0.3 if rng.random() < 0.05 else 0.02
+        method_bias = _weighted(rng, PAYMENT_METHODS)
+        address = f"House No. {rng.randint(1, 999)}, Sector {rng.randint(1, 80)}"
+        orders, payments = [], []
+        for _ in range(_orders_for_customer(rng, mean_orders)):
+            order_seq += 1
+            payment_seq += 1
+            order_id = f"ORD{order_seq:03d}"
+            order_date = join_date + timedelta(days=rng.randrange(HISTORY_DAYS - (join_date - START_DATE).days))
+            items = []
+            for name, price, category in rng.choices(CATALOGUE, weights=CATALOGUE_WEIGHTS, k=rng.randint(1, 4)):
+                if not any(i["name"] == name for i in items):
+                    items.append({"name": name, "price": price, "quantity": rng.choice((1, 1, 1, 2, 3)), "category": category})
+            total = round(sum(i["price"] * i["quantity"] for i in items), 2)
+            method = method_bias if rng.random() < 0.8 else _weighted(rng, PAYMENT_METHODS)
+            status = _weighted(rng, ORDER_STATUSES)
+            expected = order_date + timedelta(days=rng.randint(1, 5))
+            orders.append({
+                "order_id": order_id,
+                "customer_id": customer_id,
+                "status": status,
+                "order_date": order_date.isoformat(),
+                "delivery_date": expected.isoformat() if status == "delivered" else None,
+                "expected_delivery": expected.isoformat(),
+                "items": items,
+                "total_amount": total,
+                "payment_method": method,
+                "delivery_address": address,
+                "tracking_id": f"TRK{order_seq:03d}",
+                "delivery_partner": rng.choice(DELIVERY_PARTNERS),
+            })
+            payment = {
+                "payment_id": f"PAY{payment_seq:03d}",
+                "customer_id": customer_id,
+                "order_id": order_id,
+                "amount": total,
+                "status": "completed",
+                "method": method,
+                "timestamp": f"{order_date.isoformat()}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z",
+                "transaction_id": f"TXN{payment_seq:03d}",
+                "gateway": rng.choice(GATEWAYS[method]),
+            }
+            if status == "cancelled":
+                payment.update(status="refunded", refund_amount=total, refund_date=payment["timestamp"])
+            elif rng.random() < failure_rate:
+                payment.update(status="failed", error=rng.choice(PAYMENT_ERRORS))
+            elif status == "pending" or method == "cod" and status != "delivered":
+                payment["status"] = "pending"
+            payments.append(payment)
+        orders.sort(key=lambda o: o["order_date"])
+        yield "customers", None, {
+            "customer_id": customer_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"customer{c}@example.com",
+            "phone": f"+91-9{rng.randrange(10 ** 9):09d}",
+            "wallet_balance": float(rng.choice((0, 0, 0, 50, 100, 250, 500))),
+            "membership": "Walmart+" if rng.random() < 0.3 else "Regular",
+            "location": _weighted(rng, LOCATIONS),
+            "join_date": join_date.isoformat(),
+            "recent_orders": [o["order_id"] for o in orders[-2:]],
+            "total_spent": round(sum(p["amount"] for p in payments if p["status"] == "completed"), 2),
+            "preferred_language": "Hindi" if rng.random() < 0.25 else "English",
+        }
+        for order in orders:
+            yield "orders", None, order
+        for payment in payments:
+            yield "payments", None, payment
+        if rng.random() < subscription_rate:
+            for _ in range(rng.randint(1, 2)):
+                subscription_seq += 1
+                name, price, _category = rng.choices(CATALOGUE, weights=CATALOGUE_WEIGHTS)[0]
+                yield "subscriptions", None, {
+                    "subscription_id": f"SUB{subscription_seq:03d}",
+                    "customer_id": customer_id,
+                    "items": [{"name": name, "price": price, "quantity": 1}],
+                    "delivery_date": (START_DATE + timedelta(days=HISTORY_DAYS + rng.randrange(60))).isoformat(),
+                    "subscription_type": rng.choice(("weekly", "monthly")),
+                    "status": "active" if rng.random() < 0.9 else "cancelled",
+                    "created_at": datetime.combine(join_date, datetime.min.time()).isoformat(),
+                }
+        if orders and rng.random() < escalation_rate:
+            case_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            yield "escalations", case_id, {
+                "customer_id": customer_id,
+                "issue_details": rng.choice(ESCALATION_ISSUES).format(order=rng.choice(orders)["order_id"]),
+                "status": "pending",
+                "escalation_time": datetime.combine(START_DATE + timedelta(days=HISTORY_DAYS), datetime.min.time()).isoformat(),
+            }
+
+
+class JsonWriter:
+    """Streams each collection to its data file one record per line.
+
+    Files are written to ``<file>.tmp`` and moved into place on ``close()``; stale journals
+    are removed at the same time, since they describe the previous snapshot.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._files = {}
+        self._counts = {}
+        for filename in DATA_FILES:
+            collection = filename[:-len(".json")]
+            f = open(os.path.join(out_dir, filename + ".tmp"), 'w')
+            f.write(f'{{\n  "{collection}": ' + ("{" if collection == "escalations" else "["))
+            self._files[collection] = f
+            self._counts[collection] = 0
+
+    def write(self, collection: str, key: Optional[str], record: Dict) -> None:
+        f = self._files[collection]
+        f.write(",\n    " if self._counts[collection] else "\n    ")
+        if key is not None:
+            f.write(json.dumps(key) + ": ")
+        f.write(json.dumps(record))
+        self._counts[collection] += 1
+
+    def close(self) -> Dict[str, int]:
+        for collection, f in self._files.items():
+            closing = "}" if collection == "escalations" else "]"
+            f.write(f"\n  {closing}\n}}\n" if self._counts[collection] else f"{closing}\n}}\n")
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+            path = os.path.join(self.out_dir, f"{collection}.json")
+            os.replace(path + ".tmp", path)
+            if os.path.exists(path + ".journal"):
+                os.remove(path + ".journal")
+        return dict(self._counts)
+
+
+class SQLiteWriter:
+    """Bulk-loads records into the SQLite backend, committing every ``batch_size`` records.
+
+    Each batch logs one whole-table change per collection it touched rather than a change
+    per record, so running servers reload those tables once.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 10000):
+        from storage import SQLiteDatabase  # storage pulls in the whole backend stack; only needed here
+        self.db = SQLiteDatabase(db_path)
+        self.batch_size = batch_size
+        self._conn = None
+        self._in_batch = 0
+        self._touched: Set[str] = set()
+        self._counts: Dict[str, int] = {}
+
+    def write(self, collection: str, key: Optional[str], record: Dict) -> None:
+        if self._conn is None:
+            self._conn = self.db.connection()
+            self._conn.execute("BEGIN IMMEDIATE")
+        self.db.upsert(self._conn, collection, record, key=key, log=False)
+        self._touched.add(collection)
+        self._counts[collection] = self._counts.get(collection, 0) + 1
+        self._in_batch += 1
+        if self._in_batch >= self.batch_size:
+            self._commit()
+
+    def _commit(self) -> None:
+        if self._conn is not None:
+            for collection in sorted(self._touched):
+                self.db.log_change(self._conn, collection, None)
+            self._touched.clear()
+            self._conn.execute("COMMIT")
+            self._conn = None
+            self._in_batch = 0
+
+    def close(self) -> Dict[str, int]:
+        self._commit()
+        return dict(self._counts)
+
+
+def load(records: Iterator[Tuple[str, Optional[str], Dict]], writers: List) -> List[Dict[str, int]]:
+    """Feed a record stream to every writer and return each writer's per-collection counts"""
+    for collection, key, record in records:
+        for writer in writers:
+            writer.write(collection, key, record)
+    return [writer.close() for writer in writers]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic dataset for scale testing")
+    parser.add_argument("--customers", type=int, default=1000, help="number of customers (10^3 to 10^7)")
+    parser.add_argument("--mean-orders", type=float, default=5.0, help="average orders per customer")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--subscription-rate", type=float, default=0.2, help="share of customers with subscriptions")
+    parser.add_argument("--escalation-rate", type=float, default=0.02, help="share of customers with an open escalation")
+    parser.add_argument("--out", help="directory to write the JSON data files to")
+    parser.add_argument("--db", help="SQLite database to bulk-load into")
+    parser.add_argument("--batch-size", type=int, default=10000, help="records per SQLite transaction")
+    args = parser.parse_args()
+    if not args.out and not args.db:
+        parser.error("at least one of --out or --db is required")
+    writers = []
+    if args.out:
+        writers.append(JsonWriter(args.out))
+    if args.db:
+        writers.append(SQLiteWriter(args.db, args.batch_size))
+    records = generate(args.customers, args.mean_orders, args.seed, args.subscription_rate, args.escalation_rate)
+    for target, counts in zip([t for t in (args.out, args.db) if t], load(records, writers)):
+        print(f"{target}: " + ", ".join(f"{count} {collection}" for collection, count in counts.items()))
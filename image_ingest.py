@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 50_000_000
+DEFAULT_MAX_SIDE = 1024
+DEFAULT_QUALITY = 85
+
+# Uploads up to this size stay in memory; larger ones are spooled to a temp file
+SPOOL_MEMORY = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+_ORIENTATION = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180, 4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE, 6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class ImageRejected(ValueError):
+    """The upload is too large, has too many pixels or is not a readable image"""
+
+
+@dataclass
+class IngestedImage:
+    image: Image.Image  # downscaled RGB image, upright
+    jpeg: bytes  # what is sent to the model
+    upload_bytes: int
+    original_size: tuple
+    name: str = ""  # upload filename, for reporting which file a verdict is about
+
+
+class ImageIngestor:
+    """Turns an uploaded file into a right-sized JPEG without holding the original in memory.
+
+    The upload is copied in chunks to a spooled temp file, failing as soon as it exceeds
+    ``max_bytes``. Only the header is read before the pixel count is checked against
+    ``max_pixels``. JPEGs are then decoded with ``draft()`` straight at a reduced DCT
+    scale, other formats are shrunk with ``reduce()``, and the result is fitted within
+    ``max_side`` and re-encoded at ``quality``.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_pixels: int = DEFAULT_MAX_PIXELS,
+                 max_side: int = DEFAULT_MAX_SIDE, quality: int = DEFAULT_QUALITY):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.max_side = max_side
+        self.quality = quality
+
+    def ingest(self, stream: BinaryIO) -> IngestedImage:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY) as spool:
+            size = self._spool(stream, spool)
+            spool.seek(0)
+            try:
+                with Image.open(spool) as img:
+                    original_size = img.size
+                    if img.width * img.height > self.max_pixels:
+                        raise ImageRejected(f"Image is {img.width}x{img.height}, over the {self.max_pixels} pixel limit")
+                    image = self._downscale(img)
+            except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+                raise ImageRejected("Upload is not a readable image") from e
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=self.quality, optimize=True)
+        return IngestedImage(image, out.getvalue(), size, original_size)
+
+    def _spool(self, stream: BinaryIO, spool) -> int:
+        size = 0
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                return size
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ImageRejected(f"Upload is over the {self.max_bytes / (1024 * 1024):g} MB limit")
+            spool.write(chunk)
+
+    def _downscale(self, img: Image.Image) -> Image.Image:
+        if img.format == "JPEG":
+            img.draft("RGB", (self.max_side, self.max_side))  # decoder picks the smallest scale still >= max_side
+        factor = max(img.width, img.height) // self.max_side
+        image = img.reduce(factor) if factor > 1 else img
+        orientation = _ORIENTATION.get(img.getexif().get(0x0112))  # phones store photos sideways plus an EXIF tag
+        if orientation is not None:
+            image = image.transpose(orientation)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((self.max_side, self.max_side))
+        return image if image is not img else img.copy()
+
+
+def ingestor_from_env() -> ImageIngestor:
+    """Limits from MAX_UPLOAD_BYTES / MAX_IMAGE_PIXELS; output size from VALIDATION_IMAGE_SIDE / VALIDATION_JPEG_QUALITY"""
+    return ImageIngestor(int(os.getenv("MAX_UPLOAD_BYTES", DEFAULT_MAX_BYTES)),
+                         int(os.getenv("MAX_IMAGE_PIXELS", DEFAULT_MAX_PIXELS)),
+                         int(os.getenv("VALIDATION_IMAGE_SIDE", DEFAULT_MAX_SIDE)),
+                         int(os.getenv("VALIDATION_JPEG_QUALITY", DEFAULT_QUALITY)))
@@ -0,0 +1,90 @@
+import os
+import uuid
+from typing import Dict, Optional
+import numpy as np
+from PIL import Image
+from image_ingest import IngestedImage
+
+DEFAULT_MIN_SIDE = 200
+DEFAULT_MIN_STD = 6.0
+DEFAULT_MIN_ENTROPY = 2.0
+DEFAULT_MIN_SHARPNESS = 4.0
+# Share of pixels on the four most common grey levels above which a sharp, low-entropy image is taken
+# for a screenshot (flat UI or page background); photos spread over many levels
+DEFAULT_MAX_FLAT_SHARE = 0.5
+SCREENSHOT_MAX_ENTROPY = 5.0
+
+# Statistics are computed on a grayscale copy at most this many pixels across
+SCREEN_SIDE = 512
+
+
+def image_stats(image: Image.Image) -> Dict[str, float]:
+    """Contrast (std of grey levels), histogram entropy in bits, Laplacian-variance sharpness and
+    the share of pixels on the four most common grey levels"""
+    gray = image.convert("L")
+    gray.thumbnail((SCREEN_SIDE, SCREEN_SIDE))
+    pixels = np.asarray(gray, dtype=np.float32)
+    histogram = np.bincount(pixels.astype(np.uint8).ravel(), minlength=256) / pixels.size
+    nonzero = histogram[histogram > 0]
+    laplacian = (pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+                 - 4 * pixels[1:-1, 1:-1])
+    return {
+        "std": float(pixels.std()),
+        "entropy": float(-(nonzero * np.log2(nonzero)).sum()),
+        "sharpness": float(laplacian.var()) if laplacian.size else 0.0,
+        "flat_share": float(np.sort(histogram)[-4:].sum()),
+    }
+
+
+class ImageScreener:
+    """Decides evidence images that need no model: too small, blank, badly blurred, or screenshots.
+
+    ``screen()`` returns a verdict for those and None for plausible photos, which go on
+    to the model. Blank, tiny and blurred uploads are rejected with a request for a new
+    photo; screenshots (large flat background with sharp edges, as with text on a page)
+    may be a legitimate receipt, so they are escalated to a person instead.
+    """
+
+    def __init__(self, min_side: int = DEFAULT_MIN_SIDE, min_std: float = DEFAULT_MIN_STD,
+                 min_entropy: float = DEFAULT_MIN_ENTROPY, min_sharpness: float = DEFAULT_MIN_SHARPNESS,
+                 max_flat_share: float = DEFAULT_MAX_FLAT_SHARE):
+        self.min_side = min_side
+        self.min_std = min_std
+        self.min_entropy = min_entropy
+        self.min_sharpness = min_sharpness
+        self.max_flat_share = max_flat_share
+
+    def screen(self, image: IngestedImage) -> Optional[Dict]:
+        if min(image.original_size) < self.min_side:
+            return self._rejected("tiny", "The image is too small to assess damage. Please upload a full-size photo.")
+        stats = image_stats(image.image)
+        flat = stats["entropy"] < self.min_entropy and stats["sharpness"] < self.min_sharpness
+        if stats["std"] < self.min_std or flat:
+            return self._rejected("blank", "The image appears to be blank. Please upload a photo of the item.")
+        if (stats["flat_share"] > self.max_flat_share and stats["entropy"] < SCREENSHOT_MAX_ENTROPY
+                and stats["sharpness"] >= self.min_sharpness):
+            return {
+                'status': 'escalated',
+                'case_id': str(uuid.uuid4()),
+                'screen': 'screenshot',
+                'message': 'The image looks like a screenshot or document rather than a photo of the item. Case escalated for human review.'
+            }
+        if stats["sharpness"] < self.min_sharpness:
+            return self._rejected("blurry", "The image is too blurry to assess damage. Please retake the photo.")
+        return None
+
+    @staticmethod
+    def _rejected(reason: str, message: str) -> Dict:
+        return {'status': 'rejected', 'screen': reason, 'message': message}
+
+
+def screener_from_env() -> Optional[ImageScreener]:
+    """Thresholds from SCREEN_MIN_SIDE / SCREEN_MIN_STD / SCREEN_MIN_ENTROPY / SCREEN_MIN_SHARPNESS /
+    SCREEN_MAX_FLAT_SHARE; None (every image goes to the model) with IMAGE_SCREENING=0"""
+    if os.getenv("IMAGE_SCREENING", "1") == "0":
+        return None
+    return ImageScreener(int(os.getenv("SCREEN_MIN_SIDE", DEFAULT_MIN_SIDE)),
+                         float(os.getenv("SCREEN_MIN_STD", DEFAULT_MIN_STD)),
+                         float(os.getenv("SCREEN_MIN_ENTROPY", DEFAULT_MIN_ENTROPY)),
+                         float(os.getenv("SCREEN_MIN_SHARPNESS", DEFAULT_MIN_SHARPNESS)),
+                         float(os.getenv("SCREEN_MAX_FLAT_SHARE", DEFAULT_MAX_FLAT_SHARE)))
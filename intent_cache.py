@@ -0,0 +1,104 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_TTL = 3600.0
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(message: str) -> str:
+    """Cache key for a message: lower-cased words, punctuation and spacing dropped"""
+    return " ".join(_WORD.findall(message.lower()))
+
+
+class IntentCache:
+    """Bounded cache of LLM intent classifications keyed by normalized message text.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is evicted once
+    ``max_size`` is reached. With a ``path`` the cache is loaded from that file on start
+    (dropping expired entries) and saved back at interpreter exit, so a restarted worker
+    starts warm.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl: float = DEFAULT_TTL, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (intent, stored at as time.time())
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, message: str) -> Optional[str]:
+        key = normalize(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, message: str, intent: str) -> None:
+        key = normalize(message)
+        with self._lock:
+            self._entries[key] = (intent, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not load intent cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            # Stored oldest first, so replaying in order restores the LRU order
+            for key, (intent, stored_at) in stored.items():
+                if now - stored_at <= self.ttl:
+                    self._entries[key] = (intent, stored_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        with self._lock:
+            stored = {key: list(entry) for key, entry in self._entries.items()}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not save intent cache {self.path}: {e}")
+
+
+def intent_cache_from_env() -> IntentCache:
+    """Build the cache from INTENT_CACHE_SIZE / INTENT_CACHE_TTL (seconds) / INTENT_CACHE_PATH"""
+    return IntentCache(int(os.getenv("INTENT_CACHE_SIZE", DEFAULT_MAX_SIZE)),
+                       float(os.getenv("INTENT_CACHE_TTL", DEFAULT_TTL)),
+                       os.getenv("INTENT_CACHE_PATH") or None)
@@ -0,0 +1,83 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+_WORD = re.compile(r"\w+")
+
+# Inflections accepted on a keyword's last word, so "delay" also matches "delayed"
+SUFFIXES = ("", "s", "es", "d", "ed", "ing")
+
+Keyword = Union[str, Tuple[str, float]]
+
+
+class KeywordMatcher:
+    """Keyword table compiled into a word trie, matched in a single pass over a message.
+
+    The message is split into words once and matched leftmost-longest against the trie,
+    so keywords only hit on word boundaries and overlapping keywords resolve to the
+    longest. A keyword weighs its number of words by default ("wallet empty" counts as
+    much as "wallet" and "wallet empty" did as separate substring hits); an explicit
+    weight can be given as ``(keyword, weight)``.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[Keyword]], default: str = 'GENERAL_INQUIRY'):
+        self.default = default
+        self.intents = list(keywords)
+        self._root: Dict = {}
+        for position, (intent, entries) in enumerate(keywords.items()):
+            for entry in entries:
+                keyword, weight = entry if isinstance(entry, tuple) else (entry, float(len(entry.split())))
+                self._add(_WORD.findall(keyword.lower()), position, weight)
+
+    def _add(self, words: List[str], position: int, weight: float) -> None:
+        node = self._root
+        for word in words[:-1]:
+            node = node.setdefault(word, {})
+        for suffix in SUFFIXES:
+            # Terminal hits are stored under the None key of the node the keyword ends at
+            node.setdefault(words[-1] + suffix, {}).setdefault(None, []).append((position, weight))
+
+    def scores(self, message: str) -> List[float]:
+        """Score per intent, in the order of the keyword table"""
+        scores = [0.0] * len(self.intents)
+        words = _WORD.findall(message.lower())
+        root = self._root
+        i, n = 0, len(words)
+        while i < n:
+            node = root.get(words[i])
+            if node is None:
+                i += 1
+                continue
+            hits, end, j = node.get(None), i + 1, i + 1
+            while j < n:
+                node = node.get(words[j])
+                if node is None:
+                    break
+                j += 1
+                if None in node:
+                    hits, end = node[None], j
+            if hits:
+                for position, weight in hits:
+                    scores[position] += weight
+                i = end
+            else:
+                i += 1
+        return scores
+
+    def classify(self, message: str) -> str:
+        return self._best(self.scores(message))
+
+    def classify_batch(self, messages: Iterable[str]) -> List[str]:
+        return [self._best(self.scores(message)) for message in messages]
+
+    def match(self, message: str) -> Tuple[str, float]:
+        """Best intent and its score (0 when nothing matched and the default is returned)"""
+        scores = self.scores(message)
+        return self._best(scores), max(scores, default=0.0)
+
+    def _best(self, scores: List[float]) -> str:
+        best: Optional[int] = None
+        for position, score in enumerate(scores):
+            # Ties go to the intent listed first, as with max() over the table
+            if score and (best is None or score > scores[best]):
+                best = position
+        return self.intents[best] if best is not None else self.default
@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locking, single-process use only
+    fcntl = None
+
+COMPACT_EVERY = 500
+
+class Journal:
+    """Append-only write-ahead journal for a single JSON data file.
+
+    Each mutation appends the changed record as one JSON line to ``<file>.journal``.
+    On load the journal is replayed over the snapshot, and after ``compact_every``
+    appends the document returned by ``snapshot`` is written back to the file and the
+    journal truncated. With a ``flusher`` attached, appends are buffered in memory and
+    written in batches from the flusher's thread instead of on the caller's.
+
+    Several processes may share the files: every entry carries the writer's ID so
+    ``poll()`` can hand back only the entries other processes appended, and appends
+    and compaction coordinate through an flock on ``<file>.lock``.
+    """
+
+    def __init__(self, file_path: str, compact_every: int = COMPACT_EVERY,
+                 snapshot: Optional[Callable[[], Dict]] = None, flusher=None, lock=None):
+        self.file_path = file_path
+        self.journal_path = file_path + ".journal"
+        self.compact_every = compact_every
+        self.snapshot = snapshot
+        self.flusher = flusher
+        self.lock = lock  # ReadWriteLock guarding the document, held while the snapshot is serialized
+        self.pending = 0
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.snapshot_sig: Optional[Tuple[int, int, int]] = None  # identity of the snapshot the document was built from
+        self._read_offset = 0  # journal bytes already reflected in the document
+        self._buffer: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        # Held from taking buffered lines to having written them, so batches land in order and
+        # compaction cannot remove the journal in between. Order: document lock, this, file lock.
+        self._flush_lock = threading.RLock()
+        self._held = threading.local()  # exclusive file lock taken by this thread through exclusive()
+
+    @staticmethod
+    def signature(stat: os.stat_result) -> Tuple[int, int, int]:
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Cross-process lock: shared for appends, exclusive for compaction"""
+        if fcntl is None or getattr(self._held, "exclusive", False):
+            yield
+            return
+        with open(self.file_path + ".lock", 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the cross-process lock exclusively for a read-modify-write, such as allocating an ID.
+
+        Inside, ``poll()`` sees every other process's entries and appends are written straight
+        through, so the next holder sees them too. Take the document lock first, as compaction does.
+        """
+        if getattr(self._held, "exclusive", False):
+            yield
+            return
+        with self._flush_lock, self._file_lock(exclusive=True):
+            self._held.exclusive = True
+            try:
+                yield
+            finally:
+                self._held.exclusive = False
+
+    def replay(self, data: Dict) -> int:
+        """Apply journalled records to freshly loaded snapshot data, dropping a torn tail"""
+        positions: Dict[str, Dict[str, int]] = {}
+        applied = 0
+        for entry in self.entries():
+            self._apply(data, entry, positions)
+            applied += 1
+        return applied
+
+    def entries(self) -> Iterator[Dict]:
+        """Yield the intact journal entries in order, truncating a torn tail once exhausted"""
+        self._read_offset = 0
+        if not os.path.exists(self.journal_path):
+            self.pending = 0
+            return
+        count = 0
+        good_offset = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # partial write from a crash; everything after it is discarded
+                if not line.endswith(b"\n"):
+                    break
+                good_offset += len(line)
+                count += 1
+                yield entry
+        if good_offset != os.path.getsize(self.journal_path):
+            self._truncate_torn_tail(good_offset)
+        self.pending = count
+        self._read_offset = good_offset
+
+    def _truncate_torn_tail(self, offset: int) -> None:
+        """Cut the journal at the first broken line after ``offset``, if it is really torn.
+
+        Appenders hold the file lock shared, so under the exclusive lock an incomplete line is
+        a crashed write rather than one in progress. Complete entries appended since the read
+        are kept; they are past the read offset and ``poll()`` picks them up.
+        """
+        with self._file_lock(exclusive=True):
+            try:
+                f = open(self.journal_path, 'r+b')
+            except FileNotFoundError:
+                return  # compacted away meanwhile
+            with f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                    offset += len(line)
+                else:
+                    return
+                print(f"Warning: discarding torn journal tail in {self.journal_path}")
+                f.truncate(offset)
+
+    def _read_tail(self) -> Tuple[List[Dict], int]:
+        """Complete entries after the read offset; a line still being written is left for next time"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._read_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], self._read_offset
+        end = data.rfind(b"\n") + 1
+        entries = [json.loads(line) for line in data[:end].splitlines() if line]
+        return entries, self._read_offset + end
+
+    def poll(self) -> Optional[List[Dict]]:
+        """Entries other processes appended since the last look, or None if the snapshot was replaced.
+
+        A replaced snapshot means another process compacted, possibly folding in entries never
+        seen here, so the caller must reload the whole document.
+        """
+        if self.snapshot_sig is None:
+            return []  # not loaded yet, nothing can be stale
+        try:
+            current = self.signature(os.stat(self.file_path))
+        except FileNotFoundError:
+            current = None
+        if current != self.snapshot_sig:
+            return None
+        entries, self._read_offset = self._read_tail()
+        return [e for e in entries if e.get("writer") != self.writer_id]
+
+    def _apply(self, data: Dict, entry: Dict, positions: Dict[str, Dict[str, int]]) -> None:
+        collection = entry["collection"]
+        record = entry["record"]
+        key_field = entry.get("key_field")
+        if key_field is None:
+            data.setdefault(collection, {})[entry["key"]] = record
+            return
+        records = data.setdefault(collection, [])
+        if collection not in positions:
+            positions[collection] = {r[key_field]: i for i, r in enumerate(records)}
+        index = positions[collection]
+        key = record[key_field]
+        if key in index:
+            records[index[key]] = record
+        else:
+            index[key] = len(records)
+            records.append(record)
+
+    def append(self, collection: str, record: Dict, key_field: Optional[str] = None, key: Optional[str] = None) -> None:
+        """Append one mutated record, compacting into the snapshot when the journal grows large.
+
+        List collections are keyed by ``key_field`` inside the record, dict collections
+        (such as escalations) by an explicit ``key``.
+        """
+        entry = {"collection": collection, "key_field": key_field, "key": key, "record": record, "writer": self.writer_id}
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        if self.flusher is None or getattr(self._held, "exclusive", False):
+            with self._flush_lock:
+                if self.flusher is not None:
+                    with self._lock:
+                        # An older buffered version must not be flushed after this one
+                        self._buffer.pop((collection, key if key_field is None else record[key_field]), None)
+                self._write_lines([line])
+            if self.compact_due:
+                self.compact()
+            return
+        with self._lock:
+            # Later updates of the same record replace earlier unflushed ones
+            buffer_key = (collection, key if key_field is None else record[key_field])
+            self._buffer.pop(buffer_key, None)
+            self._buffer[buffer_key] = line
+            buffered = len(self._buffer)
+        self.flusher.mark_dirty(self, buffered)
+
+    def _write_lines(self, lines) -> None:
+        with self._file_lock(exclusive=False), open(self.journal_path, 'a') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending += len(lines)
+
+    def flush(self) -> None:
+        """Write buffered entries as one batch with a single fsync, then compact if due"""
+        with self._flush_lock:
+            with self._lock:
+                lines = list(self._buffer.values())
+                self._buffer = {}
+            if lines:
+                self._write_lines(lines)
+        if lines and self.compact_due:
+            self.compact()
+
+    @property
+    def compact_due(self) -> bool:
+        return self.pending >= self.compact_every
+
+    def compact(self, data: Optional[Dict] = None) -> bool:
+        """Atomically rewrite the snapshot with the current state and truncate the journal.
+
+        Skipped (returning False) while other processes have changes this one has not yet
+        picked up through ``poll()``, since the snapshot would otherwise drop them.
+        """
+        with self.lock.read() if self.lock is not None else nullcontext(), self._flush_lock, \
+                self._file_lock(exclusive=True):
+            if self.snapshot_sig is not None:
+                if not os.path.exists(self.file_path) or self.signature(os.stat(self.file_path)) != self.snapshot_sig:
+                    return False
+                if any(e.get("writer") != self.writer_id for e in self._read_tail()[0]):
+                    return False
+            if data is None:
+                data = self.snapshot()
+            with self._lock:
+                # Anything still buffered is contained in the snapshot being written
+                self._buffer = {}
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                snapshot_sig = self.signature(os.fstat(f.fileno()))
+            os.replace(tmp_path, self.file_path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.snapshot_sig = snapshot_sig
+            self._read_offset = 0
+            self.pending = 0
+        return True
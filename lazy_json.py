@@ -0,0 +1,281 @@
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+from data_handler import DataHandler
+from journal import COMPACT_EVERY
+from rwlock import ReadWriteLock
+
+# Strings (with escapes), structural brackets and colons; everything else (numbers, literals, whitespace) is skipped
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]:]')
+
+
+class OffsetIndex:
+    """Byte-offset index over the records of one top-level JSON array, decoding records on demand.
+
+    The file is memory-mapped and scanned once on first access; only the record spans, the
+    primary key and the requested secondary fields are kept. Records changed since the
+    snapshot (journal replay or updates) live in an overlay that takes precedence.
+    """
+
+    def __init__(self, file_path: str, collection: str, key_field: str, fields: Tuple[str, ...] = ()):
+        self.file_path = file_path
+        self.collection = collection
+        self.key_field = key_field
+        self.fields = fields
+        self._built = False
+        self._build_lock = threading.Lock()
+
+    def _build(self) -> None:
+        self._keys: List[str] = []
+        self._starts = array('q')
+        self._ends = array('q')
+        self._positions: Dict[str, int] = {}
+        self._by_field: Dict[str, Dict[str, array]] = {field: {} for field in self.fields}
+        self._overlay: Dict[str, Dict] = {}
+        self._mm = None
+        self.snapshot_sig = None
+        try:
+            with open(self.file_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                self.snapshot_sig = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if stat.st_size:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            print(f"Warning: {os.path.basename(self.file_path)} not found")
+        if self._mm is not None:
+            self._scan()
+        self._built = True
+
+    def _scan(self) -> None:
+        mm = self._mm
+        wanted = {self.key_field, *self.fields}
+        depth = 0
+        in_collection = False
+        record_start = -1
+        values: Dict[str, str] = {}
+        last_string = None  # (value, end offset) of the previous string token at the current depth
+        pending_key = None  # (key, colon end offset) awaiting its value
+        for match in _TOKEN.finditer(mm):
+            token = match.group()
+            char = token[:1]
+            if char == b'"':
+                if pending_key is not None and not mm[pending_key[1]:match.start()].strip():
+                    if depth == 3 and in_collection:
+                        values[pending_key[0]] = json.loads(token)
+                    pending_key = None
+                    last_string = None
+                else:
+                    pending_key = None
+                    last_string = (token, match.end())
+            elif char == b':':
+                if last_string is not None and depth in (1, 3):
+                    key = json.loads(last_string[0])
+                    if depth == 1 or key in wanted:
+                        pending_key = (key, match.end())
+                    if depth == 1:
+                        in_collection = key == self.collection
+                last_string = None
+            elif char in (b'{', b'['):
+                pending_key = None
+                last_string = None
+                depth += 1
+                if depth == 3 and in_collection and char == b'{':
+                    record_start = match.start()
+                    values = {}
+            else:
+                pending_key = None
+                last_string = None
+                if depth == 3 and in_collection and char == b'}':
+                    self._add(values, record_start, match.end())
+                if depth == 2 and in_collection:
+                    in_collection = False
+                depth -= 1
+
+    def _add(self, values: Dict[str, str], start: int, end: int) -> None:
+        key = values.get(self.key_field)
+        if key is None or key in self._positions:
+            return
+        position = len(self._keys)
+        self._keys.append(key)
+        self._starts.append(start)
+        self._ends.append(end)
+        self._positions[key] = position
+        for field in self.fields:
+            value = values.get(field)
+            if value is not None:
+                self._by_field[field].setdefault(value, array('l')).append(position)
+
+    def _ensure_built(self) -> None:
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self._build()
+
+    def _record_at(self, position: int) -> Dict:
+        key = self._keys[position]
+        if key in self._overlay:
+            return self._overlay[key]
+        return json.loads(self._mm[self._starts[position]:self._ends[position]])
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._keys)
+
+    def get(self, key: str) -> Optional[Dict]:
+        self._ensure_built()
+        position = self._positions.get(key)
+        return self._record_at(position) if position is not None else None
+
+    def find(self, field: str, value: str) -> List[Dict]:
+        self._ensure_built()
+        return [self._record_at(p) for p in self._by_field[field].get(value, ())]
+
+    def first(self, field: str, value: str) -> Optional[Dict]:
+        self._ensure_built()
+        positions = self._by_field[field].get(value)
+        return self._record_at(positions[0]) if positions else None
+
+    def put(self, record: Dict) -> None:
+        """Record an updated or new record in the overlay; secondary fields are taken from new records only"""
+        self._ensure_built()
+        key = record[self.key_field]
+        self._overlay[key] = record
+        if key not in self._positions:
+            self._add({field: record.get(field) for field in self.fields} | {self.key_field: key}, -1, -1)
+
+    def records(self) -> Iterator[Dict]:
+        self._ensure_built()
+        for position in range(len(self._keys)):
+            yield self._record_at(position)
+
+
+class LazyDataHandler(DataHandler):
+    """DataHandler that loads nothing up front.
+
+    Customers, subscriptions and escalations are parsed on first use; orders and payments
+    are served from mmap-backed offset indexes so only the records asked for are decoded.
+    """
+
+    records_in_memory = False
+
+    _DEFERRED = {
+        "customers": "customers", "_customers_by_id": "customers",
+        "subscriptions": "subscriptions", "_subscriptions_by_customer": "subscriptions",
+        "escalations": "escalations",
+    }
+
+    def __init__(self, data_dir: str = "mock_data", compact_every: int = COMPACT_EVERY, subscriptions: Optional[Dict] = None,
+                 flusher=None, subscriptions_lock: Optional[ReadWriteLock] = None):
+        self.data_dir = data_dir
+        self._init_listeners()
+        self._load_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._locks = self._open_locks(subscriptions_lock)
+        self._journals = self._open_journals(compact_every, flusher)
+        self._owns_subscriptions = subscriptions is None
+        if subscriptions is not None:
+            self.subscriptions = subscriptions
+            self._index_subscriptions()
+        self._indexes = {"orders": self._new_offset_index("orders"), "payments": self._new_offset_index("payments")}
+        self._replayed = set()
+
+    def __getattr__(self, name: str):
+        collection = LazyDataHandler._DEFERRED.get(name)
+        if collection is not None:
+            with self._load_lock:
+                if name not in self.__dict__:
+                    setattr(self, collection, self._load_json(f"{collection}.json"))
+                    if collection == "customers":
+                        self._index_customers()
+                    elif collection == "subscriptions":
+                        self._index_subscriptions()
+            return self.__dict__[name]
+        if name in ("orders", "payments"):
+            # Full documents are only materialized for compaction and export
+            return {name: list(self._offset_index(name).records())}
+        raise AttributeError(name)
+
+    def _new_offset_index(self, collection: str) -> OffsetIndex:
+        if collection == "orders":
+            return OffsetIndex(os.path.join(self.data_dir, "orders.json"), "orders", "order_id", ("customer_id",))
+        return OffsetIndex(os.path.join(self.data_dir, "payments.json"), "payments", "payment_id", ("customer_id", "order_id"))
+
+    def _offset_index(self, collection: str) -> OffsetIndex:
+        index = self._indexes[collection]
+        if collection not in self._replayed:
+            with self._load_lock:
+                if collection not in self._replayed:
+                    journal = self._journals[f"{collection}.json"]
+                    index._ensure_built()
+                    journal.snapshot_sig = index.snapshot_sig
+                    for entry in journal.entries():
+                        index.put(entry["record"])
+                    self._replayed.add(collection)
+        return index
+
+    def _refresh_collection(self, collection: str) -> None:
+        if collection not in self._indexes:
+            super()._refresh_collection(collection)
+            return
+        entries = self._journals[f"{collection}.json"].poll()
+        if entries is None:
+            # Snapshot replaced by another process: start a fresh offset index, built on next access
+            self._journals[f"{collection}.json"].flush()
+            with self._locks[collection].write():
+                self._indexes[collection] = self._new_offset_index(collection)
+                self._replayed.discard(collection)
+            self._notify(collection, None, None)
+        elif entries:
+            index = self._offset_index(collection)
+            with self._locks[collection].write():
+                for entry in entries:
+                    index.put(entry["record"])
+            for entry in entries:
+                self._notify(collection, entry["record"][entry["key_field"]], entry["record"])
+
+    def iter_records(self, collection: str) -> Iterator[Dict]:
+        if collection not in self._indexes:
+            return super().iter_records(collection)
+        # Decoded one at a time; the offset index only ever grows, so no lock is held across the walk
+        return self._offset_index(collection).records()
+    
+    def get_customer_orders(self, customer_id: str) -> List[Dict]:
+        with self._locks["orders"].read():
+            return self._offset_index("orders").find("customer_id", customer_id)
+
+    def get_order(self, order_id: str) -> Optional[Dict]:
+        with self._locks["orders"].read():
+            return self._offset_index("orders").get(order_id)
+
+    def get_payment(self, payment_id: str) -> Optional[Dict]:
+        with self._locks["payments"].read():
+            return self._offset_index("payments").get(payment_id)
+
+    def get_customer_payments(self, customer_id: str) -> List[Dict]:
+        with self._locks["payments"].read():
+            return self._offset_index("payments").find("customer_id", customer_id)
+
+    def get_order_payment(self, order_id: str) -> Optional[Dict]:
+        with self._locks["payments"].read():
+            return self._offset_index("payments").first("order_id", order_id)
+
+    def get_failed_payments(self, customer_id: str) -> List[Dict]:
+        return [p for p in self.get_customer_payments(customer_id) if p["status"] == "failed"]
+
+    def update_payments_status(self, payment_ids: List[str], status: str) -> int:
+        index = self._offset_index("payments")
+        updated = 0
+        with self._locks["payments"].write():
+            for payment_id in payment_ids:
+                payment = index.get(payment_id)
+                if payment is None or payment["status"] == status:
+                    continue
+                payment["status"] = status
+                index.put(payment)
+                self._append("payments.json", "payments", payment, key_field="payment_id")
+                updated += 1
+        return updated
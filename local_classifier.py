@@ -0,0 +1,159 @@
+import argparse
+import os
+import random
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_MODEL_PATH = "intent_model.npz"
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_FEATURES = 2 ** 16
+
+_WORD = re.compile(r"\w+")
+# Written by flask_api for every /chat and /chat/stream request
+_LOG_LINE = re.compile(r"Chat(?: stream)?: Customer \S+, Intent: ([A-Z_]+), Message: (.*)$")
+
+
+class HashedNgramClassifier:
+    """Multinomial logistic regression over hashed word and character n-grams.
+
+    Features are word unigrams and bigrams plus character trigrams of each word, hashed
+    (CRC32, so stable across processes) with a sign bit into ``n_features`` buckets and
+    L2-normalized. Prediction is a sparse dot product and a softmax, well under a
+    millisecond per message.
+    """
+
+    def __init__(self, classes: List[str], n_features: int = DEFAULT_FEATURES):
+        self.classes = list(classes)
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(self.classes)), dtype=np.float32)
+        self.bias = np.zeros(len(self.classes), dtype=np.float32)
+
+    def features(self, message: str) -> Tuple[np.ndarray, np.ndarray]:
+        words = _WORD.findall(message.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        counts: Dict[int, float] = {}
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8"))
+            index = h % self.n_features
+            counts[index] = counts.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        norm = np.linalg.norm(values)
+        return indices, values / norm if norm else values
+
+    def _probabilities(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        logits = values @ self.weights[indices] + self.bias
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def predict(self, message: str) -> Tuple[str, float]:
+        """Most likely intent and its probability"""
+        probabilities = self._probabilities(*self.features(message))
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+    def fit(self, messages: List[str], labels: List[str], epochs: int = 10, learning_rate: float = 0.5,
+            l2: float = 1e-5, seed: int = 0) -> None:
+        """Plain SGD on the cross-entropy loss, one example at a time with a decaying step size"""
+        examples = [self.features(m) for m in messages]
+        targets = [self.classes.index(label) for label in labels]
+        order = list(range(len(examples)))
+        rng = random.Random(seed)
+        step = 0
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for i in order:
+                indices, values = examples[i]
+                gradient = self._probabilities(indices, values)
+                gradient[targets[i]] -= 1.0
+                rate = learning_rate / (1.0 + step * 1e-4)
+                rows = self.weights[indices]
+                self.weights[indices] = rows * (1.0 - rate * l2) - rate * np.outer(values, gradient)
+                self.bias -= rate * gradient
+                step += 1
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, classes=np.array(self.classes))
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        with np.load(path) as data:
+            model = cls([str(c) for c in data["classes"]], data["weights"].shape[0])
+            model.weights = data["weights"]
+            model.bias = data["bias"]
+        return model
+
+
+def read_log(path: str) -> Tuple[List[str], List[str]]:
+    """(messages, intents) of every chat request recorded in a flask_api log"""
+    messages, labels = [], []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = _LOG_LINE.search(line.rstrip("\n"))
+            if match and match.group(2):
+                labels.append(match.group(1))
+                messages.append(match.group(2))
+    return messages, labels
+
+
+def evaluate(model: HashedNgramClassifier, messages: List[str], labels: List[str],
+             threshold: float = DEFAULT_THRESHOLD) -> Dict:
+    """Accuracy overall and on the share of messages the model is confident enough to answer alone"""
+    predictions = [model.predict(m) for m in messages]
+    correct = [p == label for (p, _), label in zip(predictions, labels)]
+    confident = [c for c, (_, probability) in zip(correct, predictions) if probability >= threshold]
+    return {
+        "examples": len(messages),
+        "accuracy": round(sum(correct) / len(correct), 4) if correct else 0.0,
+        "coverage": round(len(confident) / len(correct), 4) if correct else 0.0,
+        "confident_accuracy": round(sum(confident) / len(confident), 4) if confident else 0.0,
+    }
+
+
+def local_classifier_from_env() -> Optional[HashedNgramClassifier]:
+    """Load the model at INTENT_MODEL_PATH if one has been trained, otherwise None"""
+    path = os.getenv("INTENT_MODEL_PATH", DEFAULT_MODEL_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        return HashedNgramClassifier.load(path)
+    except Exception as e:
+        print(f"Warning: could not load intent model {path}: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train or evaluate the local intent classifier on logged chat traffic")
+    parser.add_argument("command", choices=("train", "evaluate"))
+    parser.add_argument("--log", default="flask_api.log", help="flask_api log to read (message, intent) pairs from")
+    parser.add_argument("--model", default=os.getenv("INTENT_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of examples kept back for evaluation when training")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES)
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("INTENT_MODEL_THRESHOLD", DEFAULT_THRESHOLD)))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    messages, labels = read_log(args.log)
+    if not messages:
+        parser.error(f"no logged chat messages found in {args.log}")
+    if args.command == "train":
+        pairs = list(zip(messages, labels))
+        random.Random(args.seed).shuffle(pairs)
+        split = int(len(pairs) * (1 - args.holdout))
+        train, test = pairs[:split], pairs[split:]
+        model = HashedNgramClassifier(sorted(set(labels)), args.features)
+        model.fit([m for m, _ in train], [l for _, l in train], epochs=args.epochs, seed=args.seed)
+        model.save(args.model)
+        print(f"Trained on {len(train)} messages, saved to {args.model}")
+        if test:
+            print(f"Held-out: {evaluate(model, [m for m, _ in test], [l for _, l in test], args.threshold)}")
+    else:
+        model = HashedNgramClassifier.load(args.model)
+        known = [(m, l) for m, l in zip(messages, labels) if l in model.classes]
+        print(evaluate(model, [m for m, _ in known], [l for _, l in known], args.threshold))
@@ -1,14 +1,23 @@
-import groq
+import asyncio
+import os
 import re
-from typing import Dict, Tuple
-from data_handler import DataHandler
-from subscription_manager import SubscriptionManager
+from typing import AsyncIterator, Awaitable, Dict, Iterator, List, Optional, Tuple
+from async_llm import llm_client_from_env
+from entity_extractor import EntityExtractor
+from intent_matcher import KeywordMatcher
+from intent_cache import intent_cache_from_env
+from local_classifier import DEFAULT_THRESHOLD, local_classifier_from_env
+from resilience import budget
+from storage import Repository, get_repository
 
 class NLUPipeline:
-    def __init__(self, groq_api_key: str):
-        self.client = groq.Groq(api_key=groq_api_key)
-        self.data_handler = DataHandler()
-        self.subscription_manager = SubscriptionManager()
+    def __init__(self, groq_api_key: str, repository: Repository = None):
+        self.llm = llm_client_from_env(groq_api_key)
+        repository = repository or get_repository()
+        self.data_handler = repository.data_handler
+        self.subscription_manager = repository.subscription_manager
+        self.columns = repository.columns
+        self.summaries = repository.summaries
         self.intent_keywords = {
             'REFUND_REQUEST': ['refund', 'money back', 'return', 'cancel order', 'get my money', 'damaged'],
             'DELIVERY_ISSUE': ['not delivered', 'missing', 'delay', 'late', 'not received', 'where is'],
@@ -18,29 +27,57 @@ class NLUPipeline:
             'SUBSCRIPTION_REQUEST': ['subscription', 'weekly delivery', 'recurring order', 'restock weekly', 'auto delivery'],
             'GENERAL_INQUIRY': ['help', 'support', 'question', 'how to', 'what is']
         }
+        self.matcher = KeywordMatcher(self.intent_keywords)
+        # Item vocabulary comes from the product names in orders
+        self.entities = EntityExtractor(self.data_handler)
+        self.intent_cache = intent_cache_from_env()
+        # Trained offline from flask_api.log (see local_classifier.py); consulted before the LLM
+        self.local_classifier = local_classifier_from_env()
+        self.local_threshold = float(os.getenv("INTENT_MODEL_THRESHOLD", DEFAULT_THRESHOLD))
+        self.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", 8))
+        # NLU_FUSED=1: messages the keyword matcher can't place get intent and reply from one LLM call
+        self.fused = os.getenv("NLU_FUSED", "0") == "1"
+        # Seconds all LLM calls for one message may take together; app.py gives up on /chat after 5
+        self.deadline = float(os.getenv("CHAT_DEADLINE", 4.5))
+    
+    def extract_entities(self, message: str) -> Dict[str, List]:
+        return self.entities.extract(message)
     
     def extract_order_id(self, message: str) -> str:
-        order_pattern = r'ORD\d{3}'
-        match = re.search(order_pattern, message)
-        return match.group() if match else None
+        order_ids = self.entities.extract(message)['order_ids']
+        return order_ids[0] if order_ids else None
     
     def extract_amount(self, message: str) -> float:
-        amount_pattern = r'₹(\d+(?:\.\d{2})?)'
-        match = re.search(amount_pattern, message)
-        return float(match.group(1)) if match else None
+        amounts = self.entities.extract(message)['amounts']
+        return amounts[0] if amounts else None
     
     def extract_subscription_items(self, message: str) -> list[str]:
-        words = message.lower().split()
-        common_items = ['milk', 'vegetables', 'rice', 'oil', 'detergent', 'biscuits']
-        return [word for word in words if word in common_items]
+        return self.entities.extract(message)['items']
     
     def classify_intent_quick(self, message: str) -> str:
-        message_lower = message.lower()
-        scores = {intent: sum(1 for keyword in keywords if keyword in message_lower) for intent, keywords in self.intent_keywords.items()}
-        return max(scores.items(), key=lambda x: x[1])[0] if any(scores.values()) else 'GENERAL_INQUIRY'
+        return self.matcher.classify(message)
     
-    def classify_intent_groq(self, message: str) -> str:
-        prompt = f"""
+    def classify_intents_quick(self, messages: List[str]) -> List[str]:
+        return self.matcher.classify_batch(messages)
+    
+    def classify_intent_local(self, message: str) -> Optional[str]:
+        """Keyword matcher, then the local model; None when neither is confident and the LLM should decide"""
+        intent = self.classify_intent_quick(message)
+        return intent if intent != 'GENERAL_INQUIRY' else self._predict_local(message)
+    
+    def classify_intents_local(self, messages: List[str]) -> List[Optional[str]]:
+        return [intent if intent != 'GENERAL_INQUIRY' else self._predict_local(message)
+                for message, intent in zip(messages, self.classify_intents_quick(messages))]
+    
+    def _predict_local(self, message: str) -> Optional[str]:
+        if self.local_classifier is not None:
+            intent, confidence = self.local_classifier.predict(message)
+            if confidence >= self.local_threshold:
+                return intent
+        return None
+    
+    def _classify_prompt(self, message: str) -> str:
+        return f"""
         Classify this customer support message into ONE of these intents:
         REFUND_REQUEST, DELIVERY_ISSUE, PAYMENT_PROBLEM, WALLET_ISSUE, ORDER_STATUS, SUBSCRIPTION_REQUEST, GENERAL_INQUIRY
         
@@ -48,78 +85,278 @@ class NLUPipeline:
         
         Return only the intent name, nothing else.
         """
+    
+    async def classify_intent_groq_async(self, message: str) -> str:
+        cached = self.intent_cache.get(message)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=50
-            )
-            return response.choices[0].message.content.strip()
+            intent = await self.llm.complete(self._classify_prompt(message), max_tokens=50)
+            if intent in self.intent_keywords:
+                self.intent_cache.put(message, intent)  # only valid labels; errors fall back uncached
+            return intent
         except Exception as e:
             print(f"Groq API error: {e}")
             return self.classify_intent_quick(message)
     
+    def classify_intent_groq(self, message: str) -> str:
+        return self.llm.run(self.classify_intent_groq_async(message))
+    
     def classify_intent(self, message: str) -> str:
-        intent = self.classify_intent_quick(message)
-        if intent == 'GENERAL_INQUIRY':
+        intent = self.classify_intent_local(message)
+        if intent is None:
             intent = self.classify_intent_groq(message)
         return intent
     
-    def generate_response(self, intent: str, message: str, customer_id: str) -> str:
-        customer = self.data_handler.get_customer(customer_id)
-        if not customer:
-            return "I'm sorry, I couldn't find your customer information. Please contact support."
-        
-        order_id = self.extract_order_id(message)
-        amount = self.extract_amount(message)
-        context = f"""
-        You are a helpful Walmart customer support agent. Respond professionally and helpfully.
-        
-        Customer Information:
-        - Name: {customer['name']}
-        - Wallet Balance: ₹{customer['wallet_balance']}
-        - Membership: {customer['membership']}
-        - Location: {customer['location']}
-        
-        Recent Orders: {len(self.data_handler.get_customer_orders(customer_id))} orders
-        Active Subscriptions: {len([s for s in self.data_handler.get_customer_subscriptions(customer_id) if s['status'] == 'active'])} subscriptions
-        Intent: {intent}
+    def _gather_context(self, message: str, customer_id: str) -> Dict:
+        """Every store lookup a reply prompt may need, so it can run while the intent is still unknown"""
+        return self._message_context(message, self._customer_facts(customer_id))
+    
+    def _customer_facts(self, customer_id: str) -> Dict:
+        """The per-customer part of a reply context, shared by all of a customer's messages in a batch"""
+        return self.summaries.get(customer_id) or {'customer': None}
+    
+    def _message_context(self, message: str, facts: Dict) -> Dict:
+        """Add the message's entities, keeping only order/payment IDs that belong to the customer"""
+        if not facts['customer']:
+            return facts
+        entities = self.entities.extract(message)
+        entities['order_ids'] = [o for o in entities['order_ids'] if o in facts['order_ids']]
+        entities['payment_ids'] = [p for p in entities['payment_ids'] if p in facts['payment_ids']]
+        order_id = entities['order_ids'][0] if entities['order_ids'] else None
+        return dict(facts, entities=entities, order_id=order_id,
+                    order=self.data_handler.get_order(order_id) if order_id else None)
+    
+    def _response_prompt(self, intent: str, message: str, ctx: Dict) -> str:
+        customer, order_id, order = ctx['customer'], ctx['order_id'], ctx['order']
+        context = ctx['preamble'] + f"""Intent: {intent}
         Customer Message: "{message}"
         """
         
         if intent == 'WALLET_ISSUE':
             context += "Recent payments: {} transactions\nCurrent wallet balance: ₹{}\nIf wallet shows ₹0 but customer paid, explain payment processing and offer to credit wallet.".format(
-                len(self.data_handler.get_customer_payments(customer_id)), customer['wallet_balance'])
+                ctx['payment_count'], customer['wallet_balance'])
         
         elif intent == 'DELIVERY_ISSUE':
-            if order_id:
-                order = self.data_handler.get_order(order_id)
-                if order:
-                    context += f"\nOrder {order_id} details:\n- Status: {order['status']}\n- Expected delivery: {order['expected_delivery']}\n- Items: {len(order['items'])} items"
+            if order:
+                context += f"\nOrder {order_id} details:\n- Status: {order['status']}\n- Expected delivery: {order['expected_delivery']}\n- Items: {len(order['items'])} items"
         
         elif intent == 'PAYMENT_PROBLEM':
-            failed_payments = self.data_handler.get_failed_payments(customer_id)
-            context += f"\nFailed payments: {len(failed_payments)}\nRecent payment issues found."
+            context += f"\nFailed payments: {ctx['failed_count']}\nRecent payment issues found."
         
         elif intent == 'REFUND_REQUEST':
             context += "\nFor refunds, suggest uploading an image of the damaged item or proof. If evidence is provided, validate and process autonomously or escalate."
         
         elif intent == 'SUBSCRIPTION_REQUEST':
-            items = self.extract_subscription_items(message)
+            items = ctx['entities']['items']
             context += f"\nCustomer wants to set up a subscription.\nPotential items mentioned: {', '.join(items) if items else 'None'}\nSuggest creating a subscription for these items with weekly delivery or ask for clarification."
         
         context += "\n\nProvide a concise, helpful response (max 100 words)."
-        
+        return context
+    
+    async def generate_response_async(self, intent: str, message: str, customer_id: str, ctx: Optional[Dict] = None) -> str:
+        if ctx is None:
+            ctx = await asyncio.to_thread(self._gather_context, message, customer_id)
+        if not ctx['customer']:
+            return "I'm sorry, I couldn't find your customer information. Please contact support."
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": context}],
-                max_tokens=150
-            )
-            return response.choices[0].message.content.strip()
+            return await self.llm.complete(self._response_prompt(intent, message, ctx), max_tokens=150)
         except Exception as e:
             print(f"Response generation error: {e}")
-            return self._fallback_response(intent, customer, order_id)
+            return self._fallback_response(intent, ctx['customer'], ctx['order_id'])
+    
+    def generate_response(self, intent: str, message: str, customer_id: str) -> str:
+        return self.llm.run(self.generate_response_async(intent, message, customer_id))
+    
+    async def generate_response_stream(self, intent: str, message: str, customer_id: str,
+                                       ctx: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Like generate_response_async, but yields the reply piece by piece as it is generated"""
+        if ctx is None:
+            ctx = await asyncio.to_thread(self._gather_context, message, customer_id)
+        if not ctx['customer']:
+            yield "I'm sorry, I couldn't find your customer information. Please contact support."
+            return
+        sent = False
+        try:
+            async for token in self.llm.stream(self._response_prompt(intent, message, ctx), max_tokens=150):
+                sent = True
+                yield token
+        except Exception as e:
+            print(f"Response streaming error: {e}")
+            if not sent:
+                yield self._fallback_response(intent, ctx['customer'], ctx['order_id'])
+    
+    async def respond_async(self, message: str, customer_id: str) -> Tuple[str, str]:
+        """Classify a message and generate the reply, returning (intent, response).
+
+        When the intent needs an LLM call, the customer context is assembled on a worker
+        thread while that call is in flight. The LLM calls share the ``deadline`` budget; once
+        it is spent the keyword intent and the canned reply are used instead.
+        """
+        with budget(self.deadline):
+            intent = self.classify_intent_local(message)
+            context = asyncio.ensure_future(asyncio.to_thread(self._gather_context, message, customer_id))
+            return await self._respond(message, customer_id, intent, context)
+    
+    async def _respond(self, message: str, customer_id: str, intent: Optional[str],
+                       context: Awaitable[Dict]) -> Tuple[str, str]:
+        """Reply to a message given its offline intent (None when the LLM must decide) and pending context"""
+        if intent is None:
+            if not self.fused:
+                intent = await self.classify_intent_groq_async(message)
+            else:
+                cached = self.intent_cache.get(message)
+                if cached is None:
+                    return await self.classify_and_respond_async(message, customer_id, await context)
+                intent = cached
+        return intent, await self.generate_response_async(intent, message, customer_id, await context)
+    
+    def respond(self, message: str, customer_id: str) -> Tuple[str, str]:
+        return self.llm.run(self.respond_async(message, customer_id))
+    
+    async def respond_batch_async(self, items: List[Tuple[str, str]],
+                                  concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Reply to many (customer_id, message) pairs, yielding one result dict per pair as it finishes.
+
+        All messages are classified offline in one pass, store lookups are made once per
+        customer, and at most ``concurrency`` messages of the batch wait on the LLM at a
+        time. Results carry the pair's ``index`` since they arrive in completion order.
+        """
+        intents = self.classify_intents_local([message for _, message in items])
+        facts = {customer_id: asyncio.ensure_future(asyncio.to_thread(self._customer_facts, customer_id))
+                 for customer_id in dict.fromkeys(customer_id for customer_id, _ in items)}
+        limit = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        
+        async def context(message: str, customer_id: str) -> Dict:
+            return self._message_context(message, await facts[customer_id])
+        
+        async def reply(index: int, customer_id: str, message: str, intent: Optional[str]) -> Dict:
+            async with limit:
+                try:
+                    with budget(self.deadline):
+                        intent, response = await self._respond(message, customer_id, intent,
+                                                               asyncio.ensure_future(context(message, customer_id)))
+                except Exception as e:
+                    return {'index': index, 'customer_id': customer_id, 'error': str(e)}
+            return {'index': index, 'customer_id': customer_id, 'intent': intent, 'response': response}
+        
+        tasks = [asyncio.ensure_future(reply(i, customer_id, message, intents[i]))
+                 for i, (customer_id, message) in enumerate(items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()  # the consumer went away; stop issuing LLM calls
+    
+    def respond_batch(self, items: List[Tuple[str, str]], concurrency: Optional[int] = None) -> Iterator[Dict]:
+        return self.llm.iterate(self.respond_batch_async(items, concurrency))
+    
+    async def respond_stream_async(self, message: str, customer_id: str) -> AsyncIterator[Tuple[str, str]]:
+        """Streaming respond_async: yields ("token", text) pieces of the reply, then ("intent", intent)"""
+        with budget(self.deadline):
+            intent = self.classify_intent_local(message)
+            context_task = asyncio.ensure_future(asyncio.to_thread(self._gather_context, message, customer_id))
+            if intent is None:
+                if not self.fused:
+                    intent = await self.classify_intent_groq_async(message)
+                else:
+                    cached = self.intent_cache.get(message)
+                    if cached is None:
+                        async for item in self._classify_and_respond_stream(message, await context_task):
+                            yield item
+                        return
+                    intent = cached
+            async for token in self.generate_response_stream(intent, message, customer_id, await context_task):
+                yield 'token', token
+            yield 'intent', intent
+    
+    def respond_stream(self, message: str, customer_id: str) -> Iterator[Tuple[str, str]]:
+        return self.llm.iterate(self.respond_stream_async(message, customer_id))
+    
+    def _fused_prompt(self, message: str, ctx: Dict) -> str:
+        order_id, order = ctx['order_id'], ctx['order']
+        # The intent is not known yet, so the prompt carries the facts every intent branch would add
+        context = ctx['preamble'] + f"""Recent payments: {ctx['payment_count']} transactions, {ctx['failed_count']} failed
+        Customer Message: "{message}"
+        """
+        if order:
+            context += f"\nOrder {order_id} details:\n- Status: {order['status']}\n- Expected delivery: {order['expected_delivery']}\n- Items: {len(order['items'])} items"
+        context += f"""
+        
+        First classify the message into ONE of these intents:
+        {', '.join(self.intent_keywords)}
+        Then write a concise, helpful response (max 100 words). For refunds, suggest uploading an image of the damaged item or proof.
+        
+        Answer in exactly this format:
+        INTENT: <intent name>
+        RESPONSE: <your response>
+        """
+        return context
+    
+    async def classify_and_respond_async(self, message: str, customer_id: str, ctx: Optional[Dict] = None) -> Tuple[str, str]:
+        """One LLM call returning both the intent label and the reply for a message"""
+        if ctx is None:
+            ctx = await asyncio.to_thread(self._gather_context, message, customer_id)
+        customer = ctx['customer']
+        if not customer:
+            return 'GENERAL_INQUIRY', "I'm sorry, I couldn't find your customer information. Please contact support."
+        try:
+            intent, reply = self._parse_fused(await self.llm.complete(self._fused_prompt(message, ctx), max_tokens=180))
+        except Exception as e:
+            print(f"Fused classify/respond error: {e}")
+            return 'GENERAL_INQUIRY', self._fallback_response('GENERAL_INQUIRY', customer, ctx['order_id'])
+        if intent in self.intent_keywords:
+            self.intent_cache.put(message, intent)
+        else:
+            intent = 'GENERAL_INQUIRY'
+        return intent, reply or self._fallback_response(intent, customer, ctx['order_id'])
+    
+    def classify_and_respond(self, message: str, customer_id: str) -> Tuple[str, str]:
+        return self.llm.run(self.classify_and_respond_async(message, customer_id))
+    
+    async def _classify_and_respond_stream(self, message: str, ctx: Dict) -> AsyncIterator[Tuple[str, str]]:
+        """Fused mode streamed: the INTENT line is held back, everything after RESPONSE: is passed through"""
+        customer = ctx['customer']
+        if not customer:
+            yield 'token', "I'm sorry, I couldn't find your customer information. Please contact support."
+            yield 'intent', 'GENERAL_INQUIRY'
+            return
+        head, intent, sent = "", None, False
+        try:
+            async for token in self.llm.stream(self._fused_prompt(message, ctx), max_tokens=180):
+                if intent is not None:
+                    sent = True
+                    yield 'token', token
+                    continue
+                head += token
+                marker = re.search(r'RESPONSE:\s*', head)
+                if marker and marker.end() < len(head):
+                    intent = self._parse_fused(head[:marker.start()])[0]
+                    sent = True
+                    yield 'token', head[marker.end():]
+            if intent is None:
+                intent, reply = self._parse_fused(head)
+                if reply:
+                    sent = True
+                    yield 'token', reply
+        except Exception as e:
+            print(f"Fused classify/respond streaming error: {e}")
+        if intent in self.intent_keywords:
+            self.intent_cache.put(message, intent)
+        else:
+            intent = 'GENERAL_INQUIRY'
+        if not sent:
+            yield 'token', self._fallback_response(intent, customer, ctx['order_id'])
+        yield 'intent', intent
+    
+    @staticmethod
+    def _parse_fused(content: str) -> Tuple[str, str]:
+        intent_match = re.search(r'INTENT:\s*([A-Z_]+)', content)
+        response_match = re.search(r'RESPONSE:\s*(.*)', content, re.DOTALL)
+        intent = intent_match.group(1) if intent_match else ''
+        reply = response_match.group(1).strip() if response_match else content[intent_match.end():].strip() if intent_match else content.strip()
+        return intent, reply
     
     def _fallback_response(self, intent: str, customer: Dict, order_id: str = None) -> str:
         responses = {
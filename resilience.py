@@ -0,0 +1,243 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+T = TypeVar("T")
+
+_TIMEOUTS = (TimeoutError, asyncio.TimeoutError, concurrent.futures.TimeoutError)
+
+# Absolute time.monotonic() by which the current request must be answered, if it has a budget
+_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("deadline", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of calling a backend once the request's budget is spent"""
+
+
+@contextlib.contextmanager
+def budget(seconds: float) -> Iterator[None]:
+    """Give every guarded call made inside the block (and tasks it starts) a shared time budget.
+
+    Nested budgets never extend an outer one.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None outside of one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls are refused
+    for ``reset_timeout`` seconds. Then a single probe call is let through (half-open): its
+    success closes the circuit, its failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            elif self.state == "open" or now - self._probe_at < self.reset_timeout:
+                return False  # a probe that never reported back (cancelled) is replaced after reset_timeout
+            self._probe_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class Guard:
+    """Deadline, circuit breaker and optional hedging around the calls to one model backend.
+
+    Every call gets at most ``timeout`` seconds, less if the surrounding ``budget()`` has
+    less left, and fails fast with CircuitOpenError or DeadlineExceeded instead of waiting
+    on a backend that is down or a request that is already late. With ``hedge_after`` set,
+    a call still unanswered after that many seconds is issued a second time and whichever
+    attempt answers first wins. Timeouts caused by a nearly spent request budget are not
+    held against the backend.
+    """
+
+    def __init__(self, name: str, timeout: float, hedge_after: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 8):
+        self.name = name
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def _time_limit(self) -> float:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        left = remaining()
+        if left is None or left >= self.timeout:
+            return self.timeout
+        if left <= 0:
+            raise DeadlineExceeded(f"no time left for {self.name} call")
+        return left
+
+    def _record(self, error: Optional[BaseException], limit: float) -> None:
+        if error is None:
+            self.breaker.record_success()
+        elif not (isinstance(error, _TIMEOUTS) and limit < self.timeout):
+            self.breaker.record_failure()
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Await ``attempt()`` (called again for a hedge) within the time limit"""
+        limit = self._time_limit()
+        try:
+            try:
+                result = await asyncio.wait_for(self._hedged(attempt), limit)
+            except asyncio.TimeoutError:
+                raise asyncio.TimeoutError(f"{self.name} call timed out after {limit:.1f}s") from None
+        except Exception as e:
+            self._record(e, limit)
+            raise
+        self._record(None, limit)
+        return result
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        if not self.hedge_after:
+            return await attempt()
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(attempt()))
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    return done.pop().result()  # every attempt failed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Iterate ``open_stream()``; the time limit applies to the first item and to each gap after it.
+
+        Streams are not hedged, and the budget only bounds the wait for the first item so a
+        reply already reaching the user is not cut off mid-sentence.
+        """
+        limit = self._time_limit()
+        items = open_stream().__aiter__()
+        first = True
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(items.__anext__(), limit if first else self.timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise asyncio.TimeoutError(f"{self.name} stream stalled") from None
+                if first:
+                    self._record(None, limit)
+                    first = False
+                yield item
+        except Exception as e:
+            if first:
+                self._record(e, limit)
+            raise
+        finally:
+            await items.aclose()
+
+    def call_sync(self, attempt: Callable[[float], T]) -> T:
+        """Run the blocking ``attempt(time_limit)`` on a worker thread and wait at most the time limit.
+
+        ``attempt`` should pass the limit on to its SDK so the abandoned thread also gives
+        up; until it does it holds one of ``max_workers`` threads.
+        """
+        limit = self._time_limit()
+        started = time.monotonic()
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix=self.name)
+        futures = [self._executor.submit(attempt, limit)]
+        try:
+            if self.hedge_after and self.hedge_after < limit:
+                done, _ = concurrent.futures.wait(futures, timeout=self.hedge_after)
+                if not done:
+                    futures.append(self._executor.submit(attempt, limit - self.hedge_after))
+            pending = set(futures)
+            while True:
+                left = limit - (time.monotonic() - started)
+                done, pending = concurrent.futures.wait(pending, timeout=max(left, 0),
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    raise concurrent.futures.TimeoutError(f"{self.name} call timed out after {limit:.1f}s")
+                for future in done:
+                    if future.exception() is None:
+                        self._record(None, limit)
+                        return future.result()
+                if not pending:
+                    return done.pop().result()  # every attempt failed
+        except Exception as e:
+            self._record(e, limit)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def stats(self) -> Dict:
+        return dict(self.breaker.stats(), timeout=self.timeout, hedge_after=self.hedge_after)
+
+
+def guard_from_env(name: str, default_timeout: float) -> Guard:
+    """Guard for backend ``name`` configured by <NAME>_TIMEOUT, <NAME>_HEDGE_AFTER (unset or 0: no hedging),
+    <NAME>_BREAKER_FAILURES and <NAME>_BREAKER_RESET (seconds)"""
+    prefix = name.upper()
+    hedge_after = float(os.getenv(f"{prefix}_HEDGE_AFTER", 0)) or None
+    breaker = CircuitBreaker(int(os.getenv(f"{prefix}_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)),
+                             float(os.getenv(f"{prefix}_BREAKER_RESET", DEFAULT_RESET_TIMEOUT)))
+    return Guard(name, float(os.getenv(f"{prefix}_TIMEOUT", default_timeout)), hedge_after, breaker)
@@ -22,17 +22,14 @@ class ResolutionEngine:
     def _resolve_payment_issue(self, customer_id: str, message: str) -> bool:
         failed_payments = self.data_handler.get_failed_payments(customer_id)
         if failed_payments:
-            for payment in failed_payments:
-                payment['status'] = 'processed'
-            self.data_handler._save_json("payments.json", self.data_handler.payments)
+            self.data_handler.update_payments_status([p['payment_id'] for p in failed_payments], 'processed')
             return True
         return False
     
     def _resolve_wallet_issue(self, customer_id: str) -> bool:
         customer = self.data_handler.get_customer(customer_id)
         if customer and customer['wallet_balance'] == 0:
-            customer['wallet_balance'] = 100.0  # Mock credit
-            self.data_handler._save_json("customers.json", self.data_handler.customers)
+            self.data_handler.update_wallet_balance(customer_id, 100.0)  # Mock credit
             return True
         return False
     
@@ -47,9 +44,7 @@ class ResolutionEngine:
     def resolve_escalated(self, case_id: str, decision: str) -> Dict:
         if decision == 'approve':
             customer_id = self.data_handler.get_escalation(case_id)['customer_id']
-            customer = self.data_handler.get_customer(customer_id)
-            customer['wallet_balance'] += 50.0  # Mock refund
-            self.data_handler._save_json("customers.json", self.data_handler.customers)
+            self.data_handler.credit_wallet(customer_id, 50.0)  # Mock refund
             self.data_handler.update_escalation_status(case_id, 'resolved')
             return {'status': 'resolved', 'case_id': case_id}
         self.data_handler.update_escalation_status(case_id, 'rejected')
@@ -0,0 +1,453 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from data_handler import DataHandler
+from lazy_json import LazyDataHandler
+from subscription_manager import SubscriptionManager
+from change_notifier import ChangeListener
+from write_behind import flusher_from_env
+from coherence import DEFAULT_INTERVAL as DEFAULT_COHERENCE_INTERVAL, monitor_from_env
+from columnar import ColumnarStore
+from customer_summaries import summaries_from_env
+
+# The backend is chosen by the STORAGE_BACKEND environment variable: "json" (default) keeps the
+# journalled files in mock_data, "lazy" reads the same files on demand through offset indexes,
+# and "sqlite" uses the database at SQLITE_DB_PATH. For the file backends WRITE_BEHIND_INTERVAL > 0
+# moves journal writes off the request thread (see write_behind.py), and COHERENCE_INTERVAL > 0
+# keeps several worker processes in step through the shared files (see coherence.py). With sqlite
+# the coherence monitor runs by default, applying other processes' writes (read back from the
+# database's change log) to the cached aggregates record by record.
+DEFAULT_SQLITE_DB_PATH = os.path.join("mock_data", "walmart.db")
+# Entries kept in the change log other processes follow, pruned every CHANGE_LOG_PRUNE_EVERY writes
+CHANGE_LOG_SIZE = 100000
+CHANGE_LOG_PRUNE_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders(customer_id);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    order_id TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_customer_status ON payments(customer_id, status);
+CREATE INDEX IF NOT EXISTS idx_payments_order ON payments(order_id);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    subscription_id TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_customer ON subscriptions(customer_id);
+CREATE TABLE IF NOT EXISTS escalations (
+    case_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_escalations_customer ON escalations(customer_id);
+CREATE TABLE IF NOT EXISTS changes (
+    generation INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    key TEXT,
+    writer TEXT NOT NULL
+);
+"""
+
+# Indexed columns per table, in insert order; the primary key comes first and the full record lives in `data`
+TABLE_COLUMNS = {
+    "customers": ("customer_id",),
+    "orders": ("order_id", "customer_id", "status"),
+    "payments": ("payment_id", "customer_id", "order_id", "status"),
+    "subscriptions": ("subscription_id", "customer_id", "status"),
+    "escalations": ("case_id", "customer_id", "status"),
+}
+
+
+class SQLiteDatabase:
+    """Thin wrapper over an SQLite file holding one connection per thread.
+
+    Every write also appends (table, key, writer) to the ``changes`` log, so ``changes()``
+    can hand back just the records other processes wrote since the last look, much like
+    the journal's writer IDs. The log keeps the last ``CHANGE_LOG_SIZE`` entries; a reader
+    that fell further behind is told to reload whole tables instead.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SQLITE_DB_PATH):
+        self.db_path = db_path
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        self._seen = conn.execute("SELECT COALESCE(MAX(generation), 0) FROM changes").fetchone()[0]
+        self._seen_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a block as one write transaction, taking the write lock up front"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def log_change(self, conn: sqlite3.Connection, table: str, key: Optional[str]) -> None:
+        """Record a written record (``key`` None: the whole table) for other processes' ``changes()``"""
+        generation = conn.execute("INSERT INTO changes (name, key, writer) VALUES (?, ?, ?)",
+                                  (table, key, self.writer_id)).lastrowid
+        if generation % CHANGE_LOG_PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM changes WHERE generation <= ?", (generation - CHANGE_LOG_SIZE,))
+
+    def changes(self, tables) -> List[Tuple[str, Optional[str]]]:
+        """(table, key) of the records of ``tables`` other writers changed since the last call, oldest first.
+
+        Key None means the whole table has to be reloaded: it was bulk-loaded, or the
+        entries since the last call were already pruned from the log.
+        """
+        with self._seen_lock:
+            rows = self.connection().execute(
+                "SELECT generation, name, key, writer FROM changes WHERE generation > ? ORDER BY generation",
+                (self._seen,)).fetchall()
+            if not rows:
+                return []
+            pruned = rows[0][0] != self._seen + 1
+            self._seen = rows[-1][0]
+        if pruned:
+            return [(table, None) for table in tables]
+        changed: Dict[Tuple[str, Optional[str]], None] = {}
+        for _, table, key, writer in rows:
+            if table in tables and writer != self.writer_id:
+                changed.pop((table, key), None)
+                changed[(table, key)] = None  # latest position wins
+        return list(changed)
+
+    def fetch_one(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+        row = self.connection().execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def fetch_all(self, sql: str, params: tuple = ()) -> List[Dict]:
+        return [json.loads(row[0]) for row in self.connection().execute(sql, params)]
+
+    def upsert(self, conn: sqlite3.Connection, table: str, record: Dict, key: Optional[str] = None,
+               log: bool = True) -> None:
+        """Insert or update a record, keeping its rowid (and therefore its position) on update.
+
+        Bulk loaders pass ``log=False`` and log one whole-table change per batch instead.
+        """
+        columns = TABLE_COLUMNS[table]
+        values = [key if key is not None else record[columns[0]]] + [record.get(c) for c in columns[1:]]
+        assignments = ", ".join(f"{c} = excluded.{c}" for c in columns[1:] + ("data",))
+        conn.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}, data) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+            f"ON CONFLICT({columns[0]}) DO UPDATE SET {assignments}",
+            (*values, json.dumps(record))
+        )
+        if log:
+            self.log_change(conn, table, values[0])
+
+
+class SQLiteDataHandler(DataHandler):
+    """DataHandler backed by indexed SQLite tables instead of in-memory JSON documents"""
+
+    records_in_memory = False
+
+    def __init__(self, db_path: str = DEFAULT_SQLITE_DB_PATH):
+        self.db = SQLiteDatabase(db_path)
+        self._init_listeners()
+
+    def flush(self) -> None:
+        """Nothing to do: every update is committed in its own transaction"""
+
+    def refresh(self) -> None:
+        """Announce the records other processes wrote, so derived caches (columns, summaries) follow them.
+
+        Queries themselves always read the shared database.
+        """
+        fetch = {"customers": self.get_customer, "orders": self.get_order, "payments": self.get_payment,
+                 "escalations": self.get_escalation}
+        for collection, key in self.db.changes(tuple(fetch)):
+            record = fetch[collection](key) if key is not None else None
+            self._notify(collection, key if record is not None else None, record)  # gone: reload
+
+    def list_customers(self) -> List[Dict]:
+        return self.db.fetch_all("SELECT data FROM customers ORDER BY rowid")
+
+    def iter_records(self, collection: str) -> Iterator[Dict]:
+        for row in self.db.connection().execute(f"SELECT data FROM {collection} ORDER BY rowid"):
+            yield json.loads(row[0])
+
+    def get_customer(self, customer_id: str) -> Optional[Dict]:
+        return self.db.fetch_one("SELECT data FROM customers WHERE customer_id = ?", (customer_id,))
+
+    def get_customer_orders(self, customer_id: str) -> List[Dict]:
+        return self.db.fetch_all("SELECT data FROM orders WHERE customer_id = ? ORDER BY rowid", (customer_id,))
+
+    def get_order(self, order_id: str) -> Optional[Dict]:
+        return self.db.fetch_one("SELECT data FROM orders WHERE order_id = ?", (order_id,))
+
+    def get_payment(self, payment_id: str) -> Optional[Dict]:
+        return self.db.fetch_one("SELECT data FROM payments WHERE payment_id = ?", (payment_id,))
+
+    def get_customer_payments(self, customer_id: str) -> List[Dict]:
+        return self.db.fetch_all("SELECT data FROM payments WHERE customer_id = ? ORDER BY rowid", (customer_id,))
+
+    def get_order_payment(self, order_id: str) -> Optional[Dict]:
+        return self.db.fetch_one("SELECT data FROM payments WHERE order_id = ? ORDER BY rowid LIMIT 1", (order_id,))
+
+    def get_failed_payments(self, customer_id: str) -> List[Dict]:
+        return self.db.fetch_all(
+            "SELECT data FROM payments WHERE customer_id = ? AND status = 'failed' ORDER BY rowid", (customer_id,))
+
+    def get_customer_subscriptions(self, customer_id: str) -> List[Dict]:
+        return self.db.fetch_all("SELECT data FROM subscriptions WHERE customer_id = ? ORDER BY rowid", (customer_id,))
+
+    def get_escalation(self, case_id: str) -> Optional[Dict]:
+        return self.db.fetch_one("SELECT data FROM escalations WHERE case_id = ?", (case_id,))
+
+    def update_wallet_balance(self, customer_id: str, new_balance: float) -> bool:
+        with self.db.transaction() as conn:
+            customer = self.get_customer(customer_id)
+            if customer is None:
+                return False
+            customer["wallet_balance"] = new_balance
+            self.db.upsert(conn, "customers", customer)
+        self._notify("customers", customer_id, customer)
+        return True
+
+    def credit_wallet(self, customer_id: str, amount: float) -> Optional[float]:
+        with self.db.transaction() as conn:
+            customer = self.get_customer(customer_id)
+            if customer is None:
+                return None
+            customer["wallet_balance"] += amount
+            self.db.upsert(conn, "customers", customer)
+        self._notify("customers", customer_id, customer)
+        return customer["wallet_balance"]
+
+    def update_payments_status(self, payment_ids: List[str], status: str) -> int:
+        updated = []
+        with self.db.transaction() as conn:
+            for payment_id in payment_ids:
+                payment = self.get_payment(payment_id)
+                if payment is None or payment["status"] == status:
+                    continue
+                payment["status"] = status
+                self.db.upsert(conn, "payments", payment)
+                updated.append(payment)
+        for payment in updated:
+            self._notify("payments", payment["payment_id"], payment)
+        return len(updated)
+
+    def add_escalation(self, case_id: str, customer_id: str, issue_details: str) -> bool:
+        escalation = {
+            "customer_id": customer_id,
+            "issue_details": issue_details,
+            "status": "pending",
+            "escalation_time": datetime.now().isoformat()
+        }
+        with self.db.transaction() as conn:
+            self.db.upsert(conn, "escalations", escalation, key=case_id)
+        self._notify("escalations", case_id, escalation)
+        return True
+
+    def update_escalation_status(self, case_id: str, status: str) -> bool:
+        with self.db.transaction() as conn:
+            escalation = self.get_escalation(case_id)
+            if escalation is None:
+                return False
+            escalation["status"] = status
+            self.db.upsert(conn, "escalations", escalation, key=case_id)
+        self._notify("escalations", case_id, escalation)
+        return True
+
+
+class SQLiteSubscriptionManager(SubscriptionManager):
+    """SubscriptionManager backed by the same SQLite database as SQLiteDataHandler"""
+
+    def __init__(self, db_path: str = DEFAULT_SQLITE_DB_PATH):
+        self.db = SQLiteDatabase(db_path)
+        self._init_listeners()
+
+    def flush(self) -> None:
+        """Nothing to do: every update is committed in its own transaction"""
+
+    def refresh(self) -> None:
+        """Announce the subscriptions other processes wrote, for derived caches to follow"""
+        for _, key in self.db.changes(("subscriptions",)):
+            record = self._find_subscription(key) if key is not None else None
+            self._notify("subscriptions", key if record is not None else None, record)
+
+    def create_subscription(self, customer_id: str, items: List[Dict], delivery_date: str, subscription_type: str) -> Dict:
+        """Create a new subscription with a specific delivery date and type"""
+        with self.db.transaction() as conn:
+            # BEGIN IMMEDIATE serializes writers, so reading the highest ID and inserting the next is atomic
+            last_id = conn.execute(
+                "SELECT MAX(CAST(substr(subscription_id, 4) AS INTEGER)) FROM subscriptions").fetchone()[0] or 0
+            subscription = {
+                "subscription_id": f"SUB{last_id + 1:03d}",
+                "customer_id": customer_id,
+                "items": items,
+                "delivery_date": delivery_date,
+                "subscription_type": subscription_type,
+                "status": "active",
+                "created_at": datetime.now().isoformat()
+            }
+            self.db.upsert(conn, "subscriptions", subscription)
+        self._notify("subscriptions", subscription["subscription_id"], subscription)
+        return subscription
+
+    def get_customer_subscriptions(self, customer_id: str) -> List[Dict]:
+        """Get all subscriptions for a customer"""
+        return self.db.fetch_all("SELECT data FROM subscriptions WHERE customer_id = ? ORDER BY rowid", (customer_id,))
+
+    def cancel_subscription(self, subscription_id: str) -> bool:
+        """Cancel a subscription"""
+        with self.db.transaction() as conn:
+            sub = self._find_subscription(subscription_id)
+            if sub is None:
+                return False
+            sub["status"] = "cancelled"
+            self.db.upsert(conn, "subscriptions", sub)
+        self._notify("subscriptions", subscription_id, sub)
+        return True
+
+    def _find_subscription(self, subscription_id: str) -> Optional[Dict]:
+        """Look up a subscription by ID"""
+        return self.db.fetch_one("SELECT data FROM subscriptions WHERE subscription_id = ?", (subscription_id,))
+
+
+def create_data_handler(data_dir: str = "mock_data") -> DataHandler:
+    """Build a standalone DataHandler for the configured STORAGE_BACKEND"""
+    backend = os.getenv("STORAGE_BACKEND", "json")
+    if backend == "sqlite":
+        return SQLiteDataHandler(os.getenv("SQLITE_DB_PATH", DEFAULT_SQLITE_DB_PATH))
+    if backend == "lazy":
+        return LazyDataHandler(data_dir)
+    return DataHandler(data_dir)
+
+
+def create_subscription_manager(data_dir: str = "mock_data") -> SubscriptionManager:
+    """Build a standalone SubscriptionManager for the configured STORAGE_BACKEND"""
+    if os.getenv("STORAGE_BACKEND", "json") == "sqlite":
+        return SQLiteSubscriptionManager(os.getenv("SQLITE_DB_PATH", DEFAULT_SQLITE_DB_PATH))
+    return SubscriptionManager(data_dir)
+
+
+class Repository:
+    """The DataHandler/SubscriptionManager pair shared by every component of the process"""
+
+    def __init__(self, data_handler: DataHandler, subscription_manager: SubscriptionManager):
+        self.data_handler = data_handler
+        self.subscription_manager = subscription_manager
+        self.columns = ColumnarStore(data_handler)
+        self.summaries = summaries_from_env(data_handler, subscription_manager, self.columns)
+        self.monitor = None
+
+    @classmethod
+    def create(cls, data_dir: str = "mock_data") -> "Repository":
+        """Load the configured backend once, sharing the subscriptions document between both halves"""
+        if os.getenv("STORAGE_BACKEND", "json") == "sqlite":
+            repository = cls(create_data_handler(data_dir), create_subscription_manager(data_dir))
+            # Polling is one SELECT, so cached aggregates follow other processes' writes by default
+            repository.monitor = monitor_from_env(repository, DEFAULT_COHERENCE_INTERVAL)
+            return repository
+        handler_class = LazyDataHandler if os.getenv("STORAGE_BACKEND", "json") == "lazy" else DataHandler
+        flusher = flusher_from_env()
+        subscription_manager = SubscriptionManager(data_dir, flusher=flusher)
+        data_handler = handler_class(data_dir, subscriptions=subscription_manager.subscriptions, flusher=flusher,
+                                     subscriptions_lock=subscription_manager.lock)
+        subscription_manager.add_listener(data_handler._on_subscription_changed)
+        repository = cls(data_handler, subscription_manager)
+        repository.monitor = monitor_from_env(repository)
+        return repository
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """Subscribe to changes from both the data handler and the subscription manager"""
+        self.data_handler.add_listener(listener)
+        self.subscription_manager.add_listener(listener)
+
+    def flush(self) -> None:
+        """Make every buffered write durable, e.g. before shutdown"""
+        self.data_handler.flush()
+        self.subscription_manager.flush()
+
+    def refresh(self) -> None:
+        """Pick up changes written by other processes sharing the same data files"""
+        self.subscription_manager.refresh()
+        self.data_handler.refresh()
+
+
+_repository: Optional[Repository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository(data_dir: str = "mock_data") -> Repository:
+    """Return the process-wide Repository, loading it on first use"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = Repository.create(data_dir)
+        return _repository
+
+
+def import_json(data_dir: str = "mock_data", db_path: str = DEFAULT_SQLITE_DB_PATH) -> Dict[str, int]:
+    """One-shot import of the JSON data files (including journalled changes) into an SQLite database"""
+    source = DataHandler(data_dir)
+    subscriptions = SubscriptionManager(data_dir).subscriptions.get("subscriptions", [])
+    db = SQLiteDatabase(db_path)
+    counts = {}
+    with db.transaction() as conn:
+        for table, records in (
+            ("customers", source.customers.get("customers", [])),
+            ("orders", source.orders.get("orders", [])),
+            ("payments", source.payments.get("payments", [])),
+            ("subscriptions", subscriptions),
+        ):
+            for record in records:
+                db.upsert(conn, table, record, log=False)
+            db.log_change(conn, table, None)
+            counts[table] = len(records)
+        escalations = source.escalations.get("escalations", {})
+        for case_id, escalation in escalations.items():
+            db.upsert(conn, "escalations", escalation, key=case_id, log=False)
+        db.log_change(conn, "escalations", None)
+        counts["escalations"] = len(escalations)
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import mock_data JSON files into the SQLite storage backend")
+    parser.add_argument("--data-dir", default="mock_data")
+    parser.add_argument("--db", default=os.getenv("SQLITE_DB_PATH", DEFAULT_SQLITE_DB_PATH))
+    args = parser.parse_args()
+    for table, count in import_json(args.data_dir, args.db).items():
+        print(f"Imported {count} {table}")
@@ -3,30 +3,83 @@ import os
 from datetime import datetime, date
 from typing import Dict, List, Optional
 import calendar
+from journal import Journal, COMPACT_EVERY
+from change_notifier import ChangeNotifier
+from rwlock import ReadWriteLock
 
-class SubscriptionManager:
-    def __init__(self, data_dir: str = "mock_data"):
+class SubscriptionManager(ChangeNotifier):
+    def __init__(self, data_dir: str = "mock_data", compact_every: int = COMPACT_EVERY, flusher=None):
         self.data_dir = data_dir
+        self._init_listeners()
+        self.lock = ReadWriteLock()
+        self._journal = Journal(os.path.join(data_dir, "subscriptions.json"), compact_every,
+                                snapshot=lambda: self.subscriptions, flusher=flusher, lock=self.lock)
         self.subscriptions = self._load_json("subscriptions.json")
         self._migrate_subscriptions()  # Migrate old subscriptions on initialization
+        self._last_id = max((self._id_number(s["subscription_id"]) for s in self.subscriptions["subscriptions"]), default=0)
     
     def _load_json(self, filename: str) -> Dict:
         """Load JSON data from file"""
         file_path = os.path.join(self.data_dir, filename)
         try:
             with open(file_path, 'r') as f:
-                return json.load(f)
+                self._journal.snapshot_sig = Journal.signature(os.fstat(f.fileno()))
+                data = json.load(f)
         except FileNotFoundError:
             print(f"Warning: {filename} not found, creating empty file")
             data = {"subscriptions": []}
+            # Replay before writing the new snapshot: writing it removes the journal
+            self._journal.replay(data)
             self._save_json(filename, data)
             return data
+        self._journal.replay(data)
+        return data
     
     def _save_json(self, filename: str, data: Dict) -> None:
-        """Save JSON data to file"""
-        file_path = os.path.join(self.data_dir, filename)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Save a full snapshot of the JSON data, folding in any journalled changes"""
+        self._journal.compact(data)
+    
+    def _append(self, subscription: Dict) -> None:
+        """Persist a single created or updated subscription through the journal and notify listeners"""
+        self._journal.append("subscriptions", subscription, key_field="subscription_id")
+        self._notify("subscriptions", subscription["subscription_id"], subscription)
+    
+    @staticmethod
+    def _id_number(subscription_id: str) -> int:
+        """Numeric part of a SUBnnn identifier, 0 if it has none"""
+        digits = subscription_id[3:]
+        return int(digits) if digits.isdigit() else 0
+    
+    def flush(self) -> None:
+        """Write out any journal entries still buffered by a write-behind flusher"""
+        self._journal.flush()
+    
+    def refresh(self) -> None:
+        """Pick up subscriptions other processes created or changed since the last look"""
+        entries = self._journal.poll()
+        if entries is None:
+            self._journal.flush()
+            data = self._load_json("subscriptions.json")
+            with self.lock.write():
+                # Replace the contents in place: a DataHandler may share this document
+                self.subscriptions["subscriptions"][:] = data.get("subscriptions", [])
+                self._last_id = max((self._id_number(s["subscription_id"]) for s in self.subscriptions["subscriptions"]), default=0)
+            self._notify("subscriptions", None, None)
+            return
+        for entry in entries:
+            record = entry["record"]
+            with self.lock.write():
+                sub = self._find_subscription(record["subscription_id"])
+                if sub is None:
+                    self.subscriptions["subscriptions"].append(record)
+                    sub = record
+                else:
+                    # In place, as DataHandler indexes and readers share it; never emptied on the way
+                    sub.update(record)
+                    for field in sub.keys() - record.keys():
+                        del sub[field]
+                self._last_id = max(self._last_id, self._id_number(record["subscription_id"]))
+                self._notify("subscriptions", record["subscription_id"], sub)
     
     def _migrate_subscriptions(self):
         """Migrate subscriptions with 'delivery_day' to 'delivery_date'"""
@@ -50,58 +103,69 @@ class SubscriptionManager:
     
     def create_subscription(self, customer_id: str, items: List[Dict], delivery_date: str, subscription_type: str) -> Dict:
         """Create a new subscription with a specific delivery date and type"""
-        subscription_id = f"SUB{len(self.subscriptions['subscriptions']) + 1:03d}"
-        subscription = {
-            "subscription_id": subscription_id,
-            "customer_id": customer_id,
-            "items": items,
-            "delivery_date": delivery_date,
-            "subscription_type": subscription_type,
-            "status": "active",
-            "created_at": datetime.now().isoformat()
-        }
-        self.subscriptions["subscriptions"].append(subscription)
-        self._save_json("subscriptions.json", self.subscriptions)
+        with self.lock.write(), self._journal.exclusive():
+            # Catch up with other processes under their lock, so no two of them issue the same ID
+            self.refresh()
+            # IDs follow the highest one issued so far, so they stay unique even after gaps
+            self._last_id += 1
+            subscription = {
+                "subscription_id": f"SUB{self._last_id:03d}",
+                "customer_id": customer_id,
+                "items": items,
+                "delivery_date": delivery_date,
+                "subscription_type": subscription_type,
+                "status": "active",
+                "created_at": datetime.now().isoformat()
+            }
+            self.subscriptions["subscriptions"].append(subscription)
+            self._append(subscription)
         return subscription
     
     def get_customer_subscriptions(self, customer_id: str) -> List[Dict]:
         """Get all subscriptions for a customer"""
-        return [s for s in self.subscriptions["subscriptions"] if s["customer_id"] == customer_id]
+        with self.lock.read():
+            return [s for s in self.subscriptions["subscriptions"] if s["customer_id"] == customer_id]
     
     def cancel_subscription(self, subscription_id: str) -> bool:
         """Cancel a subscription"""
-        for sub in self.subscriptions["subscriptions"]:
-            if sub["subscription_id"] == subscription_id:
-                sub["status"] = "cancelled"
-                self._save_json("subscriptions.json", self.subscriptions)
-                return True
-        return False
+        with self.lock.write():
+            sub = self._find_subscription(subscription_id)
+            if sub is None:
+                return False
+            sub["status"] = "cancelled"
+            self._append(sub)
+        return True
+    
+    def _find_subscription(self, subscription_id: str) -> Optional[Dict]:
+        """Look up a subscription by ID"""
+        with self.lock.read():
+            return next((s for s in self.subscriptions["subscriptions"] if s["subscription_id"] == subscription_id), None)
     
     def get_notification(self, subscription_id: str) -> Optional[Dict]:
         """Check if a notification is needed based on subscription type"""
-        for sub in self.subscriptions["subscriptions"]:
-            if sub["subscription_id"] == subscription_id and sub["status"] == "active":
-                delivery_date = sub.get("delivery_date")
-                if delivery_date:
-                    try:
-                        next_delivery = datetime.strptime(delivery_date, "%Y-%m-%d").date()
-                        current_date = datetime.now().date()  # 08:34 PM +08, July 14, 2025
-                        days_until = (next_delivery - current_date).days
-                        items = ", ".join([item["name"] for item in sub["items"]])
-                        subscription_type = sub.get("subscription_type", "weekly")
-                        if days_until == 1:
-                            return {
-                                "message": f"Reminder: Your planned order {subscription_id} will restock {items} tomorrow on {delivery_date} ({subscription_type}).",
-                                "subscription_id": subscription_id,
-                                "delivery_date": delivery_date
-                            }
-                        elif 2 <= days_until <= 3:
-                            return {
-                                "message": f"Reminder: Your planned order {subscription_id} will restock {items} on {delivery_date} ({subscription_type}).",
-                                "subscription_id": subscription_id,
-                                "delivery_date": delivery_date
-                            }
-                    except ValueError as e:
-                        print(f"Invalid date format for subscription {subscription_id}: {e}")
-                        return None
+        sub = self._find_subscription(subscription_id)
+        if sub and sub["status"] == "active":
+            delivery_date = sub.get("delivery_date")
+            if delivery_date:
+                try:
+                    next_delivery = datetime.strptime(delivery_date, "%Y-%m-%d").date()
+                    current_date = datetime.now().date()  # 08:34 PM +08, July 14, 2025
+                    days_until = (next_delivery - current_date).days
+                    items = ", ".join([item["name"] for item in sub["items"]])
+                    subscription_type = sub.get("subscription_type", "weekly")
+                    if days_until == 1:
+                        return {
+                            "message": f"Reminder: Your planned order {subscription_id} will restock {items} tomorrow on {delivery_date} ({subscription_type}).",
+                            "subscription_id": subscription_id,
+                            "delivery_date": delivery_date
+                        }
+                    elif 2 <= days_until <= 3:
+                        return {
+                            "message": f"Reminder: Your planned order {subscription_id} will restock {items} on {delivery_date} ({subscription_type}).",
+                            "subscription_id": subscription_id,
+                            "delivery_date": delivery_date
+                        }
+                except ValueError as e:
+                    print(f"Invalid date format for subscription {subscription_id}: {e}")
+                    return None
         return None
\ No newline at end of file
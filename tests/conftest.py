@@ -0,0 +1,16 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """A scratch copy of mock_data, so tests can write journals and snapshots freely"""
+    path = tmp_path / "data"
+    shutil.copytree(os.path.join(ROOT, "mock_data"), path, ignore=shutil.ignore_patterns("*.journal", "*.lock", "*.db*"))
+    return str(path)
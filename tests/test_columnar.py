@@ -0,0 +1,69 @@
+from collections import Counter
+
+import pytest
+
+import columnar
+from columnar import ColumnarStore
+from data_handler import DataHandler
+
+
+@pytest.fixture(params=["numpy", "loops"])
+def handler(request, data_dir, monkeypatch):
+    if request.param == "loops":
+        monkeypatch.setattr(columnar, "np", None)
+    return DataHandler(data_dir)
+
+
+def test_aggregates_match_the_records(handler):
+    store = ColumnarStore(handler)
+    payments = list(handler.iter_records("payments"))
+    customer_payments = [p for p in payments if p["customer_id"] == "WM001"]
+
+    assert store.payment_count() == len(payments)
+    assert store.payment_status_counts() == dict(Counter(p["status"] for p in payments))
+    assert store.payment_total("WM001") == pytest.approx(sum(p["amount"] for p in customer_payments))
+    assert store.payment_count("WM001", "failed") == sum(p["status"] == "failed" for p in customer_payments)
+    assert store.payment_ids("WM001") == [p["payment_id"] for p in customer_payments]
+    assert store.order_ids("WM001") == [o["order_id"] for o in handler.get_customer_orders("WM001")]
+    assert store.wallet_total() == pytest.approx(sum(c["wallet_balance"] for c in handler.list_customers()))
+
+
+def test_unknown_customer_or_status_matches_nothing(handler):
+    store = ColumnarStore(handler)
+    assert store.order_count("NOPE") == 0
+    assert store.order_total(status="no-such-status") == 0.0
+    assert store.order_status_counts("NOPE") == {}
+    assert store.order_ids("NOPE") == []
+
+
+def test_status_change_is_applied_in_place(handler):
+    store = ColumnarStore(handler)
+    before = store.payment_status_counts()
+    table = store._tables["payments"]
+    status = handler.get_payment("PAY001")["status"]
+
+    handler.update_payments_status(["PAY001"], "refunded")
+    assert store._tables["payments"] is table  # no rebuild
+    expected = Counter(before)
+    expected[status] -= 1
+    expected["refunded"] += 1
+    assert store.payment_status_counts() == {k: v for k, v in expected.items() if v}
+
+
+def test_wallet_credit_is_applied_in_place(handler):
+    store = ColumnarStore(handler)
+    total = store.wallet_total()
+    handler.credit_wallet("WM001", 12.5)
+    assert "customers" not in store._stale
+    assert store.wallet_total() == pytest.approx(total + 12.5)
+
+
+def test_new_record_or_reload_rebuilds_on_next_query(handler):
+    store = ColumnarStore(handler)
+    count = store.order_count()
+    handler._notify("orders", "ORD999", {"order_id": "ORD999", "customer_id": "WM001", "status": "placed"})
+    assert "orders" in store._stale
+    assert store.order_count() == count  # rebuilt from the handler, which has no such order
+    handler._notify("orders", None, None)
+    assert "orders" in store._stale
+    assert store.order_count() == count
@@ -0,0 +1,56 @@
+import pytest
+
+from storage import Repository
+
+
+@pytest.fixture
+def repository(data_dir, monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "json")
+    return Repository.create(data_dir)
+
+
+def test_summary_is_built_once(repository):
+    summary = repository.summaries.get("WM001")
+    assert repository.summaries.get("WM001") is summary
+    assert summary["order_count"] == len(repository.data_handler.get_customer_orders("WM001"))
+    assert summary["payment_ids"] == {p["payment_id"] for p in repository.data_handler.get_customer_payments("WM001")}
+    assert repository.summaries.get("NOPE") is None
+
+
+def test_change_drops_only_that_customers_summary(repository):
+    first, second = repository.summaries.get("WM001"), repository.summaries.get("WM002")
+    repository.data_handler.credit_wallet("WM001", 10.0)
+
+    rebuilt = repository.summaries.get("WM001")
+    assert rebuilt is not first
+    assert str(rebuilt["customer"]["wallet_balance"]) in rebuilt["preamble"]
+    assert repository.summaries.get("WM002") is second
+
+
+def test_new_subscription_is_counted(repository):
+    active = repository.summaries.get("WM001")["active_subscriptions"]
+    repository.subscription_manager.create_subscription("WM001", [{"name": "milk"}], "2025-08-01", "weekly")
+    assert repository.summaries.get("WM001")["active_subscriptions"] == active + 1
+
+
+def test_reloaded_collection_drops_every_summary(repository):
+    first = repository.summaries.get("WM001")
+    repository.data_handler._notify("payments", None, None)
+    assert repository.summaries.get("WM001") is not first
+
+
+def test_summary_expires_after_ttl(repository):
+    repository.summaries.ttl = 0
+    assert repository.summaries.get("WM001") is not repository.summaries.get("WM001")
+
+
+def test_lazy_summary_decodes_only_that_customer(data_dir, monkeypatch, repository):
+    monkeypatch.setenv("STORAGE_BACKEND", "lazy")
+    lazy = Repository.create(data_dir)
+
+    def whole_collection(collection):
+        raise AssertionError(f"decoded every record of {collection}")
+
+    monkeypatch.setattr(lazy.data_handler, "iter_records", whole_collection)
+    expected = {k: v for k, v in repository.summaries.get("WM001").items() if k != "customer"}
+    assert {k: v for k, v in lazy.summaries.get("WM001").items() if k != "customer"} == expected
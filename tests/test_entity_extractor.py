@@ -0,0 +1,77 @@
+import threading
+from datetime import date, timedelta
+
+from data_handler import DataHandler
+from entity_extractor import EntityExtractor
+
+
+class _SlowOrders:
+    """A handler decoding records on demand, whose first full read waits for the test"""
+
+    records_in_memory = False
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def iter_records(self, collection):
+        self.release.wait(5)
+        return iter([{"order_id": "ORD001", "items": [{"name": "Amul Milk 1L"}]}])
+
+
+def test_vocabulary_is_read_in_the_background_for_lazy_handlers():
+    handler = _SlowOrders()
+    extractor = EntityExtractor(handler)
+    assert extractor.extract("where is my milk")["items"] == []  # does not wait for the read
+
+    for listener in handler.listeners:
+        listener("orders", "ORD002", {"order_id": "ORD002", "items": [{"name": "Basmati Rice 5kg"}]})
+    assert extractor.extract("the basmati rice")["items"] == ["basmati rice"]
+
+    handler.release.set()
+    for _ in range(100):
+        if extractor._loaded:
+            break
+        threading.Event().wait(0.01)
+    assert extractor.extract("amul milk and basmati rice")["items"] == ["amul milk", "basmati rice"]
+
+
+def test_ids_amounts_and_dates_in_order_of_appearance():
+    entities = EntityExtractor().extract("ord002 was charged Rs. 1,299.50 on 2025-07-14 via PAY007, not 300 rupees on 15/07/25")
+    assert entities["order_ids"] == ["ORD002"]
+    assert entities["payment_ids"] == ["PAY007"]
+    assert entities["amounts"] == [1299.5, 300.0]
+    assert entities["dates"] == ["2025-07-14", "2025-07-15"]
+
+
+def test_relative_and_invalid_dates():
+    entities = EntityExtractor().extract("ordered yesterday, not on 2025-02-30 or 31/02/2025")
+    assert entities["dates"] == [(date.today() - timedelta(days=1)).isoformat()]
+
+
+def test_duplicates_are_dropped():
+    assert EntityExtractor().extract("ORD001 and ord001 again")["order_ids"] == ["ORD001"]
+
+
+def test_items_match_longest_phrase_and_plurals():
+    extractor = EntityExtractor(items=["Amul Milk 1L", "Tide Detergent 1kg", "Glassware Set"])
+    assert extractor.extract("two amul milks and some detergent")["items"] == ["amul milk", "detergent"]
+    assert extractor.extract("the set broke")["items"] == []  # too generic on its own
+    assert extractor.extract("the glassware set broke")["items"] == ["glassware set"]
+
+
+def test_other_entities_break_item_phrases():
+    extractor = EntityExtractor(items=["Amul Milk 1L"])
+    assert extractor.extract("amul ORD001 milk")["items"] == ["amul", "milk"]
+
+
+def test_vocabulary_follows_the_handlers_orders(data_dir):
+    handler = DataHandler(data_dir)
+    extractor = EntityExtractor(handler)
+    assert extractor.extract("my yoga mat and the earbuds")["items"] == ["yoga mat", "earbuds"]
+
+    handler._notify("orders", "ORD999", {"order_id": "ORD999", "items": [{"name": "Cricket Bat"}]})
+    assert extractor.extract("the cricket bat")["items"] == ["cricket bat"]
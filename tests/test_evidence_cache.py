@@ -0,0 +1,69 @@
+import atexit
+import random
+
+from PIL import Image, ImageFilter
+
+from evidence_cache import VerdictCache, dhash
+
+APPROVED = {"status": "approved", "message": "Damage visible", "confidence": 0.9}
+
+
+def _flip(fingerprint, *bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def _photo(seed):
+    rng = random.Random(seed)
+    image = Image.new("RGB", (64, 64))
+    image.putdata([tuple(rng.randrange(256) for _ in range(3)) for _ in range(64 * 64)])
+    return image.filter(ImageFilter.GaussianBlur(4))
+
+
+def test_rescaled_photo_hashes_close_to_original():
+    photo = _photo(1)
+    distance = (dhash(photo) ^ dhash(photo.resize((200, 200)))).bit_count()
+    assert distance <= 5
+    assert (dhash(photo) ^ dhash(_photo(2))).bit_count() > 5
+
+
+def test_lookup_finds_hashes_within_threshold():
+    cache = VerdictCache(threshold=5)
+    fingerprint = 0x0123456789ABCDEF
+    cache.put(fingerprint, "WM001", APPROVED)
+
+    assert cache.lookup(_flip(fingerprint, 0, 13, 27, 40, 63)) == ("WM001", {"status": "approved", "message": "Damage visible"})
+    assert cache.lookup(_flip(fingerprint, 0, 13, 27, 40, 50, 63)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lookup_prefers_the_closest_hash():
+    cache = VerdictCache(threshold=5)
+    cache.put(0, "WM001", APPROVED)
+    cache.put(_flip(0, 1, 2, 3), "WM002", dict(APPROVED, status="rejected"))
+    assert cache.lookup(_flip(0, 1, 2))[0] == "WM002"
+
+
+def test_least_recently_seen_is_evicted_from_every_bucket():
+    cache = VerdictCache(max_size=2, threshold=3)
+    cache.put(0x1, "WM001", APPROVED)
+    cache.put(0xF000000000000000, "WM002", APPROVED)
+    assert cache.lookup(0x1)[0] == "WM001"
+    cache.put(0x00FF00FF00000000, "WM003", APPROVED)
+
+    assert cache.lookup(0xF000000000000000) is None
+    assert cache.lookup(0x1)[0] == "WM001"
+    assert sum(len(bucket) for buckets in cache._buckets for bucket in buckets.values()) == 2 * len(cache._bands)
+
+
+def test_saved_cache_is_loaded_on_start(tmp_path):
+    path = str(tmp_path / "evidence.json")
+    cache = VerdictCache(path=path)
+    atexit.unregister(cache.save)
+    cache.put(0xDEADBEEF, "WM001", APPROVED)
+    cache.save()
+
+    restarted = VerdictCache(path=path)
+    atexit.unregister(restarted.save)
+    assert restarted.lookup(_flip(0xDEADBEEF, 4)) == ("WM001", {"status": "approved", "message": "Damage visible"})
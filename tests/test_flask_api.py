@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip("groq")
+import flask_api  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return flask_api.app.test_client()
+
+
+def test_oversized_validation_request_is_refused(client, monkeypatch):
+    monkeypatch.setitem(flask_api.app.config, "MAX_CONTENT_LENGTH", 1024)
+    response = client.post("/validate", data={"file": (io.BytesIO(b"\0" * 4096), "photo.jpg")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 413
+
+
+def test_request_limit_leaves_room_for_every_image():
+    limit = flask_api.app.config["MAX_CONTENT_LENGTH"]
+    assert limit > flask_api.validation_service.ingestor.max_bytes * flask_api.MAX_EVIDENCE_IMAGES
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_chat_batch_streams_results_with_request_indexes(client, monkeypatch):
+    def respond_batch(items):
+        # Completion order, not request order; indexes are positions in ``items``
+        for index in reversed(range(len(items))):
+            intent = 'REFUND_REQUEST' if 'refund' in items[index][1] else 'GENERAL_INQUIRY'
+            yield {'index': index, 'intent': intent, 'response': f"re: {items[index][1]}"}
+
+    monkeypatch.setattr(flask_api.nlu, "respond_batch", respond_batch)
+    monkeypatch.setattr(flask_api.resolution_engine, "process_intent", lambda intent, message, customer_id: f"CASE-{customer_id}")
+    response = client.post("/chat/batch", json={'messages': [
+        {'customer_id': 'WM002', 'message': 'hello'},
+        {'message': ''},
+        {'customer_id': 'WM003', 'message': 'I want a refund'},
+    ]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert _ndjson(response) == [
+        {'index': 1, 'error': 'Message is required'},
+        {'index': 2, 'intent': 'REFUND_REQUEST', 'response': 're: I want a refund', 'case_id': 'CASE-WM003'},
+        {'index': 0, 'intent': 'GENERAL_INQUIRY', 'response': 're: hello'},
+    ]
+
+
+def test_chat_batch_reports_a_failure_as_the_last_line(client, monkeypatch):
+    def respond_batch(items):
+        yield {'index': 0, 'intent': 'GENERAL_INQUIRY', 'response': 'ok'}
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(flask_api.nlu, "respond_batch", respond_batch)
+    lines = _ndjson(client.post("/chat/batch", json={'messages': [{'message': 'a'}, {'message': 'b'}]}))
+    assert lines[0]['index'] == 0
+    assert lines[-1] == {'error': 'Batch processing failed', 'details': 'model down'}
+
+
+def test_chat_batch_limits(client, monkeypatch):
+    assert client.post("/chat/batch", json={'messages': []}).status_code == 400
+    monkeypatch.setattr(flask_api, "MAX_BATCH_MESSAGES", 1)
+    assert client.post("/chat/batch", json={'messages': [{'message': 'a'}, {'message': 'b'}]}).status_code == 413
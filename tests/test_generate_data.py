@@ -0,0 +1,12 @@
+from generate_data import SQLiteWriter, generate, load
+from storage import SQLiteDataHandler
+
+
+def test_bulk_load_into_sqlite(tmp_path):
+    db_path = str(tmp_path / "scale.db")
+    [counts] = load(generate(50, seed=7), [SQLiteWriter(db_path, batch_size=40)])
+
+    handler = SQLiteDataHandler(db_path)
+    assert counts["customers"] == 50
+    assert len(handler.list_customers()) == 50
+    assert sum(1 for _ in handler.iter_records("orders")) == counts["orders"]
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+from PIL import Image
+
+from image_ingest import ImageIngestor, ImageRejected
+
+
+def _upload(size, fmt="PNG", exif=None):
+    out = io.BytesIO()
+    image = Image.new("RGB", size, "red")
+    image.paste((0, 0, 255), (0, 0, 10, 10))  # marks the top-left corner
+    image.save(out, fmt, **({"exif": exif} if exif is not None else {}))
+    out.seek(0)
+    return out
+
+
+def test_oversized_upload_is_rejected():
+    with pytest.raises(ImageRejected, match="MB limit"):
+        ImageIngestor(max_bytes=1024).ingest(io.BytesIO(b"\0" * 4096))
+
+
+def test_too_many_pixels_is_rejected():
+    with pytest.raises(ImageRejected, match="pixel limit"):
+        ImageIngestor(max_pixels=100 * 100).ingest(_upload((200, 100)))
+
+
+def test_unreadable_upload_is_rejected():
+    with pytest.raises(ImageRejected, match="not a readable image"):
+        ImageIngestor().ingest(io.BytesIO(b"not an image"))
+
+
+def test_large_jpeg_is_fitted_within_max_side():
+    ingested = ImageIngestor(max_side=256).ingest(_upload((2000, 1000), "JPEG"))
+    assert ingested.original_size == (2000, 1000)
+    assert ingested.image.size == (256, 128)
+    assert Image.open(io.BytesIO(ingested.jpeg)).format == "JPEG"
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored sideways: rotate 90 degrees clockwise to view
+    ingested = ImageIngestor(max_side=256).ingest(_upload((40, 20), "JPEG", exif))
+    assert ingested.image.size == (20, 40)
+    r, g, b = ingested.image.getpixel((17, 2))  # the marked corner is now top-right
+    assert b > r
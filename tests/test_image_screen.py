@@ -0,0 +1,67 @@
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from image_ingest import IngestedImage
+from image_screen import ImageScreener, screener_from_env
+
+
+def _ingested(image):
+    return IngestedImage(image, b"", 0, image.size)
+
+
+def _noise(size, seed=1):
+    rng = random.Random(seed)
+    image = Image.new("L", size)
+    image.putdata([rng.randrange(256) for _ in range(size[0] * size[1])])
+    return image.convert("RGB")
+
+
+def _photo():
+    return _noise((400, 300)).filter(ImageFilter.GaussianBlur(1))
+
+
+def _blurred():
+    return _noise((8, 6)).resize((400, 300), Image.BICUBIC).filter(ImageFilter.GaussianBlur(8))
+
+
+def _screenshot():
+    image = Image.new("RGB", (400, 300), "white")
+    draw = ImageDraw.Draw(image)
+    for row in range(20, 280, 20):
+        draw.rectangle((20, row, 20 + (row * 7) % 300 + 40, row + 8), fill="black")
+    return image
+
+
+def test_plausible_photo_goes_to_the_model():
+    assert ImageScreener().screen(_ingested(_photo())) is None
+
+
+def test_tiny_upload_is_rejected_by_original_size():
+    image = _photo()
+    verdict = ImageScreener().screen(IngestedImage(image, b"", 0, (120, 90)))
+    assert (verdict["status"], verdict["screen"]) == ("rejected", "tiny")
+
+
+def test_blank_image_is_rejected():
+    verdict = ImageScreener().screen(_ingested(Image.new("RGB", (400, 300), (200, 200, 200))))
+    assert (verdict["status"], verdict["screen"]) == ("rejected", "blank")
+
+
+def test_blurred_image_is_rejected():
+    verdict = ImageScreener().screen(_ingested(_blurred()))
+    assert (verdict["status"], verdict["screen"]) == ("rejected", "blurry")
+
+
+def test_screenshot_is_escalated_with_a_case():
+    verdict = ImageScreener().screen(_ingested(_screenshot()))
+    assert (verdict["status"], verdict["screen"]) == ("escalated", "screenshot")
+    assert verdict["case_id"]
+
+
+def test_screening_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("IMAGE_SCREENING", "0")
+    assert screener_from_env() is None
+    monkeypatch.setenv("IMAGE_SCREENING", "1")
+    monkeypatch.setenv("SCREEN_MIN_SIDE", "50")
+    assert screener_from_env().min_side == 50
@@ -0,0 +1,90 @@
+import atexit
+import json
+
+import pytest
+
+import intent_cache
+from intent_cache import IntentCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(intent_cache.time, "time", clock)
+    return clock
+
+
+def _warm_cache(path, **kwargs):
+    cache = IntentCache(path=str(path), **kwargs)
+    atexit.unregister(cache.save)
+    return cache
+
+
+def test_lookup_ignores_case_and_punctuation(clock):
+    cache = IntentCache()
+    cache.put("Where is my order?", "order_status")
+    assert cache.get("where is   my ORDER") == "order_status"
+    assert cache.get("where is my refund") is None
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = IntentCache(ttl=60)
+    cache.put("cancel my subscription", "cancel_subscription")
+    clock.now += 60
+    assert cache.get("cancel my subscription") == "cancel_subscription"
+    clock.now += 1
+    assert cache.get("cancel my subscription") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = IntentCache(max_size=2)
+    cache.put("a", "one")
+    cache.put("b", "two")
+    cache.get("a")
+    cache.put("c", "three")
+    assert cache.get("b") is None
+    assert cache.get("a") == "one" and cache.get("c") == "three"
+
+
+def test_warm_start_keeps_fresh_entries_in_lru_order(tmp_path, clock):
+    path = tmp_path / "intents.json"
+    cache = _warm_cache(path, ttl=60)
+    cache.put("old", "stale")
+    clock.now += 30
+    cache.put("a", "one")
+    cache.put("b", "two")
+    cache.get("a")
+    cache.save()
+
+    clock.now += 45  # "old" is now 75s old
+    restarted = _warm_cache(path, ttl=60, max_size=2)
+    assert restarted.stats()["size"] == 2
+    restarted.put("c", "three")  # evicts b, the least recently used before the restart
+    assert restarted.get("b") is None
+    assert restarted.get("a") == "one"
+    assert restarted.get("old") is None
+
+
+def test_unreadable_cache_file_starts_cold(tmp_path, capsys):
+    path = tmp_path / "intents.json"
+    path.write_text("{not json")
+    assert _warm_cache(path).stats()["size"] == 0
+    assert "could not load intent cache" in capsys.readouterr().out
+
+
+def test_save_writes_stored_time(tmp_path, clock):
+    path = tmp_path / "intents.json"
+    cache = _warm_cache(path)
+    cache.put("hello", "greeting")
+    cache.save()
+    assert json.loads(path.read_text()) == {"hello": ["greeting", clock.now]}
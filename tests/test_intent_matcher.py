@@ -0,0 +1,43 @@
+from intent_matcher import KeywordMatcher
+
+KEYWORDS = {
+    "WALLET": ["wallet", "wallet empty", "balance"],
+    "DELIVERY": ["delay", "late delivery", ("where is my order", 5.0)],
+    "REFUND": ["refund", "money back"],
+}
+
+
+def test_keywords_match_on_word_boundaries_only():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.classify("my refund please") == "REFUND"
+    assert matcher.classify("refundable items") == "GENERAL_INQUIRY"
+    assert matcher.classify("rebalanced") == "GENERAL_INQUIRY"
+
+
+def test_last_word_inflections_match():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.classify("my order got delayed") == "DELIVERY"
+    assert matcher.classify("refunds take too long") == "REFUND"
+
+
+def test_longest_overlapping_keyword_wins():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.scores("my wallet empty again") == [2.0, 0.0, 0.0]
+    assert matcher.scores("wallet, balance") == [2.0, 0.0, 0.0]
+
+
+def test_explicit_weight_outweighs_other_hits():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.match("where is my order and my refund") == ("DELIVERY", 5.0)
+
+
+def test_ties_go_to_the_intent_listed_first():
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.classify("wallet refund") == "WALLET"
+    assert KeywordMatcher(dict(reversed(KEYWORDS.items()))).classify("wallet refund") == "REFUND"
+
+
+def test_no_match_returns_default():
+    matcher = KeywordMatcher(KEYWORDS, default="OTHER")
+    assert matcher.match("hello there") == ("OTHER", 0.0)
+    assert matcher.classify_batch(["hello", "money back now", "late delivery"]) == ["OTHER", "REFUND", "DELIVERY"]
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+
+from data_handler import DataHandler
+import journal
+from journal import Journal
+from subscription_manager import SubscriptionManager
+
+# Two handlers on the same directory have separate writer IDs and file descriptors, so they
+# interact through the journal and the flock exactly as two worker processes would.
+
+
+def test_replay_merges_both_writers(data_dir):
+    a, b = DataHandler(data_dir), DataHandler(data_dir)
+    start = a.get_customer("WM001")["wallet_balance"]
+    a.credit_wallet("WM001", 25.0)
+    b.update_payments_status(["PAY001"], "refunded")
+
+    fresh = DataHandler(data_dir)
+    assert fresh.get_customer("WM001")["wallet_balance"] == start + 25.0
+    assert fresh.get_payment("PAY001")["status"] == "refunded"
+
+
+def test_refresh_applies_foreign_entries_only(data_dir):
+    a, b = DataHandler(data_dir), DataHandler(data_dir)
+    changes = []
+    a.add_listener(lambda collection, key, record: changes.append((collection, key)))
+    a.credit_wallet("WM001", 5.0)
+    b.update_payments_status(["PAY001"], "refunded")
+
+    a.refresh()
+    assert a.get_payment("PAY001")["status"] == "refunded"
+    assert changes == [("customers", "WM001"), ("payments", "PAY001")]
+    a.refresh()
+    assert len(changes) == 2
+
+
+class _Watched(dict):
+    """A record that remembers the fewest fields it held while being updated"""
+
+    fewest = None
+
+    def _seen(self):
+        self.fewest = len(self) if self.fewest is None else min(self.fewest, len(self))
+
+    def clear(self):
+        super().clear()
+        self._seen()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._seen()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._seen()
+
+
+def test_refresh_updates_shared_records_without_emptying_them(data_dir):
+    a, b = DataHandler(data_dir), DataHandler(data_dir)
+    held = _Watched(a.get_customer("WM001"))
+    customers = a.customers["customers"]
+    customers[customers.index(a.get_customer("WM001"))] = a._customers_by_id["WM001"] = held
+    b.credit_wallet("WM001", 5.0)
+
+    a.refresh()
+    assert held == b.get_customer("WM001")
+    assert held.fewest == len(held)
+
+
+def test_refresh_updates_held_subscription_in_place(data_dir):
+    a, b = SubscriptionManager(data_dir), SubscriptionManager(data_dir)
+    created = a.create_subscription("WM001", [{"name": "milk"}], "2025-08-01", "weekly")
+    held = _Watched(created)
+    subscriptions = a.subscriptions["subscriptions"]
+    subscriptions[subscriptions.index(created)] = held
+    b.refresh()
+    assert b.cancel_subscription(created["subscription_id"])
+
+    a.refresh()
+    assert held["status"] == "cancelled"
+    assert held.fewest == len(held)
+
+
+def test_compaction_waits_for_unseen_foreign_entries(data_dir):
+    a, b = DataHandler(data_dir), DataHandler(data_dir)
+    start = {c: a.get_customer(c)["wallet_balance"] for c in ("WM001", "WM002")}
+    a.credit_wallet("WM001", 10.0)
+    b.credit_wallet("WM002", 20.0)
+
+    # b has not seen a's entry: a snapshot written now would drop it
+    assert not b._journals["customers.json"].compact()
+    b.refresh()
+    assert b._journals["customers.json"].compact()
+    assert not os.path.exists(b._journals["customers.json"].journal_path)
+
+    fresh = DataHandler(data_dir)
+    assert fresh.get_customer("WM001")["wallet_balance"] == start["WM001"] + 10.0
+    assert fresh.get_customer("WM002")["wallet_balance"] == start["WM002"] + 20.0
+
+
+def test_refresh_after_foreign_compaction(data_dir):
+    a, b = DataHandler(data_dir), DataHandler(data_dir)
+    reloads = []
+    a.add_listener(lambda collection, key, record: reloads.append(collection) if key is None else None)
+    b.update_payments_status(["PAY001"], "refunded")
+    assert b._journals["payments.json"].compact()
+
+    assert a._journals["payments.json"].poll() is None  # snapshot replaced
+    a.refresh()
+    assert a.get_payment("PAY001")["status"] == "refunded"
+    assert "PAY001" in {p["payment_id"] for p in a.get_customer_payments("WM001")}  # indexes rebuilt
+    assert reloads == ["payments"]
+    assert a._journals["payments.json"].poll() == []
+
+    # a keeps writing on top of the new snapshot, and a compaction of its own now succeeds
+    a.update_payments_status(["PAY001"], "completed")
+    assert a._journals["payments.json"].compact()
+    assert DataHandler(data_dir).get_payment("PAY001")["status"] == "completed"
+
+
+def test_torn_journal_tail_is_dropped(data_dir):
+    a = DataHandler(data_dir)
+    start = a.get_customer("WM001")["wallet_balance"]
+    a.credit_wallet("WM001", 7.0)
+    with open(a._journals["customers.json"].journal_path, "a") as f:
+        f.write('{"collection": "customers", "rec')
+
+    fresh = DataHandler(data_dir)
+    assert fresh.get_customer("WM001")["wallet_balance"] == start + 7.0
+    with open(a._journals["customers.json"].journal_path) as f:
+        assert f.read().endswith("\n")
+
+
+def test_subscription_ids_stay_unique_across_writers(data_dir):
+    a, b = SubscriptionManager(data_dir), SubscriptionManager(data_dir)
+    ids = []
+    for manager in (a, b, a, b):
+        ids.append(manager.create_subscription("WM001", [{"name": "milk"}], "2025-08-01", "weekly")["subscription_id"])
+
+    assert len(set(ids)) == 4
+    assert {s["subscription_id"] for s in SubscriptionManager(data_dir).subscriptions["subscriptions"]} >= set(ids)
+
+
+def test_missing_snapshot_keeps_journalled_subscriptions(data_dir):
+    created = SubscriptionManager(data_dir).create_subscription("WM001", [{"name": "milk"}], "2025-08-01", "weekly")
+    os.remove(os.path.join(data_dir, "subscriptions.json"))
+
+    ids = {s["subscription_id"] for s in SubscriptionManager(data_dir).subscriptions["subscriptions"]}
+    assert created["subscription_id"] in ids
+    # ...and is part of the recreated snapshot, not only of a journal that was then removed
+    ids = {s["subscription_id"] for s in SubscriptionManager(data_dir).subscriptions["subscriptions"]}
+    assert created["subscription_id"] in ids
+
+
+class _ManualFlusher:
+    """Buffers appends like a write-behind flusher but leaves flushing to the test"""
+
+    def mark_dirty(self, journal, buffered):
+        pass
+
+
+def test_concurrent_flushes_land_in_order(data_dir):
+    path = os.path.join(data_dir, "payments.json")
+    journal = Journal(path, compact_every=10 ** 6, flusher=_ManualFlusher())
+    write_lines = journal._write_lines
+    first_write = threading.Event()
+
+    def slow_first_write(lines):
+        if not first_write.is_set():
+            first_write.set()
+            threading.Event().wait(0.2)  # the older batch is still being written...
+        write_lines(lines)
+
+    journal._write_lines = slow_first_write
+    journal.append("payments", {"payment_id": "PAY001", "version": 1}, key_field="payment_id")
+    older = threading.Thread(target=journal.flush)
+    older.start()
+    first_write.wait()
+    journal.append("payments", {"payment_id": "PAY001", "version": 2}, key_field="payment_id")
+    journal.flush()  # ...when a newer one is flushed from another thread
+    older.join()
+
+    data = {"payments": []}
+    Journal(path).replay(data)
+    assert data["payments"] == [{"payment_id": "PAY001", "version": 2}]
+
+
+def test_entry_appended_during_replay_is_kept(data_dir, monkeypatch):
+    path = os.path.join(data_dir, "payments.json")
+    Journal(path).append("payments", {"payment_id": "PAY001", "version": 1}, key_field="payment_id")
+    reader, writer = Journal(path), Journal(path)
+    getsize = os.path.getsize
+
+    def append_then_getsize(p):
+        # Another process appends between the end of the read and the size check
+        monkeypatch.setattr(journal.os.path, "getsize", getsize)
+        writer.append("payments", {"payment_id": "PAY001", "version": 2}, key_field="payment_id")
+        return getsize(p)
+
+    monkeypatch.setattr(journal.os.path, "getsize", append_then_getsize)
+    assert [e["record"]["version"] for e in reader.entries()] == [1]
+    monkeypatch.undo()
+
+    data = {"payments": []}
+    Journal(path).replay(data)
+    assert data["payments"] == [{"payment_id": "PAY001", "version": 2}]
+
+
+def test_line_being_written_is_not_truncated(data_dir):
+    path = os.path.join(data_dir, "payments.json")
+    writer, reader = Journal(path), Journal(path)
+    line = json.dumps({"collection": "payments", "key_field": "payment_id", "key": None,
+                       "record": {"payment_id": "PAY001", "version": 1}, "writer": writer.writer_id}) + "\n"
+    replayed = []
+    with writer._file_lock(exclusive=False):
+        with open(writer.journal_path, "a") as f:
+            f.write(line[:20])
+            f.flush()
+            replaying = threading.Thread(target=lambda: replayed.extend(reader.entries()))
+            replaying.start()
+            replaying.join(0.2)
+            f.write(line[20:])
+    replaying.join()
+
+    assert replayed == []  # the half-written line was not complete when read
+    with open(writer.journal_path) as f:
+        assert f.read() == line
@@ -0,0 +1,70 @@
+import json
+import os
+
+from data_handler import DataHandler
+from lazy_json import LazyDataHandler, OffsetIndex
+
+
+def test_nothing_is_loaded_up_front(data_dir):
+    handler = LazyDataHandler(data_dir)
+    assert "customers" not in handler.__dict__
+    assert not handler._indexes["orders"]._built
+    assert handler.get_customer("WM001")["customer_id"] == "WM001"
+    assert not handler._indexes["orders"]._built
+
+
+def test_lookups_match_the_eager_handler(data_dir):
+    lazy, eager = LazyDataHandler(data_dir), DataHandler(data_dir)
+    assert lazy.get_order("ORD001") == eager.get_order("ORD001")
+    assert lazy.get_order("NOPE") is None
+    for customer_id in ("WM001", "WM002", "NOPE"):
+        assert lazy.get_customer_orders(customer_id) == eager.get_customer_orders(customer_id)
+        assert lazy.get_customer_payments(customer_id) == eager.get_customer_payments(customer_id)
+        assert lazy.get_failed_payments(customer_id) == eager.get_failed_payments(customer_id)
+    assert lazy.get_order_payment("ORD001") == eager.get_order_payment("ORD001")
+    assert list(lazy.iter_records("payments")) == list(eager.iter_records("payments"))
+
+
+def test_updates_are_journalled_and_replayed(data_dir):
+    lazy = LazyDataHandler(data_dir)
+    assert lazy.update_payments_status(["PAY001", "NOPE"], "refunded") == 1
+    assert lazy.get_payment("PAY001")["status"] == "refunded"
+    assert lazy.update_payments_status(["PAY001"], "refunded") == 0
+
+    assert LazyDataHandler(data_dir).get_payment("PAY001")["status"] == "refunded"
+    assert DataHandler(data_dir).get_payment("PAY001")["status"] == "refunded"
+
+
+def test_refresh_picks_up_other_writers(data_dir):
+    lazy, other = LazyDataHandler(data_dir), DataHandler(data_dir)
+    changes = []
+    lazy.add_listener(lambda collection, key, record: changes.append((collection, key)))
+    lazy.get_payment("PAY001")  # index built and journal replayed before the foreign write
+
+    other.update_payments_status(["PAY001"], "refunded")
+    lazy.refresh()
+    assert lazy.get_payment("PAY001")["status"] == "refunded"
+    assert ("payments", "PAY001") in changes
+
+
+def test_offset_index_reads_only_the_named_array(tmp_path):
+    path = os.path.join(tmp_path, "orders.json")
+    orders = [
+        {"order_id": "ORD1", "customer_id": "C1", "note": "has \"quotes\", {braces} and [brackets]: ok"},
+        {"customer_id": "C2", "nested": {"order_id": "NOT-A-KEY"}, "order_id": "ORD2"},
+        {"order_id": "ORD3", "customer_id": "C1", "items": [{"customer_id": "C9"}]},
+    ]
+    with open(path, "w") as f:
+        json.dump({"meta": {"orders": [{"order_id": "META"}]}, "orders": orders}, f, indent=2)
+
+    index = OffsetIndex(path, "orders", "order_id", ("customer_id",))
+    assert len(index) == 3
+    assert index.get("ORD2") == orders[1]
+    assert index.get("META") is None and index.get("NOT-A-KEY") is None
+    assert index.find("customer_id", "C1") == [orders[0], orders[2]]
+    assert index.find("customer_id", "C9") == []
+
+    index.put({"order_id": "ORD4", "customer_id": "C1"})
+    index.put(dict(orders[0], note="changed"))
+    assert [o["order_id"] for o in index.find("customer_id", "C1")] == ["ORD1", "ORD3", "ORD4"]
+    assert index.get("ORD1")["note"] == "changed"
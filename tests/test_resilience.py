@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, Guard, budget
+
+
+def _slow(seconds, result="ok"):
+    async def attempt():
+        await asyncio.sleep(seconds)
+        return result
+    return attempt
+
+
+def test_call_times_out_and_opens_breaker():
+    guard = Guard("test", 0.05, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(guard.call(_slow(1)))
+    assert guard.breaker.state == "open"
+
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.call(attempt))
+    assert calls == []
+
+
+def test_half_open_probe_closes_breaker():
+    guard = Guard("test", 0.05, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(guard.call(_slow(1)))
+    assert guard.breaker.state == "open"
+    time.sleep(0.06)
+
+    assert asyncio.run(guard.call(_slow(0))) == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_breaker():
+    guard = Guard("test", 0.05, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.05))
+    guard.breaker.state, guard.breaker.opened_at = "open", time.monotonic() - 1
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(guard.call(_slow(1)))
+    assert guard.breaker.state == "open"
+
+
+def test_budget_timeout_is_not_held_against_backend():
+    guard = Guard("test", 1.0, breaker=CircuitBreaker(failure_threshold=1))
+
+    async def call():
+        with budget(0.05):
+            return await guard.call(_slow(1))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call())
+    assert guard.breaker.stats() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_spent_budget_fails_without_calling():
+    guard = Guard("test", 1.0)
+    with budget(0):
+        with pytest.raises(DeadlineExceeded):
+            guard.call_sync(lambda timeout: "ok")
+
+
+def test_hedge_answers_before_slow_first_attempt():
+    guard = Guard("test", 1.0, hedge_after=0.05)
+    delays = [0.5, 0.0]
+
+    async def attempt():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    started = time.monotonic()
+    assert asyncio.run(guard.call(attempt)) == 0.0
+    assert time.monotonic() - started < 0.4
+
+
+def test_call_sync_times_out_and_counts_failure():
+    guard = Guard("test", 0.05, breaker=CircuitBreaker(failure_threshold=5))
+    release = threading.Event()
+    with pytest.raises(TimeoutError):
+        guard.call_sync(lambda timeout: release.wait(1))
+    release.set()
+    assert guard.breaker.failures == 1
+
+
+def test_call_sync_hedge_wins():
+    guard = Guard("test", 1.0, hedge_after=0.05)
+    delays = [0.5, 0.0]
+    lock = threading.Lock()
+
+    def attempt(timeout):
+        with lock:
+            delay = delays.pop(0)
+        time.sleep(delay)
+        return delay
+
+    assert guard.call_sync(attempt) == 0.0
+
+
+def test_llm_queue_time_does_not_count_against_guard():
+    pytest.importorskip("groq")
+    pytest.importorskip("httpx")
+    from async_llm import AsyncLLMClient
+
+    async def create(**kwargs):
+        await asyncio.sleep(0.1)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" ok "))])
+
+    guard = Guard("groq", 0.15, breaker=CircuitBreaker(failure_threshold=1))
+    client = AsyncLLMClient("key", max_concurrency=1, guard=guard)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    try:
+        async def burst():
+            return await asyncio.gather(*[client.complete("hi", 5) for _ in range(4)])
+
+        # Each call waits up to 0.3s for the single slot, but only its own 0.1s counts
+        assert client.run(burst(), timeout=5) == ["ok"] * 4
+        assert guard.breaker.state == "closed"
+    finally:
+        client.close()
@@ -0,0 +1,56 @@
+import os
+
+from generate_data import SQLiteWriter, generate, load
+from storage import Repository, SQLiteDataHandler, SQLiteSubscriptionManager, import_json
+
+
+def _repository(db_path):
+    return Repository(SQLiteDataHandler(db_path), SQLiteSubscriptionManager(db_path))
+
+
+def test_sqlite_refresh_applies_foreign_writes_per_record(data_dir):
+    db_path = os.path.join(data_dir, "walmart.db")
+    import_json(data_dir, db_path)
+    repository = _repository(db_path)
+    other = _repository(db_path)  # its own SQLiteDatabase, as in another process
+    events = []
+    repository.add_listener(lambda collection, key, record: events.append((collection, key)))
+    counts = repository.columns.payment_status_counts("WM001")
+    active = repository.summaries.get("WM001")["active_subscriptions"]
+
+    other.data_handler.update_payments_status(["PAY001"], "refunded")
+    created = other.subscription_manager.create_subscription("WM001", [{"name": "milk"}], "2025-08-01", "weekly")
+    repository.refresh()
+
+    assert sorted(events) == [("payments", "PAY001"), ("subscriptions", created["subscription_id"])]
+    expected = dict(counts, completed=counts["completed"] - 1, refunded=1)
+    assert repository.columns.payment_status_counts("WM001") == {k: v for k, v in expected.items() if v}
+    assert repository.summaries.get("WM001")["active_subscriptions"] == active + 1
+
+
+def test_sqlite_refresh_ignores_own_writes(data_dir):
+    db_path = os.path.join(data_dir, "walmart.db")
+    import_json(data_dir, db_path)
+    repository = _repository(db_path)
+    events = []
+    repository.add_listener(lambda collection, key, record: events.append((collection, key)))
+
+    repository.data_handler.credit_wallet("WM001", 5.0)
+    repository.refresh()
+
+    assert events == [("customers", "WM001")]
+
+
+def test_sqlite_bulk_load_reloads_whole_tables(tmp_path):
+    db_path = str(tmp_path / "scale.db")
+    repository = _repository(db_path)
+    events = []
+    repository.add_listener(lambda collection, key, record: events.append((collection, key)))
+
+    assert repository.columns.order_count() == 0
+    [counts] = load(generate(20, seed=3), [SQLiteWriter(db_path, batch_size=1000)])
+    repository.refresh()
+
+    assert ("customers", None) in events and ("orders", None) in events
+    assert all(key is None for _, key in events)
+    assert repository.columns.order_count() == counts["orders"]
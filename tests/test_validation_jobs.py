@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from validation_jobs import QueueFull, ValidationJobs
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()  # never leave pool threads blocked
+
+
+def _blocked(release, result=None):
+    def work():
+        release.wait(5)
+        return result or {'status': 'approved'}
+    return work
+
+
+def test_submit_beyond_workers_and_queue_raises_queue_full(release):
+    jobs = ValidationJobs(workers=1, queue_size=1)
+    running = [jobs.submit(_blocked(release), "WM001") for _ in range(2)]
+    with pytest.raises(QueueFull):
+        jobs.submit(_blocked(release), "WM001")
+    assert jobs.stats() == {'pending': 2, 'jobs': 2, 'capacity': 2}
+
+    release.set()
+    assert all(job.done.wait(1) for job in running)
+    assert jobs.submit(lambda: {'status': 'approved'}, "WM001").done.wait(1)
+
+
+def test_get_long_polls_until_the_job_is_done(release):
+    jobs = ValidationJobs(workers=1)
+    job = jobs.submit(_blocked(release, {'status': 'rejected'}), "WM001")
+    assert jobs.get(job.job_id).state in ("queued", "running")
+
+    threading.Timer(0.1, release.set).start()
+    started = time.monotonic()
+    polled = jobs.get(job.job_id, wait=5)
+    assert time.monotonic() - started < 2
+    assert polled.to_dict()['state'] == "done"
+    assert polled.to_dict()['result'] == {'status': 'rejected'}
+
+
+def test_get_returns_at_wait_limit_while_job_runs(release):
+    jobs = ValidationJobs(workers=1)
+    job = jobs.submit(_blocked(release), "WM001")
+    started = time.monotonic()
+    assert jobs.get(job.job_id, wait=0.1).state != "done"
+    assert time.monotonic() - started >= 0.1
+
+
+def test_failed_work_is_reported_as_error():
+    jobs = ValidationJobs(workers=1)
+
+    def work():
+        raise ValueError("model unavailable")
+
+    job = jobs.submit(work, "WM001")
+    assert jobs.get(job.job_id, wait=1).result == {'error': "model unavailable"}
+    assert jobs.stats()['pending'] == 0
+
+
+def test_other_customers_job_is_unknown():
+    jobs = ValidationJobs()
+    job = jobs.submit(lambda: {'status': 'approved'}, "WM001")
+    assert jobs.get(job.job_id, customer_id="WM002") is None
+    assert jobs.get(job.job_id, customer_id="WM001") is job
+    assert jobs.get("no-such-job") is None
+
+
+def test_finished_jobs_expire_after_ttl():
+    jobs = ValidationJobs(ttl=0)
+    job = jobs.submit(lambda: {'status': 'approved'}, "WM001")
+    job.done.wait(1)
+    time.sleep(0.01)
+    jobs.submit(lambda: {'status': 'approved'}, "WM001")  # prunes on submit
+    assert jobs.get(job.job_id) is None
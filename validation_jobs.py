@@ -0,0 +1,108 @@
+import concurrent.futures
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_TTL = 600.0
+MAX_WAIT = 25.0
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when every worker is busy and the queue is at its limit"""
+
+
+class Job:
+    def __init__(self, job_id: str, customer_id: str):
+        self.job_id = job_id
+        self.customer_id = customer_id
+        self.state = "queued"
+        self.result: Optional[Dict] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        job = {'job_id': self.job_id, 'state': self.state, 'created': self.created}
+        if self.result is not None:
+            job['result'] = self.result
+        return job
+
+
+class ValidationJobs:
+    """Runs evidence validations on a bounded worker pool, so /validate can answer right away.
+
+    At most ``workers`` model calls run at once and at most ``queue_size`` jobs wait
+    behind them; beyond that submit() raises QueueFull and the caller should ask the client
+    to retry later. Finished jobs are kept for ``ttl`` seconds for their results to be
+    collected. Jobs live in this process's memory, so status requests must reach the
+    process that accepted the upload.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE, ttl: float = DEFAULT_TTL):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="validation")
+        self._jobs: Dict[str, Job] = {}
+        self._pending = 0  # queued or running
+        self._lock = threading.Lock()
+
+    def submit(self, work: Callable[[], Dict], customer_id: str) -> Job:
+        """Queue ``work()`` (returning the result dict) as a new job"""
+        with self._lock:
+            self._prune()
+            if self._pending >= self.workers + self.queue_size:
+                raise QueueFull(f"{self._pending} validations in progress")
+            self._pending += 1
+            job = Job(str(uuid.uuid4()), customer_id)
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: Job, work: Callable[[], Dict]) -> None:
+        job.state = "running"
+        try:
+            job.result = work()
+        except Exception as e:
+            print(f"Validation job {job.job_id} failed: {e}")
+            job.result = {'error': str(e)}
+        finally:
+            job.state = "done"
+            job.finished = time.time()
+            with self._lock:
+                self._pending -= 1
+            job.done.set()
+
+    def get(self, job_id: str, wait: float = 0.0, customer_id: Optional[str] = None) -> Optional[Job]:
+        """The job, after waiting up to ``wait`` seconds (capped at MAX_WAIT) for it to finish.
+
+        With ``customer_id`` given, another customer's job is treated as unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and customer_id is not None and job.customer_id != customer_id:
+            return None
+        if job is not None and wait > 0:
+            job.done.wait(min(wait, MAX_WAIT))
+        return job
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished is not None and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'pending': self._pending, 'jobs': len(self._jobs), 'capacity': self.workers + self.queue_size}
+
+
+def validation_jobs_from_env() -> ValidationJobs:
+    """Pool sized by VALIDATION_WORKERS / VALIDATION_QUEUE_SIZE, results kept VALIDATION_JOB_TTL seconds"""
+    return ValidationJobs(int(os.getenv("VALIDATION_WORKERS", DEFAULT_WORKERS)),
+                          int(os.getenv("VALIDATION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+                          float(os.getenv("VALIDATION_JOB_TTL", DEFAULT_TTL)))
@@ -1,49 +1,168 @@
 import google.generativeai as genai
 from flask import request
-from typing import Dict, Optional
-import io
-from PIL import Image
+from typing import Dict, List, Optional, Tuple
 import uuid
+from evidence_cache import dhash, verdict_cache_from_env
+from image_ingest import ImageRejected, IngestedImage, ingestor_from_env
+from image_screen import screener_from_env
+from resilience import guard_from_env
 
 class ValidationService:
     def __init__(self, gemini_api_key: str):
         genai.configure(api_key=gemini_api_key)
+        # One model (and underlying client) shared by every validation worker
         self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # GEMINI_TIMEOUT / GEMINI_HEDGE_AFTER / GEMINI_BREAKER_*; a slow or failing Gemini escalates the case
+        self.guard = guard_from_env("gemini", 30.0)
+        self.ingestor = ingestor_from_env()
+        # Verdicts of earlier images by perceptual hash: resubmitted rejected or escalated photos skip the model call,
+        # resubmitted approved ones are escalated as possible duplicate claims
+        self.verdicts = verdict_cache_from_env()
+        # Blank, tiny, blurred and screenshot uploads are decided locally
+        self.screener = screener_from_env()
     
-    def validate_request(self, file, message: str, customer_id: str) -> Dict:
-        try:
-            img = Image.open(io.BytesIO(file.read()))
-            # Enhanced prompt to detect significant damage and enforce stricter rules
-            prompt = f"""
-            Analyze this image for damage related to a refund or replacement request. The message is: {message}.
-            Look for significant damage such as large tears, dents, or structural collapse. 
-            - Return 'valid' only if there is NO significant damage (e.g., minor scratches or intact packaging).
-            - Return 'invalid' if the image shows no damage at all.
-            - Return 'uncertain' if there is significant damage (e.g., tears, dents) or if the damage is unclear.
-            Provide a concise response: 'valid', 'invalid', or 'uncertain'.
-            """
-            response = self.model.generate_content([prompt, img])
-            result = response.text.strip().lower()
+    def validate_request(self, files, message: str, customer_id: str) -> Dict:
+        """Validate one uploaded file, or a list of them making up one claim"""
+        images, rejected = [], []
+        for file in (files if isinstance(files, list) else [files]):
+            try:
+                images.append(self.ingest(file))
+            except ImageRejected as e:
+                rejected.append(self.rejected_file(file, e))
+            except Exception as e:
+                return self.error_verdict(e)
+        return self.validate_images(images, message, customer_id, rejected)
+    
+    def ingest(self, file) -> IngestedImage:
+        """Stream the upload and downscale it; the model sees a right-sized JPEG. Raises ImageRejected"""
+        image = self.ingestor.ingest(file.stream if hasattr(file, 'stream') else file)
+        image.name = getattr(file, 'filename', None) or ''
+        return image
+    
+    @staticmethod
+    def rejected_upload(error: ImageRejected) -> Dict:
+        return {
+            'status': 'rejected',
+            'message': f'{error}. Please upload a clear photo of the item.'
+        }
+    
+    @classmethod
+    def rejected_file(cls, file, error: ImageRejected) -> Dict:
+        """Report entry for an upload that could not be ingested"""
+        return dict(cls.rejected_upload(error), file=getattr(file, 'filename', None) or '', screen='upload')
+    
+    @staticmethod
+    def error_verdict(error: Exception) -> Dict:
+        return {
+            'status': 'escalated',
+            'case_id': str(uuid.uuid4()),
+            'message': f'Error processing request: {str(error)}. Escalated for review.'
+        }
+    
+    def validate_image(self, image: IngestedImage, message: str, customer_id: str) -> Dict:
+        return self.validate_images([image], message, customer_id)
+    
+    def validate_images(self, images: List[IngestedImage], message: str, customer_id: str,
+                        rejected: Optional[List[Dict]] = None) -> Dict:
+        """One verdict for all the photos of a claim, from at most one model call.
 
-            if result == 'valid':
-                return {
-                    'status': 'approved',
-                    'message': 'No significant damage detected. Refund or replacement processed autonomously.'
-                }
-            elif result == 'invalid':
+        ``rejected`` holds report entries (see ``rejected_file``) for uploads that could not be
+        ingested. Photos the screener decides are set aside with them and all are listed under
+        ``images``; a screenshot escalates the whole claim. Near-duplicates within the claim are
+        sent once, and a photo already seen with another customer's claim, or with an approved
+        claim of the same customer, escalates the claim.
+        """
+        set_aside = list(rejected or [])
+        try:
+            candidates = []
+            for image in images:
+                verdict = self.screener.screen(image) if self.screener is not None else None
+                if verdict is None:
+                    candidates.append(image)
+                else:
+                    set_aside.append({'file': image.name, 'status': verdict['status'], 'screen': verdict['screen'],
+                                      'message': verdict['message']})
+            escalating = next((entry for entry in set_aside if entry['status'] == 'escalated'), None)
+            if escalating is not None:
+                # A photo a person has to look at decides the claim, however the others look
+                verdict = {'status': 'escalated', 'case_id': str(uuid.uuid4()), 'message': escalating['message']}
+                analyzed = 0
+            elif not candidates:
+                verdict = {'status': 'rejected', 'message': set_aside[0]['message']}
+                analyzed = 0
+            else:
+                verdict, analyzed = self._judge(candidates, message, customer_id)
+        except Exception as e:
+            verdict, analyzed = self.error_verdict(e), 0
+        submitted = len(images) + len(rejected or [])
+        if set_aside or 0 < analyzed < submitted:
+            verdict['images'] = {'submitted': submitted, 'analyzed': analyzed, 'set_aside': set_aside}
+        return verdict
+    
+    def _judge(self, candidates: List[IngestedImage], message: str, customer_id: str) -> Tuple[Dict, int]:
+        """Verdict for the photos that passed screening, and how many distinct ones it rests on"""
+        fingerprints, unique = [], []
+        for image in candidates:
+            fingerprint = dhash(image.image)
+            if all((fingerprint ^ f).bit_count() > self.verdicts.threshold for f in fingerprints):
+                fingerprints.append(fingerprint)
+                unique.append(image)
+        cached = []
+        for fingerprint in fingerprints:
+            seen = self.verdicts.lookup(fingerprint)
+            if seen is not None and seen[0] != customer_id:
+                # The same photo backing another customer's claim: never decided automatically
+                self.verdicts.record_reuse()
                 return {
-                    'status': 'rejected',
-                    'message': 'No valid damage detected. Request denied.'
-                }
-            else:  # 'uncertain' or any other response
+                    'status': 'escalated',
+                    'case_id': str(uuid.uuid4()),
+                    'message': 'This image was already submitted with another customer\'s request. Case escalated for human review.'
+                }, len(unique)
+            if seen is not None and seen[1]['status'] == 'approved':
+                # A refund was already granted on this photo: only a person may grant another
+                self.verdicts.record_reuse()
                 return {
                     'status': 'escalated',
                     'case_id': str(uuid.uuid4()),
-                    'message': 'Significant damage or unclear evidence detected. Case escalated for human review.'
-                }
-        except Exception as e:
-            return {
+                    'message': 'This image was already used for an approved request. Case escalated for human review as a possible duplicate claim.'
+                }, len(unique)
+            cached.append(seen[1] if seen is not None else None)
+        if all(cached) and len({verdict['status'] for verdict in cached}) == 1:
+            verdict = cached[0]
+            if verdict['status'] == 'escalated':
+                verdict['case_id'] = str(uuid.uuid4())
+            return verdict, len(unique)
+        subject = "this image" if len(unique) == 1 else f"these {len(unique)} images of the same item together"
+        # Enhanced prompt to detect significant damage and enforce stricter rules
+        prompt = f"""
+        Analyze {subject} for damage related to a refund or replacement request. The message is: {message}.
+        Look for significant damage such as large tears, dents, or structural collapse. 
+        - Return 'valid' only if there is NO significant damage (e.g., minor scratches or intact packaging).
+        - Return 'invalid' if the image shows no damage at all.
+        - Return 'uncertain' if there is significant damage (e.g., tears, dents) or if the damage is unclear.
+        Provide a concise response: 'valid', 'invalid', or 'uncertain'.
+        """
+        parts = [prompt] + [{'mime_type': 'image/jpeg', 'data': image.jpeg} for image in unique]
+        response = self.guard.call_sync(
+            lambda timeout: self.model.generate_content(parts, request_options={"timeout": timeout}))
+        result = response.text.strip().lower()
+
+        if result == 'valid':
+            verdict = {
+                'status': 'approved',
+                'message': 'No significant damage detected. Refund or replacement processed autonomously.'
+            }
+        elif result == 'invalid':
+            verdict = {
+                'status': 'rejected',
+                'message': 'No valid damage detected. Request denied.'
+            }
+        else:  # 'uncertain' or any other response
+            verdict = {
                 'status': 'escalated',
                 'case_id': str(uuid.uuid4()),
-                'message': f'Error processing request: {str(e)}. Escalated for review.'
-            }
\ No newline at end of file
+                'message': 'Significant damage or unclear evidence detected. Case escalated for human review.'
+            }
+        for fingerprint in fingerprints:
+            self.verdicts.put(fingerprint, customer_id, verdict)
+        return verdict, len(unique)
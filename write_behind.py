@@ -0,0 +1,68 @@
+import atexit
+import os
+import threading
+from typing import Dict
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 200
+
+class WriteBehindFlusher:
+    """Background thread that group-commits buffered journal entries.
+
+    Journals attached to the flusher buffer their appends and mark themselves dirty; every
+    ``interval`` seconds, or as soon as ``max_pending`` entries are buffered, all dirty
+    journals are written in one batch (one fsync each) and compacted via temp-file plus
+    rename when due. Up to ``interval`` seconds of writes can be lost on a hard crash;
+    ``flush()`` makes everything durable and is registered to run at interpreter exit.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_pending: int = DEFAULT_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._dirty: Dict[object, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def mark_dirty(self, journal, buffered: int) -> None:
+        with self._lock:
+            self._dirty[journal] = buffered
+            total = sum(self._dirty.values())
+        if total >= self.max_pending:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+
+    def flush(self) -> None:
+        """Write every dirty journal now"""
+        with self._flush_lock:
+            with self._lock:
+                dirty = list(self._dirty)
+                self._dirty = {}
+            for journal in dirty:
+                journal.flush()
+
+    def stop(self) -> None:
+        """Flush outstanding writes and stop the background thread"""
+        self._stopped = True
+        self._wake.set()
+        self.flush()
+
+
+def flusher_from_env():
+    """Build a flusher from WRITE_BEHIND_INTERVAL / WRITE_BEHIND_MAX_PENDING, or None when write-behind is off"""
+    interval = float(os.getenv("WRITE_BEHIND_INTERVAL", "0") or 0)
+    if interval <= 0:
+        return None
+    return WriteBehindFlusher(interval, int(os.getenv("WRITE_BEHIND_MAX_PENDING", DEFAULT_MAX_PENDING)))